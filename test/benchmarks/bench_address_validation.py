@@ -0,0 +1,77 @@
+"""
+Worst case latency of the domain and email regexes versus the single pass validation in fenixlib.utils.addresses
+Run from the repository root: python benchmarks/bench_address_validation.py --length 100000
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import time
+from marshmallow import validate
+from fenixlib.schemas.custom_fields import CustomDomainValidator, OXValidatorEmail
+from fenixlib.utils.addresses import is_domain, is_email
+
+REFERENCE_EMAIL = OXValidatorEmail()
+
+
+def regex_email(value):
+    try:
+        validate.Email.__call__(REFERENCE_EMAIL, value)
+    except validate.ValidationError:
+        return False
+    return True
+
+
+def inputs(length):
+    """Name and value of inputs which make the regexes retry, each about length characters long"""
+    labels = length // 2
+    return [
+        ("valid domain", "a." * labels + "com"),
+        ("bad last char", "a." * labels + "!"),
+        ("digit in tld", "a." * labels + "a1"),
+        ("long tld", "a." * labels + "a" * 19),
+        ("long labels", ("a" * 128 + ".") * (length // 129) + "!"),
+        ("oversized label", "a" * length + ".com"),
+        ("no dots", "a" * length),
+        ("ipv4 with junk", "[1.2.3.4" + "1" * length + "]"),
+        ("valid email", "user@" + "a." * labels + "com"),
+        ("bad email domain", "user@" + "a." * labels + "!"),
+        ("quoted local part", '"' + "\\a" * labels + '"@domain.com'),
+        ("unclosed quote", '"' + "\\a" * labels + "@domain.com"),
+    ]
+
+
+def latency(check, value, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        check(value)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--length", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    domain_pattern = CustomDomainValidator.DOMAIN_PATTERN
+    email_domain_pattern = OXValidatorEmail.DOMAIN_REGEX
+    print("{:<20} {:>10} {:>10} {:>10} {:>8}".format("input", "kind", "regex ms", "linear ms", "speedup"))
+    for name, value in inputs(args.length):
+        if "@" in value:
+            checks = [("email", regex_email, is_email)]
+        else:
+            checks = [("domain", lambda v: domain_pattern.match(v) is not None, is_domain),
+                      ("email dom", lambda v: email_domain_pattern.match(v) is not None,
+                       lambda v: is_domain(v, ignorecase=True))]
+        for kind, regex, linear in checks:
+            assert regex(value) == linear(value), name
+            slow = latency(regex, value, args.repeat)
+            fast = latency(linear, value, args.repeat)
+            print("{:<20} {:>10} {:>10.3f} {:>10.3f} {:>7.1f}x".format(name, kind, slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Throughput of provisioning a domain one user at a time versus UserClient.create_users
+OX latency is emulated by the stand-in server
+Run from the repository root: python benchmarks/bench_bulk_provisioning.py --users 10000 --latency 0.005
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import time
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend
+
+AUTH = ("context_user", "secret")
+
+
+def users_for(run, count):
+    return [{"name": "{}-{:06d}".format(run, index), "display_name": "user{}".format(index),
+             "primaryEmail": "{}-{}@domain.com".format(run, index)} for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds OX takes per call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8])
+    args = parser.parse_args()
+
+    backend = OXStubBackend(admin_name=AUTH[0])
+    backend.add_context(1, ["domain.com"])
+    with OXStubServer(backend, delay=args.latency) as server:
+        client = UserClient(wsdl=server.user_wsdl, auth=AUTH)
+
+        start = time.perf_counter()
+        for user in users_for("sequential", args.users):
+            client.create_user(1, user, "gd_pim")
+        elapsed = time.perf_counter() - start
+        print("{:<16} {:>10.0f} users/s".format("sequential", args.users / elapsed))
+
+        for concurrency in args.concurrency:
+            run = "bulk-{}".format(concurrency)
+            start = time.perf_counter()
+            results = client.create_users(1, users_for(run, args.users), "gd_pim", concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+            failures = sum(1 for result in results if result.error is not None)
+            print("{:<16} {:>10.0f} users/s  ({} failed)".format(run, args.users / elapsed, failures))
+
+
+if __name__ == '__main__':
+    main()
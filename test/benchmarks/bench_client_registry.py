@@ -0,0 +1,46 @@
+"""
+Per-call overhead of building a client per request versus using the shared registry
+Run from the repository root: python benchmarks/bench_client_registry.py --calls 200
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import time
+from fenixlib.clients.registry import get_context_client
+from fenixlib.clients.soap_context import ContextClient
+from ox_stub import OXStubServer, OXStubBackend
+
+AUTH = ("context_user", "secret")
+
+
+def per_request(server, calls):
+    for _ in range(calls):
+        ContextClient(wsdl=server.context_wsdl, auth=AUTH).get_context(1)
+
+
+def shared(server, calls):
+    for _ in range(calls):
+        get_context_client(server.context_wsdl, AUTH).get_context(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    backend = OXStubBackend()
+    backend.add_context(1, ["domain.com"])
+    with OXStubServer(backend) as server:
+        # warm the wsdl cache so only construction and the call itself are measured
+        ContextClient(wsdl=server.context_wsdl, auth=AUTH)
+        for name, run in (("per request", per_request), ("shared", shared)):
+            start = time.perf_counter()
+            run(server, args.calls)
+            elapsed = time.perf_counter() - start
+            print("{:<12} {:>8.2f} ms/call".format(name, 1000 * elapsed / args.calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Startup benchmark for ContextClient and UserClient
+Compares constructing the clients with an empty WSDL cache (a freshly started worker) against a cache
+that an earlier worker already filled, for each cache backend
+Run from the repository root: python benchmarks/bench_client_startup.py --wsdl-latency 0.2
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import shutil
+import tempfile
+import time
+from zeep.cache import InMemoryCache
+from fenixlib.clients.cache import get_cache
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer
+
+
+def construct(server, cache):
+    start = time.perf_counter()
+    ContextClient(wsdl=server.context_wsdl, auth=("context_user", "secret"), cache=cache)
+    UserClient(wsdl=server.user_wsdl, auth=("context_user", "secret"), cache=cache)
+    return time.perf_counter() - start
+
+
+def cache_path(backend, directory):
+    return os.path.join(directory, "cache.db") if backend == "sqlite" else directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--wsdl-latency", type=float, default=0.1, help="seconds OX takes to serve a WSDL")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with OXStubServer(wsdl_delay=args.wsdl_latency) as server:
+        print("{:<8} {:>10} {:>10}".format("backend", "cold ms", "warm ms"))
+        for backend in ("memory", "file", "sqlite"):
+            cold, warm = [], []
+            for _ in range(args.rounds):
+                directory = tempfile.mkdtemp()
+                InMemoryCache._cache.clear()
+                cold.append(construct(server, get_cache(backend, cache_path(backend, directory))))
+                if backend == "memory":
+                    # a new worker process starts with an empty in-memory cache
+                    InMemoryCache._cache.clear()
+                warm.append(construct(server, get_cache(backend, cache_path(backend, directory))))
+                shutil.rmtree(directory)
+            print("{:<8} {:>10.1f} {:>10.1f}".format(
+                backend, 1000 * min(cold), 1000 * min(warm)))
+
+
+if __name__ == '__main__':
+    main()
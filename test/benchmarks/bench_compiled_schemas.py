@@ -0,0 +1,90 @@
+"""
+Records per second loaded and dumped by the marshmallow schemas versus their compiled form
+Run from the repository root: python benchmarks/bench_compiled_schemas.py --records 100000
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import copy
+import datetime
+import time
+from fenixlib.schemas.compiled import CompiledSchema
+from fenixlib.schemas.context import Context, OXContext, AdminUserSchema, ContextAccessSchema, envelope_theme
+from fenixlib.schemas.user_dovecot import ImapUser
+
+CREATED = datetime.datetime(2018, 3, 1, 8, tzinfo=datetime.timezone.utc)
+
+
+def imap_user(index):
+    return {"uid": "fef02d18-407e-4530-8484-{:012d}".format(index), "quota_bytes": 2000000000, "smtp_relays": 500,
+            "status": "active", "context_id": index % 1000, "access_id": "86eb655a-886a-49d3-b2af-e1e2f042df34",
+            "sso_emailid": "0f8c7b542b8cfd0cba270e0cdfb57b6da9ff", "sso_salt": "saltycrypto", "sso_auth": "GOODHASH",
+            "imap_auth": "BADHASH", "smtp_auth": "WORSEHASH", "created": "2018-03-01T08:00:00+00:00"}
+
+
+def dumped_imap_user(index):
+    return dict(imap_user(index), created=CREATED, uid="fef02d18-407e-4530-8484-{:012d}".format(index))
+
+
+def context(index):
+    return {"contextId": index, "domains": ["domain{}.com".format(index), "alias{}.org".format(index)],
+            "theme": "godaddy"}
+
+
+def ox_context(index):
+    return {"id": index, "loginMappings": [str(index), "domain{}.com".format(index)], "maxQuota": 1024,
+            "userAttributes": envelope_theme("godaddy")}
+
+
+def dumped_context(index):
+    return {"id": index, "domains": ["domain{}.com".format(index)], "userAttributes": envelope_theme("godaddy")}
+
+
+def admin(index):
+    return {"name": "admin{}@domain.com".format(index), "password": "secret"}
+
+
+def access(index):
+    return {"context_id": str(index), "access_id": "86eb655a-886a-49d3-b2af-e1e2f042df34", "created": CREATED}
+
+
+# schema, direction, record factory
+CASES = [
+    (ImapUser, "load", imap_user),
+    (ImapUser, "dump", dumped_imap_user),
+    (Context, "load", context),
+    (Context, "dump", dumped_context),
+    (OXContext, "load", ox_context),
+    (OXContext, "dump", dumped_context),
+    (AdminUserSchema, "dump", admin),
+    (ContextAccessSchema, "dump", access),
+]
+
+
+def rate(method, records):
+    start = time.perf_counter()
+    for record in records:
+        method(record)
+    return len(records) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    print("{:<28} {:>14} {:>14} {:>8}".format("schema", "marshmallow/s", "compiled/s", "speedup"))
+    for schema_class, direction, factory in CASES:
+        records = [factory(index) for index in range(args.records)]
+        schema = schema_class()
+        compiled = CompiledSchema(schema)
+        # hooks update records in place, each side gets its own copy
+        plain = rate(getattr(schema, direction), copy.deepcopy(records))
+        fast = rate(getattr(compiled, direction), records)
+        print("{:<28} {:>14,.0f} {:>14,.0f} {:>7.1f}x".format(
+            "{}.{}".format(schema_class.__name__, direction), plain, fast, fast / plain))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Microbenchmark of zeep.helpers.serialize_object against the compiled ObjectConverter
+Run from the repository root: python benchmarks/bench_converters.py --users 5000
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import timeit
+import zeep
+from zeep.helpers import serialize_object
+from fenixlib.clients.converters import ObjectConverter
+from ox_stub import OXStubServer, OXStubBackend
+
+AUTH = {"login": "context_user", "password": "secret"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backend = OXStubBackend()
+    backend.add_context(1, ["domain{}.com".format(index) for index in range(50)], users=args.users, theme="godaddy")
+    with OXStubServer(backend) as server:
+        context_client = zeep.Client(server.context_wsdl)
+        user_client = zeep.Client(server.user_wsdl)
+        context = context_client.service.getData({"id": 1}, AUTH)
+        ids = [{"id": user["id"]} for user in backend.users[1].values()]
+        users = user_client.service.getMultipleData({"id": 1}, ids, AUTH)
+
+    cases = (
+        ("Context", context, ObjectConverter(context_client.wsdl.types), 2000),
+        ("{} Users".format(len(ids)), users, ObjectConverter(user_client.wsdl.types), 1),
+    )
+    print("{:<14} {:>16} {:>16} {:>8}".format("payload", "serialize_object", "compiled", "speedup"))
+    for name, obj, converter, number in cases:
+        generic = min(timeit.repeat(lambda: serialize_object(obj), number=number, repeat=args.repeat)) / number
+        compiled = min(timeit.repeat(lambda: converter(obj), number=number, repeat=args.repeat)) / number
+        print("{:<14} {:>13.1f} us {:>13.1f} us {:>7.1f}x".format(
+            name, 1e6 * generic, 1e6 * compiled, generic / compiled))
+
+
+if __name__ == '__main__':
+    main()
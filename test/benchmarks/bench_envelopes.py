@@ -0,0 +1,54 @@
+"""
+Cost of building the get_user request envelope with zeep versus a precompiled template,
+and of whole get_user / get_context calls against the OX stand-in
+Run from the repository root: python benchmarks/bench_envelopes.py --calls 2000
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import time
+from zeep.wsdl.utils import etree_to_string
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend
+
+AUTH = ("context_user", "secret")
+
+
+def timed(label, calls, function):
+    start = time.perf_counter()
+    for index in range(calls):
+        function(index)
+    elapsed = time.perf_counter() - start
+    print("{:<28} {:>10.1f} us/call".format(label, elapsed / calls * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    backend = OXStubBackend(admin_name=AUTH[0])
+    backend.add_context(1, ["domain.com"], users=10)
+    with OXStubServer(backend) as server:
+        plain = UserClient(wsdl=server.user_wsdl, auth=AUTH)
+        compiled = UserClient(wsdl=server.user_wsdl, auth=AUTH, precompiled=("getData",))
+        template = compiled.templates["getData"]
+        name = list(backend.users[1])[1]
+
+        timed("envelope zeep", args.calls, lambda index: etree_to_string(plain.client.create_message(
+            plain.service, "getData", {"id": 1}, {"name": "user{}".format(index)}, plain.auth)))
+        timed("envelope template", args.calls, lambda index: template.render(1, "user{}".format(index)))
+        timed("get_user zeep", args.calls, lambda index: plain.get_user(1, name))
+        timed("get_user template", args.calls, lambda index: compiled.get_user(1, name))
+
+        plain = ContextClient(wsdl=server.context_wsdl, auth=AUTH)
+        compiled = ContextClient(wsdl=server.context_wsdl, auth=AUTH, precompiled=("getData",))
+        timed("get_context zeep", args.calls, lambda index: plain.get_context(1))
+        timed("get_context template", args.calls, lambda index: compiled.get_context(1))
+
+
+if __name__ == '__main__':
+    main()
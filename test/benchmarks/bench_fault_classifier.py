@@ -0,0 +1,47 @@
+"""
+Time to map a corpus of OX fault messages to exceptions with the compiled classifier versus the
+if/elif chain it replaced
+Run from the repository root: python benchmarks/bench_fault_classifier.py --repeat 2000
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import time
+from zeep.exceptions import Fault
+from fenixlib.utils.soapfaults import check_fault
+from fault_corpus import USER_FAULTS, legacy_check_fault
+
+
+def raise_legacy(fault, context_id, mailbox_uid):
+    exception, message = legacy_check_fault(str(fault), context_id, mailbox_uid)
+    raise exception(message)
+
+
+def timed(label, faults, check):
+    start = time.perf_counter()
+    for fault, context_id, mailbox_uid in faults:
+        try:
+            check(fault, context_id, mailbox_uid)
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - start
+    print("{:<12} {:>10.2f} us/fault".format(label, elapsed / len(faults) * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--conflicts", action="store_true", help="only 'User ... already exists' faults, as in a re-run migration")
+    args = parser.parse_args()
+
+    corpus = [(Fault(message), context_id, mailbox_uid) for message, context_id, mailbox_uid in USER_FAULTS
+              if not args.conflicts or "already exists in this context" in message]
+    faults = corpus * args.repeat
+    timed("if/elif", faults, raise_legacy)
+    timed("compiled", faults, check_fault)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Overhead of the client instrumentation: get_context served from the context cache, where the
+decorator is the only extra work, and full get_context calls against the OX stand-in
+Run from the repository root: python benchmarks/bench_metrics_overhead.py --calls 20000
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import time
+from fenixlib.clients.metrics import MetricsRegistry
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.utils.ttlcache import TTLCache
+from ox_stub import OXStubServer, OXStubBackend
+
+AUTH = ("context_user", "secret")
+
+
+def timed(label, calls, function):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function(1)
+    elapsed = time.perf_counter() - start
+    print("{:<28} {:>10.2f} us/call".format(label, elapsed / calls * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000, help="cached calls, a tenth of it goes to the stub")
+    args = parser.parse_args()
+
+    backend = OXStubBackend(admin_name=AUTH[0])
+    backend.add_context(1, ["domain.com"])
+    with OXStubServer(backend) as server:
+        for label, metrics in (("without metrics", None), ("with metrics", MetricsRegistry())):
+            cached = ContextClient(wsdl=server.context_wsdl, auth=AUTH, context_cache=TTLCache(), metrics=metrics)
+            timed("cached, " + label, args.calls, cached.get_context)
+            client = ContextClient(wsdl=server.context_wsdl, auth=AUTH, metrics=metrics)
+            timed("soap, " + label, args.calls // 10, client.get_context)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Peak memory and time of UserClient.iter_all_users with and without the streaming parse mode
+Each mode runs in its own process so the peak resident size is the client's alone,
+the OX stand-in serves from the parent process
+Run from the repository root: python benchmarks/bench_streaming_users.py --users 50000
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import multiprocessing
+import resource
+import time
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend
+
+AUTH = ("context_user", "secret")
+
+
+def run(wsdl, chunk_size, streaming, queue):
+    client = UserClient(wsdl=wsdl, auth=AUTH)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    count = sum(1 for _ in client.iter_all_users(1, chunk_size=chunk_size, streaming=streaming))
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((count, elapsed, (after - before) / 1024.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=0, help="ids per getMultipleData call, 0 for one call")
+    args = parser.parse_args()
+
+    backend = OXStubBackend(admin_name=AUTH[0])
+    backend.add_context(1, ["domain.com"], users=args.users)
+    context = multiprocessing.get_context("fork")
+    with OXStubServer(backend) as server:
+        for streaming in (False, True):
+            queue = context.Queue()
+            process = context.Process(target=run, args=(server.user_wsdl, args.chunk_size or None, streaming, queue))
+            process.start()
+            count, elapsed, peak = queue.get()
+            process.join()
+            print("{:<12} {:>8} users {:>8.2f}s  peak +{:.1f} MiB".format(
+                "streaming" if streaming else "zeep", count, elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
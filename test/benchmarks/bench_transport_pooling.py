@@ -0,0 +1,62 @@
+"""
+New connections (each a TCP and, against a real OX, a TLS handshake) per request under concurrent threads,
+with the default requests pool versus a shared TransportProfile sized to the threads
+Run from the repository root: python benchmarks/bench_transport_pooling.py --threads 32 --calls 50
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from fenixlib.clients.transport import TransportProfile
+from ox_stub import OXStubServer, OXStubBackend
+
+AUTH = ("context_user", "secret")
+
+
+def run(server, label, threads, calls, profile=None):
+    context_client = ContextClient(wsdl=server.context_wsdl, auth=AUTH, transport_profile=profile)
+    user_client = UserClient(wsdl=server.user_wsdl, auth=AUTH, transport_profile=profile)
+    name = list(server.backend.users[1])[1]
+
+    def worker(_):
+        for _ in range(calls):
+            context_client.get_context(1)
+            user_client.get_user(1, name)
+
+    connections = server.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    requests = threads * calls * 2
+    connections = server.connections - connections
+    print("{:<20} {:>8} requests {:>6} connections {:>8.3f} per request {:>8.0f} requests/s".format(
+        label, requests, connections, connections / float(requests), requests / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--calls", type=int, default=50, help="get_context and get_user calls per thread")
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds OX takes per call")
+    args = parser.parse_args()
+    # the default pool logs every connection it has to discard
+    logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
+
+    backend = OXStubBackend(admin_name=AUTH[0])
+    backend.add_context(1, ["domain.com"], users=2)
+    with OXStubServer(backend, delay=args.latency) as server:
+        run(server, "default session", args.threads, args.calls)
+        profile = TransportProfile(pool_maxsize=args.threads)
+        run(server, "shared profile", args.threads, args.calls, profile)
+        profile.close()
+
+
+if __name__ == '__main__':
+    main()
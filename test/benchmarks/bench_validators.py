@@ -0,0 +1,54 @@
+"""
+Time to validate the domains of a Context with a new validator per value, as the fields used to, versus the
+field's own validator with and without the verdict cache, and to load a Context with many repeated domains
+Run from the repository root: python benchmarks/bench_validators.py --domains 5000 --distinct 500
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import time
+from marshmallow import validate
+from fenixlib.schemas.context import Context
+from fenixlib.schemas.custom_fields import CustomDomainValidator, clear_verdicts, verdict_stats
+
+
+def legacy_validated(value):
+    """A new validator, and with it a regex lookup, per value"""
+    return validate.Regexp(regex=CustomDomainValidator.DOMAIN_REGEX, error="Not a valid domain.")(value)
+
+
+def timed(label, function, values, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for value in values:
+            function(value)
+    elapsed = time.perf_counter() - start
+    print("{:<24} {:>8.3f} us/domain".format(label, elapsed / (len(values) * repeat) * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--domains", type=int, default=5000, help="domains per context")
+    parser.add_argument("--distinct", type=int, default=500, help="distinct domains among them")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    domains = ["mail{}.example-domain.com".format(index % args.distinct) for index in range(args.domains)]
+    timed("validator per value", legacy_validated, domains, args.repeat)
+    timed("uncached regex", validate.Regexp(regex=CustomDomainValidator.DOMAIN_PATTERN), domains, args.repeat)
+    clear_verdicts()
+    timed("verdict cache", CustomDomainValidator(error="Not a valid domain."), domains, args.repeat)
+
+    schema = Context()
+    data = {"contextId": 1, "theme": "godaddy", "domains": domains}
+    clear_verdicts()
+    for label in ("Context.load cold", "Context.load warm"):
+        start = time.perf_counter()
+        schema.load(data)
+        print("{:<24} {:>8.2f} ms".format(label, (time.perf_counter() - start) * 1e3))
+    print("domain verdicts: {}".format(verdict_stats()["domains"]))
+
+
+if __name__ == '__main__':
+    main()
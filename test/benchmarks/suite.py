@@ -0,0 +1,231 @@
+"""
+Benchmark suite for ContextClient and UserClient against the local OX stand-in
+Measures the latency of every client method, the throughput of reads under concurrent threads and the peak
+memory of get_all_users for large contexts, then compares the run with a stored baseline so regressions show up.
+Baselines depend on the machine, store one per machine the suite is compared on.
+Run from the repository root:
+    python benchmarks/suite.py                  # run and compare with benchmarks/baselines.json
+    python benchmarks/suite.py --save           # store this run as the baseline
+    python benchmarks/suite.py --quick --check  # smaller run, exits with 1 on a regression
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import time
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend
+
+AUTH = ("context_user", "secret")
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# better is "lower" or "higher"
+Result = namedtuple("Result", ["name", "value", "unit", "better"])
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+
+def latency(name, calls):
+    """Times each call of an iterable of argument-less callables, reports p50 and p95 in microseconds"""
+    durations = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        durations.append((time.perf_counter() - start) * 1e6)
+    return [Result("latency.{}.p50".format(name), percentile(durations, 0.5), "us", "lower"),
+            Result("latency.{}.p95".format(name), percentile(durations, 0.95), "us", "lower")]
+
+
+def new_user(run, index):
+    return {"name": "{}-{:06d}".format(run, index), "display_name": "user{}".format(index),
+            "primaryEmail": "{}-{}@domain.com".format(run, index)}
+
+
+def bench_context_methods(server, iterations):
+    client = ContextClient(wsdl=server.context_wsdl, auth=AUTH)
+    ids = list(range(10000, 10000 + iterations))
+    results = []
+    results += latency("context.get_context", (lambda: client.get_context(1) for _ in range(iterations)))
+    results += latency("context.list_context_for_domain",
+                       (lambda: client.list_context_for_domain("domain.com") for _ in range(iterations)))
+    results += latency("context.resolve_domain",
+                       (lambda: client.resolve_domain("domain.com") for _ in range(iterations)))
+    results += latency("context.update_context",
+                       (lambda: client.update_context(1, {"maxQuota": 2048}) for _ in range(iterations)))
+    results += latency("context.create_context", (
+        (lambda context_id=context_id: client.create_context(
+            {"id": context_id, "loginMappings": ["bench{}.com".format(context_id)]}, {"name": "admin"}))
+        for context_id in ids))
+    results += latency("context.delete_context",
+                       ((lambda context_id=context_id: client.delete_context(context_id)) for context_id in ids))
+    return results
+
+
+def bench_user_methods(server, iterations, batch):
+    client = UserClient(wsdl=server.user_wsdl, auth=AUTH)
+    users = [new_user("single", index) for index in range(iterations)]
+    names = [user["name"] for user in users]
+    results = []
+    results += latency("user.create_user",
+                       ((lambda user=user: client.create_user(1, dict(user), "gd_pim")) for user in users))
+    results += latency("user.get_user", ((lambda name=name: client.get_user(1, name)) for name in names))
+    results += latency("user.update_user",
+                       ((lambda name=name: client.update_user(1, name, {"display_name": "changed"})) for name in names))
+    results += latency("user.update_user_product",
+                       ((lambda name=name: client.update_user_product(1, name, "webmail")) for name in names))
+    results += latency("user.delete_user", ((lambda name=name: client.delete_user(1, name)) for name in names))
+    results += latency("user.get_all_users", (lambda: client.get_all_users(1) for _ in range(iterations)))
+
+    batches = [[new_user("batch{}".format(run), index) for index in range(batch)] for run in range(3)]
+    results += latency("user.create_users.{}".format(batch),
+                       ((lambda users=users: client.create_users(1, users, "gd_pim")) for users in batches))
+    results += latency("user.update_users.{}".format(batch), (
+        (lambda users=users: client.update_users(1, [(user["name"], {"display_name": "changed"})
+                                                    for user in users])) for users in batches))
+    results += latency("user.delete_users.{}".format(batch), (
+        (lambda users=users: client.delete_users(1, [user["name"] for user in users])) for users in batches))
+    return results
+
+
+def bench_throughput(server, threads, calls):
+    """get_context and get_user from shared clients on several threads, in calls per second"""
+    context_client = ContextClient(wsdl=server.context_wsdl, auth=AUTH)
+    user_client = UserClient(wsdl=server.user_wsdl, auth=AUTH)
+    name = list(server.backend.users[1])[1]
+
+    def worker(_):
+        for _ in range(calls):
+            context_client.get_context(1)
+            user_client.get_user(1, name)
+
+    results = []
+    for count in threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            list(pool.map(worker, range(count)))
+        elapsed = time.perf_counter() - start
+        results.append(Result("throughput.reads.{}_threads".format(count), count * calls * 2 / elapsed,
+                              "calls/s", "higher"))
+    return results
+
+
+def _all_users_child(wsdl, queue):
+    client = UserClient(wsdl=wsdl, auth=AUTH)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    count = len(client.get_all_users(1))
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((count, elapsed, (after - before) / 1024.0))
+
+
+def bench_memory(sizes, attributes):
+    """
+    get_all_users in a spawned process per context size, so the peak resident size is the client's alone.
+    A forked process would start from this process's peak and report no growth below it
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for size in sizes:
+        backend = OXStubBackend(admin_name=AUTH[0])
+        backend.add_context(1, ["domain.com"], users=size, attributes=attributes)
+        with OXStubServer(backend) as server:
+            queue = context.Queue()
+            process = context.Process(target=_all_users_child, args=(server.user_wsdl, queue))
+            process.start()
+            count, elapsed, peak = queue.get()
+            process.join()
+        results.append(Result("memory.get_all_users.{}".format(size), peak, "MiB", "lower"))
+        results.append(Result("latency.user.get_all_users.{}".format(size), elapsed * 1e6, "us", "lower"))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Prints the run next to the baseline, returns the names of results which regressed"""
+    regressions = []
+    print("{:<44} {:>14} {:>14} {:>9}".format("benchmark", "value", "baseline", "change"))
+    for result in results:
+        stored = baseline.get(result.name)
+        if stored is None:
+            print("{:<44} {:>10.1f} {:<3} {:>14} {:>9}".format(result.name, result.value, result.unit, "-", "new"))
+            continue
+        change = (result.value - stored["value"]) / stored["value"] if stored["value"] else 0.0
+        worse = change > threshold if result.better == "lower" else change < -threshold
+        if worse:
+            regressions.append(result.name)
+        print("{:<44} {:>10.1f} {:<3} {:>10.1f} {:<3} {:>+8.0%}{}".format(
+            result.name, result.value, result.unit, stored["value"], stored["unit"], change,
+            "  REGRESSION" if worse else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="calls per method latency benchmark")
+    parser.add_argument("--batch", type=int, default=50, help="users per batch method call")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--calls", type=int, default=100, help="calls per thread in the throughput benchmark")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="context sizes of the get_all_users memory benchmark")
+    parser.add_argument("--attributes", type=int, default=0, help="userAttributes entries per user, grows responses")
+    parser.add_argument("--latency", type=float, default=0, help="seconds the stand-in takes per call")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and no 50k user context")
+    parser.add_argument("--baseline", default=BASELINES)
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative change counted as a regression")
+    parser.add_argument("--save", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit with 1 when a benchmark regressed")
+    parser.add_argument("--output", help="also write this run as json to the given file")
+    args = parser.parse_args()
+    if args.quick:
+        args.iterations, args.calls = 50, 25
+        args.users = [size for size in args.users if size <= 10000]
+
+    backend = OXStubBackend(admin_name=AUTH[0])
+    backend.add_context(1, ["domain.com"], users=20, attributes=args.attributes)
+    results = []
+    with OXStubServer(backend, delay=args.latency) as server:
+        results += bench_context_methods(server, args.iterations)
+        results += bench_user_methods(server, args.iterations, args.batch)
+        results += bench_throughput(server, args.threads, args.calls)
+    results += bench_memory(args.users, args.attributes)
+
+    run = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": OrderedDict((result.name, {"value": round(result.value, 3), "unit": result.unit,
+                                              "better": result.better}) for result in results),
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(run, output, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as stored:
+            baseline = json.load(stored)["results"]
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.baseline, "w") as stored:
+            json.dump(run, stored, indent=2)
+            stored.write("\n")
+        print("Baseline written to {}".format(args.baseline))
+    if regressions:
+        print("{} regressions over {:.0%}: {}".format(len(regressions), args.threshold, ", ".join(regressions)))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Circuit breakers around the http calls to OX
+Every OX endpoint (scheme, host and port) gets one breaker shared by all clients using the same registry.
+Timeouts, connection errors and 5xx answers which are not soap faults count as failures; once too many
+recent calls failed the breaker opens and calls fail at once with ServiceUnavailable instead of tying up
+a worker. After a cool down a few probe calls are let through, and their outcome closes or re-opens it.
+A limit of calls in flight per endpoint sheds load before workers pile up on a slow OX
+"""
+import threading
+import time
+from collections import deque
+from requests import Session
+from requests.exceptions import ConnectionError, Timeout
+from requests.utils import urlparse
+from fenixlib import exc
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, name="", failure_rate=0.5, window=20, min_calls=10, reset_timeout=30, probes=1,
+                 max_in_flight=None, timer=time.monotonic):
+        """
+        :param name: the endpoint, used in error messages
+        :param failure_rate: fraction of failed calls in the window which opens the breaker
+        :param window: number of recent calls the failure rate is taken over
+        :param min_calls: calls needed in the window before the breaker may open
+        :param reset_timeout: seconds the breaker stays open before probing
+        :param probes: successful probe calls needed to close a half open breaker
+        :param max_in_flight: calls allowed in flight at once, None for no limit
+        :param timer: monotonic clock returning seconds, replaceable in tests
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.max_in_flight = max_in_flight
+        self.state = CLOSED
+        self.rejected = 0
+        self.shed = 0
+        self._timer = timer
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._probing = 0
+        self._probe_successes = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Admits a call, raises ServiceUnavailable when the breaker is open or the endpoint is saturated
+
+        :return: True when the call is a probe of a half open breaker
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if self._timer() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise exc.ServiceUnavailable("Circuit to {} is open".format(self.name))
+                self.state = HALF_OPEN
+                self._probing = 0
+                self._probe_successes = 0
+            if self.state == HALF_OPEN:
+                if self._probing >= self.probes:
+                    self.rejected += 1
+                    raise exc.ServiceUnavailable("Circuit to {} is half open and probing".format(self.name))
+                self._probing += 1
+            if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+                self.shed += 1
+                if self.state == HALF_OPEN:
+                    self._probing -= 1
+                raise exc.ServiceUnavailable("Too many calls in flight to {}".format(self.name))
+            self._in_flight += 1
+            return self.state == HALF_OPEN
+
+    def after_call(self, success, probe=False):
+        """
+        Records the outcome of an admitted call
+
+        :param success: False for timeouts, connection errors and 5xx answers
+        :param probe: what before_call returned for the call
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if probe:
+                if self.state != HALF_OPEN:
+                    return
+                self._probing -= 1
+                if not success:
+                    self._open()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append(success)
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures >= self.failure_rate * len(self._outcomes):
+                    self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self._timer()
+        self._outcomes.clear()
+
+    def stats(self):
+        """Returns the state, recent failures, calls in flight and how many calls were refused"""
+        with self._lock:
+            return {"state": self.state, "failures": self._outcomes.count(False), "calls": len(self._outcomes),
+                    "in_flight": self._in_flight, "rejected": self.rejected, "shed": self.shed}
+
+
+class BreakerRegistry(object):
+    """
+    Hands out one CircuitBreaker per endpoint
+
+    :param settings: keyword arguments of every CircuitBreaker created
+    """
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint):
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(endpoint)
+                if breaker is None:
+                    breaker = self._breakers[endpoint] = CircuitBreaker(name=endpoint, **self.settings)
+        return breaker
+
+    def stats(self):
+        return dict((endpoint, breaker.stats()) for endpoint, breaker in list(self._breakers.items()))
+
+
+def _failed(response):
+    """5xx answers count as failures unless they carry a soap fault, which OX sends with status 500"""
+    if response.status_code < 500:
+        return False
+    return "xml" not in response.headers.get("Content-Type", "")
+
+
+class BreakerSession(Session):
+    """
+    A requests session which sends every request through the breaker of its endpoint
+
+    :param breakers: the BreakerRegistry shared by the clients of a process
+    """
+
+    def __init__(self, breakers):
+        super(BreakerSession, self).__init__()
+        self.breakers = breakers
+
+    def request(self, method, url, *args, **kwargs):
+        parsed = urlparse(url)
+        breaker = self.breakers.get("{}://{}".format(parsed.scheme, parsed.netloc))
+        probe = breaker.before_call()
+        try:
+            response = super(BreakerSession, self).request(method, url, *args, **kwargs)
+        except (ConnectionError, Timeout):
+            breaker.after_call(False, probe)
+            raise
+        except Exception:
+            breaker.after_call(True, probe)
+            raise
+        breaker.after_call(not _failed(response), probe)
+        return response
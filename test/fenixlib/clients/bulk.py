@@ -0,0 +1,48 @@
+"""
+Runs many client calls through a bounded pool of worker threads
+Used by the batch methods of the soap clients, every item gets a BulkItemResult in input order
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# skipped is True for items never sent because an earlier item failed in fail fast mode
+BulkItemResult = namedtuple('BulkItemResult', ['item', 'result', 'error', 'skipped'])
+
+
+def run_bulk(call, items, concurrency=8, fail_fast=False):
+    """
+    Calls call(item) for every item with at most concurrency calls in flight
+
+    :param call: function taking a single item
+    :param items: iterable of items
+    :param concurrency: maximum number of simultaneous calls
+    :param fail_fast: stop sending new items after the first error
+    :return: a list of BulkItemResult, one per item in input order
+    """
+    items = list(items)
+    concurrency = max(1, concurrency)
+    results = [None] * len(items)
+    failed = False
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = {}
+        position = 0
+        while position < len(items) or pending:
+            while position < len(items) and len(pending) < concurrency and not failed:
+                pending[pool.submit(call, items[position])] = position
+                position += 1
+            if failed and not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    results[index] = BulkItemResult(items[index], future.result(), None, False)
+                else:
+                    results[index] = BulkItemResult(items[index], None, error, False)
+                    failed = failed or fail_fast
+
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = BulkItemResult(items[index], None, None, True)
+    return results
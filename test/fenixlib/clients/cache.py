@@ -0,0 +1,101 @@
+"""
+WSDL/XSD cache backends shared by the SOAP clients
+The backend is selected from config so every worker of a service can reuse documents
+downloaded by an earlier worker instead of fetching and parsing them from OX again
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from zeep.cache import Base, InMemoryCache, SqliteCache, VersionedCacheBase
+from fenixlib import config
+
+
+class FileCache(VersionedCacheBase):
+    """
+    Stores each cached document in its own file under a directory
+    Writes go to a temporary file which is renamed into place, so concurrent workers never read a partial document
+    """
+
+    _version = 'fenix-1'
+
+    def __init__(self, path=None, timeout=86400):
+        self._timeout = timeout
+        self._path = path or os.path.join(tempfile.gettempdir(), 'fenixlib-wsdl-cache')
+        os.makedirs(self._path, exist_ok=True)
+
+    def _filename(self, url):
+        return os.path.join(self._path, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def add(self, url, content):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        handle, temp_path = tempfile.mkstemp(dir=self._path, prefix='.tmp-')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                temp_file.write(self._encode_data(content))
+            os.replace(temp_path, self._filename(url))
+        finally:
+            # only left behind when the write or rename was interrupted
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def get(self, url):
+        filename = self._filename(url)
+        try:
+            if self._timeout is not None and time.time() - os.path.getmtime(filename) > self._timeout:
+                return None
+            with open(filename, 'rb') as cached:
+                return self._decode_data(cached.read())
+        except OSError:
+            return None
+
+
+class NoCache(Base):
+    """Caches nothing, every WSDL/XSD document is downloaded"""
+
+    def add(self, url, content):
+        pass
+
+    def get(self, url):
+        return None
+
+
+def get_cache(backend=None, path=None, timeout=None):
+    """
+    Builds a WSDL cache backend
+
+    :param backend: one of "memory", "file" or "sqlite", defaults to config.OX_WSDL_CACHE
+    :param path: directory (file) or database file (sqlite) to store documents in
+    :param timeout: seconds a cached document stays valid
+    :return: a zeep cache instance
+    """
+    backend = backend or config.OX_WSDL_CACHE
+    path = path or config.OX_WSDL_CACHE_PATH
+    timeout = timeout if timeout is not None else config.OX_WSDL_CACHE_TIMEOUT
+
+    if backend == 'memory':
+        return InMemoryCache(timeout=timeout)
+    elif backend == 'file':
+        return FileCache(path=path, timeout=timeout)
+    elif backend == 'sqlite':
+        return SqliteCache(path=path, timeout=timeout)
+    else:
+        raise ValueError("Unknown WSDL cache backend {}".format(backend))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """
+    The cache used by clients built without one, created from config on first use so importing the clients
+    touches no files
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = get_cache()
+        return _shared
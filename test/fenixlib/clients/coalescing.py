@@ -0,0 +1,170 @@
+"""
+Coalescing of bursts of writes to the same user or context
+The first write to a mailbox or context opens a batch and waits a short window for more writes to the same
+object, then sends the batch: consecutive changes merged into one change call, product changes between them
+in the order they were made. A batch starts after the one before it for the same object has finished,
+so writes reach OX in the order they were made. Every caller waits for its own write and gets its result or
+error; when a merged change is refused, its changes are resent one by one so each caller sees its own outcome
+"""
+import threading
+import time
+from concurrent.futures import Future
+from zeep.exceptions import Fault
+from fenixlib import exc
+from fenixlib.schemas import attributes
+
+
+def merge_changes(changes):
+    """
+    One change with the effect of sending changes in order: later fields win, fields set to None are not
+    sent and so change nothing, userAttributes are merged attribute by attribute
+
+    :param changes: list of change dicts
+    """
+    merged = {}
+    for change in changes:
+        for key, value in change.items():
+            if value is None:
+                merged.setdefault(key, None)
+            elif key == "userAttributes" and merged.get(key) is not None:
+                merged[key] = attributes.encode(attributes.merge(attributes.decode(merged[key]),
+                                                                 attributes.decode(value)))
+            else:
+                merged[key] = value
+    return merged
+
+
+# what fenixlib.utils.soapfaults maps the refusal of one change to: conflicts, unknown products and other
+# OXExceptions, missing users and domains in use by other contexts, and faults it leaves unmapped
+PER_WRITE_ERRORS = (exc.OXException, exc.UserNotFound, exc.DomainInUse, Fault)
+
+
+def _divisible(error):
+    """
+    Refusals a single change can cause, a merged change refused with one is resent change by change.
+    A missing context refuses every change to it and is not resent
+    """
+    return isinstance(error, PER_WRITE_ERRORS) and not isinstance(error, exc.ContextNotFound)
+
+
+class _Batch(object):
+
+    def __init__(self, previous):
+        self.previous = previous
+        self.writes = []
+        self.done = threading.Event()
+
+
+class WriteCoalescer(object):
+
+    def __init__(self, user_client=None, context_client=None, window=0.01):
+        """
+        :param user_client: the UserClient update_user and update_user_product are sent through
+        :param context_client: the ContextClient update_context is sent through
+        :param window: seconds a batch waits for more writes to the same object
+        """
+        self.user_client = user_client
+        self.context_client = context_client
+        self.window = window
+        self.writes = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.resent = 0
+        self._open = {}
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def update_user(self, context_id, mailbox_uid, user_diff):
+        """UserClient.update_user, merged with other changes to the user made within the window"""
+        return self._write(("user", str(context_id), mailbox_uid), "change", (context_id, mailbox_uid), user_diff)
+
+    def update_user_product(self, context_id, mailbox_uid, product_type):
+        """UserClient.update_user_product, sent in order with the changes to the user around it"""
+        return self._write(("user", str(context_id), mailbox_uid), "product", (context_id, mailbox_uid),
+                           product_type)
+
+    def update_context(self, context_id, context):
+        """ContextClient.update_context, merged with other changes to the context made within the window"""
+        return self._write(("context", str(context_id)), "context", (context_id,), context)
+
+    def _write(self, key, kind, ids, payload):
+        future = Future()
+        with self._lock:
+            self.writes += 1
+            batch = self._open.get(key)
+            leading = batch is None
+            if leading:
+                batch = self._open[key] = _Batch(self._last.get(key))
+                self._last[key] = batch
+            batch.writes.append((kind, ids, payload, future))
+        if leading:
+            self._lead(key, batch)
+        return future.result()
+
+    def _lead(self, key, batch):
+        time.sleep(self.window)
+        with self._lock:
+            del self._open[key]
+        if batch.previous is not None:
+            batch.previous.done.wait()
+        try:
+            self._send(batch.writes)
+        finally:
+            batch.done.set()
+            with self._lock:
+                if self._last.get(key) is batch:
+                    del self._last[key]
+
+    def _call(self, kind, ids, payload):
+        with self._lock:
+            self.sent += 1
+        if kind == "product":
+            return self.user_client.update_user_product(ids[0], ids[1], payload)
+        if kind == "change":
+            return self.user_client.update_user(ids[0], ids[1], payload)
+        return self.context_client.update_context(ids[0], payload)
+
+    def _send(self, writes):
+        """Sends runs of changes as one call each and product changes on their own, in order"""
+        start = 0
+        while start < len(writes):
+            kind, ids = writes[start][:2]
+            end = start + 1
+            if kind != "product":
+                while end < len(writes) and writes[end][0] == kind:
+                    end += 1
+            run = writes[start:end]
+            try:
+                payload = merge_changes([write[2] for write in run]) if kind != "product" else run[0][2]
+                result = self._call(kind, ids, payload)
+            except Exception as error:
+                if len(run) > 1 and _divisible(error):
+                    self._resend(run)
+                else:
+                    self._settle(run, None, error)
+            else:
+                self._settle(run, result, None)
+            start = end
+
+    def _settle(self, run, result, error):
+        with self._lock:
+            self.coalesced += len(run) - 1
+        for write in run:
+            if error is not None:
+                write[3].set_exception(error)
+            else:
+                write[3].set_result(result)
+
+    def _resend(self, run):
+        for kind, ids, payload, future in run:
+            with self._lock:
+                self.resent += 1
+            try:
+                future.set_result(self._call(kind, ids, payload))
+            except Exception as error:
+                future.set_exception(error)
+
+    def stats(self):
+        """Returns writes made, calls sent to OX, writes which shared a call and changes resent one by one"""
+        with self._lock:
+            return {"writes": self.writes, "sent": self.sent, "coalesced": self.coalesced, "resent": self.resent}
@@ -0,0 +1,119 @@
+"""
+Type specialized replacement for zeep.helpers.serialize_object
+serialize_object walks every zeep object generically. ObjectConverter instead generates one
+python function per xsd complex type from the WSDL's type definitions, which reads the fields of
+that type directly and only recurses where the schema says a field is complex.
+The output is the same nested OrderedDicts and lists serialize_object builds
+"""
+from collections import OrderedDict
+from zeep.helpers import serialize_object
+from zeep.xsd import AnySimpleType, AnyType, ComplexType, Element
+from zeep.xsd.elements.indicators import Sequence
+from zeep.xsd.valueobjects import CompoundValue
+
+# types converted by the soap clients on every read
+DEFAULT_TYPES = ("Context", "User")
+
+
+def _type_key(xsd_type):
+    return xsd_type.qname.text if xsd_type.qname is not None else id(xsd_type)
+
+
+def _is_plain_sequence(xsd_type):
+    """True when the type is a flat sequence of elements, choices and xsd:any are left to serialize_object"""
+    for _, particle in xsd_type.elements_nested:
+        if isinstance(particle, Sequence):
+            if not all(isinstance(child, Element) for child in particle):
+                return False
+        elif not isinstance(particle, Element):
+            return False
+    return True
+
+
+def _many(convert, values):
+    if values is None:
+        return None
+    return [convert(value) for value in values]
+
+
+def _copy(values):
+    if values is None:
+        return None
+    return list(values)
+
+
+class ObjectConverter(object):
+    """
+    Converts zeep objects into OrderedDicts with one compiled function per xsd type
+
+    :param schema: the zeep schema of a client, e.g. client.wsdl.types
+    :param type_names: local names of the complex types compiled up front, others are compiled on first use
+    """
+
+    def __init__(self, schema, type_names=DEFAULT_TYPES):
+        self._compiled = {}
+        for xsd_type in schema.types:
+            if isinstance(xsd_type, ComplexType) and xsd_type.qname is not None \
+                    and xsd_type.qname.localname in type_names:
+                self._compile(xsd_type, set())
+
+    def __call__(self, obj):
+        if isinstance(obj, list):
+            return [self(item) for item in obj]
+        if isinstance(obj, CompoundValue) and obj._xsd_type is not None:
+            convert = self._compiled.get(_type_key(obj._xsd_type))
+            if convert is None:
+                convert = self._compile(obj._xsd_type, set())
+            return convert(obj)
+        return serialize_object(obj)
+
+    def _compile(self, xsd_type, compiling):
+        """Generates the converter function of a complex type and of the complex types it contains"""
+        key = _type_key(xsd_type)
+        if key in self._compiled:
+            return self._compiled[key]
+        if not _is_plain_sequence(xsd_type):
+            self._compiled[key] = serialize_object
+            return serialize_object
+        compiling.add(key)
+
+        namespace = {"OrderedDict": OrderedDict, "serialize": serialize_object, "many": _many, "copy": _copy}
+        fields = []
+        for index, (name, element) in enumerate(xsd_type.elements):
+            value = "values[{!r}]".format(name)
+            element_type = element.type if isinstance(element, Element) else None
+            if isinstance(element_type, ComplexType):
+                if _type_key(element.type) in compiling:
+                    convert = serialize_object
+                else:
+                    convert = self._compile(element.type, compiling)
+                namespace["convert_{}".format(index)] = convert
+                template = "many(convert_{}, {})" if element.accepts_multiple else "convert_{}({})"
+                fields.append((name, template.format(index, value)))
+            elif element_type is None or type(element_type) in (AnyType, AnySimpleType):
+                # xsd:any content can hold anything, leave it to the generic walk
+                fields.append((name, "serialize({})".format(value)))
+            elif element.accepts_multiple:
+                fields.append((name, "copy({})".format(value)))
+            else:
+                fields.append((name, value))
+        for name, _ in xsd_type.attributes:
+            fields.append((name, "serialize(values[{!r}])".format(name)))
+
+        source = (
+            "def convert(obj):\n"
+            "    if obj is None:\n"
+            "        return None\n"
+            "    values = obj.__values__\n"
+            "    if len(values) != {count}:\n"
+            "        return serialize(obj)\n"
+            "    result = OrderedDict()\n"
+            "{assignments}\n"
+            "    return result\n"
+        ).format(count=len(fields), assignments="\n".join(
+            "    result[{!r}] = {}".format(name, expression) for name, expression in fields))
+        exec(compile(source, "<converter {}>".format(key), "exec"), namespace)
+
+        compiling.discard(key)
+        self._compiled[key] = namespace["convert"]
+        return namespace["convert"]
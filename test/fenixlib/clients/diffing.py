@@ -0,0 +1,144 @@
+"""
+Suppression of change calls which would not change anything
+A ChangeDiffer compares the fields of a change with a snapshot of the object as OX last showed it and keeps
+only the fields which differ, userAttributes down to the single attribute. When nothing is left the client
+skips the change call. Snapshots are taken from the reads of the clients and kept up to date by every change
+sent through the differ; a differ built with fetch=True reads objects it has no snapshot of before changing them
+"""
+import copy
+import threading
+from fenixlib.schemas import attributes
+from fenixlib.utils.ttlcache import TTLCache, MISSING
+
+
+def _same(current, wanted):
+    if isinstance(current, list) and isinstance(wanted, list):
+        # OX keeps no order in aliases and login mappings
+        return len(current) == len(wanted) and sorted(current, key=repr) == sorted(wanted, key=repr)
+    return current == wanted
+
+
+def element_size(name, value):
+    """Estimated bytes of a field rendered as xml elements, without namespace prefixes"""
+    if value is None:
+        return 0
+    if isinstance(value, list):
+        return sum(element_size(name, item) for item in value)
+    if isinstance(value, dict):
+        inner = sum(element_size(key, item) for key, item in value.items())
+    else:
+        inner = len(str(value))
+    return inner + 2 * len(name) + 5
+
+
+class ChangeDiffer(object):
+
+    def __init__(self, snapshots=None, fetch=False):
+        """
+        :param snapshots: optional fenixlib.utils.ttlcache.TTLCache of the objects as last seen, by default 4096
+            objects are kept for 60 seconds. Changes made to OX by other writers within that time are not seen
+        :param fetch: read the object when there is no snapshot of it, an extra call per change of an object not
+            read recently. By default such changes are sent unreduced
+        """
+        self.snapshots = snapshots if snapshots is not None else TTLCache(maxsize=4096, ttl=60)
+        self.fetch = fetch
+        self.sent = 0
+        self.suppressed = 0
+        self.fields_dropped = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self, key, read):
+        """
+        The last seen state of an object, read and remembered when unknown and fetching is enabled
+
+        :param key: hashable identifying the object, e.g. ("user", context_id, mailbox_uid)
+        :param read: function without arguments returning the object from OX
+        :return: the snapshot, or None when there is none
+        """
+        snapshot = self.snapshots.get(key)
+        if snapshot is not MISSING:
+            return snapshot
+        if not self.fetch:
+            return None
+        snapshot = read()
+        if snapshot is not None:
+            self.snapshots.set(key, snapshot)
+        return snapshot
+
+    def seen(self, key, value):
+        """
+        Remembers an object as just read from OX
+
+        :param key: hashable identifying the object
+        :param value: the object, None when there is none
+        """
+        if value is not None:
+            self.snapshots.set(key, copy.deepcopy(value))
+
+    def reduce(self, snapshot, change, keep=()):
+        """
+        The fields of change which differ from the snapshot, None when there are none
+
+        :param snapshot: the object as last seen, None sends the change as it is
+        :param change: dict of the fields to change
+        :param keep: fields identifying the object, sent with every change but never a reason to send one
+        """
+        if snapshot is None:
+            with self._lock:
+                self.sent += 1
+            return change
+        reduced = dict((key, change[key]) for key in keep if key in change)
+        for key, value in change.items():
+            if key in keep or value is None:
+                continue
+            if key == "userAttributes":
+                changed = attributes.changes(attributes.decode(snapshot.get(key)), attributes.decode(value))
+                if changed:
+                    reduced[key] = attributes.encode(changed)
+            elif not _same(snapshot.get(key), value):
+                reduced[key] = value
+        sending = any(key not in keep for key in reduced)
+        if not sending:
+            reduced = {}
+        saved = sum(element_size(key, value) - element_size(key, reduced.get(key)) for key, value in change.items())
+        with self._lock:
+            self.fields_dropped += len([key for key in change if key not in reduced and key not in keep])
+            if sending:
+                self.sent += 1
+            else:
+                self.suppressed += 1
+            self.bytes_saved += saved
+        return reduced if sending else None
+
+    def applied(self, key, snapshot, sent, keep=()):
+        """
+        Updates the snapshot of an object after a change to it went through
+
+        :param key: hashable identifying the object
+        :param snapshot: the snapshot the change was reduced against, None when there was none
+        :param sent: the fields sent
+        :param keep: fields identifying the object, the snapshot keeps them as OX returned them
+        """
+        if snapshot is None:
+            return
+        updated = copy.copy(snapshot)
+        for field, value in sent.items():
+            if field in keep:
+                continue
+            if field == "userAttributes":
+                updated[field] = attributes.encode(attributes.merge(attributes.decode(updated.get(field)),
+                                                                    attributes.decode(value)))
+            elif value is not None:
+                updated[field] = copy.deepcopy(value)
+        self.snapshots.set(key, updated)
+
+    def forget(self, key):
+        """Drops the snapshot of an object, after a failed change or when it is deleted"""
+        self.snapshots.invalidate(key)
+
+    def stats(self):
+        """Returns change calls sent and suppressed, fields left out and the estimated request bytes saved"""
+        with self._lock:
+            return {"sent": self.sent, "suppressed": self.suppressed, "fields_dropped": self.fields_dropped,
+                    "bytes_saved": self.bytes_saved}
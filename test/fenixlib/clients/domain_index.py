@@ -0,0 +1,116 @@
+"""
+Local index of which context owns a domain
+Filled from every context record a ContextClient sees, so resolving a domain does not need a soap call.
+Entries expire, a domain not seen again within the time to live is looked up with OX again.
+Can be bulk warmed by listing all contexts through a set of search patterns in parallel
+"""
+import logging
+import string
+import threading
+import time
+from fenixlib import exc
+from fenixlib.clients.bulk import run_bulk
+
+logger = logging.getLogger(__name__)
+
+# OX matches search patterns against login mappings, one pattern per leading character
+WARM_PATTERNS = tuple("{}*".format(character) for character in string.ascii_lowercase + string.digits)
+
+
+class DomainIndex(object):
+
+    def __init__(self, ttl=60, timer=time.monotonic):
+        """
+        :param ttl: seconds a domain resolves from the index after it was last seen, a domain moved to
+            another context by someone else resolves to its old context at most that long
+        :param timer: monotonic clock returning seconds, replaceable in tests
+        """
+        self.ttl = ttl
+        self._timer = timer
+        self._contexts = {}
+        self._domains = {}
+        self._lock = threading.Lock()
+
+    def observe(self, context):
+        """
+        Records the domains of a context record, replacing whatever was known about that context
+
+        :param context: a context dict as returned by the context service
+        """
+        context_id = int(context["id"])
+        domains = set(domain.lower() for domain in context.get("loginMappings") or ()
+                      if domain != str(context_id))
+        expires = self._timer() + self.ttl
+        with self._lock:
+            for domain in self._contexts.get(context_id, set()) - domains:
+                self._drop(domain, context_id)
+            for domain in domains:
+                self._domains[domain] = (context_id, expires)
+            self._contexts[context_id] = domains
+
+    def _drop(self, domain, context_id):
+        entry = self._domains.get(domain)
+        if entry is not None and entry[0] == context_id:
+            del self._domains[domain]
+
+    def forget(self, context_id):
+        """Drops a deleted context and its domains"""
+        context_id = int(context_id)
+        with self._lock:
+            for domain in self._contexts.pop(context_id, set()):
+                self._drop(domain, context_id)
+
+    def resolve(self, domain):
+        """
+        Looks up the context owning a domain
+
+        :param domain: The domain name to be looked up
+        :return: the numeric id of the context or None when the domain is not indexed or its entry expired
+        """
+        domain = domain.lower()
+        with self._lock:
+            entry = self._domains.get(domain)
+            if entry is None:
+                return None
+            if entry[1] <= self._timer():
+                del self._domains[domain]
+                self._contexts.get(entry[0], set()).discard(domain)
+                return None
+            return entry[0]
+
+    def domain_context(self, domain):
+        """
+        Looks up a domain in the shape of the DomainContext schema
+
+        :param domain: The domain name to be looked up
+        :return: a dict with contextId and domain
+        """
+        context_id = self.resolve(domain)
+        if context_id is None:
+            raise exc.DomainNotFound("The domain {} is not mapped to a context".format(domain))
+        return {"contextId": context_id, "domain": domain}
+
+    def warm(self, client, patterns=WARM_PATTERNS, concurrency=8):
+        """
+        Fills the index by listing every context through the given search patterns in parallel
+        The listings go straight to the context service and are not kept in the client's context cache.
+        Patterns which failed are logged, the index then misses their domains until they are seen
+
+        :param client: a ContextClient
+        :param patterns: search patterns which together cover every domain
+        :param concurrency: maximum number of list calls in flight
+        :return: a list of BulkItemResult, one per pattern
+        """
+        def list_contexts(pattern):
+            return client._serialize(client.service.list(pattern, client.auth))
+
+        results = run_bulk(list_contexts, patterns, concurrency)
+        for result in results:
+            if result.error is not None:
+                logger.warning("Listing contexts for %s failed: %s", result.item, result.error)
+            for context in result.result or ():
+                self.observe(context)
+        return results
+
+    def __len__(self):
+        return len(self._domains)
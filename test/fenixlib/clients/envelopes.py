@@ -0,0 +1,96 @@
+"""
+Precompiled request envelopes for hot soap operations
+zeep resolves the operation, validates the arguments and renders the whole envelope on every call.
+An EnvelopeTemplate renders the envelope once with marker values, splits it at the markers and
+afterwards only escapes and splices in the variable values. The response still goes through zeep
+"""
+import re
+import uuid
+from xml.sax.saxutils import escape
+from zeep.wsdl.utils import etree_to_string
+
+# characters which lxml refuses to put in a text node
+_INVALID_XML = re.compile(u"[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+
+
+def _xml_text(value):
+    """Renders a value the way zeep and lxml render simple element text, None when only zeep can"""
+    if value is None:
+        return None
+    text = str(value)
+    if _INVALID_XML.search(text):
+        return None
+    return escape(text).replace("\r", "&#13;").encode("utf-8")
+
+
+class EnvelopeTemplate(object):
+    """
+    A request envelope of one operation compiled for a fixed argument shape
+
+    :param client: the zeep.Client the service belongs to
+    :param service: the bound service proxy to call
+    :param operation_name: name of the operation
+    :param build: function mapping the variable values to the operation arguments
+    :param slots: number of variable values build takes
+    """
+
+    def __init__(self, client, service, operation_name, build, slots):
+        self.client = client
+        self.service = service
+        self.operation_name = operation_name
+        self.build = build
+        token = uuid.uuid4().hex
+        markers = ["fenixslot{}x{}".format(index, token) for index in range(slots)]
+        binding = service._binding
+        envelope, self.headers = binding._create(operation_name, build(*markers), {},
+                                                 client=client, options=service._binding_options)
+        self.operation = binding.get(operation_name)
+        self.address = service._binding_options["address"]
+
+        pieces = re.split("fenixslot(\\d+)x{}".format(token).encode("ascii"), etree_to_string(envelope))
+        if sorted(int(index) for index in pieces[1::2]) != list(range(slots)):
+            raise ValueError("Every value of {} must appear once as element text".format(operation_name))
+        self._texts = pieces[0::2]
+        self._order = [int(index) for index in pieces[1::2]]
+
+    def render(self, *values):
+        """
+        Fills the variable values into the compiled envelope
+
+        :return: the envelope bytes, or None when a value can not be rendered without zeep
+        """
+        rendered = [_xml_text(value) for value in values]
+        if None in rendered:
+            return None
+        parts = [self._texts[0]]
+        for index, text in zip(self._order, self._texts[1:]):
+            parts.append(rendered[index])
+            parts.append(text)
+        return b"".join(parts)
+
+    def __call__(self, *values):
+        """Sends the operation with the given values and returns zeep's parsed result"""
+        message = None
+        if not self.client.plugins and not self.client.wsse:
+            message = self.render(*values)
+        if message is None:
+            return getattr(self.service, self.operation_name)(*self.build(*values))
+        response = self.client.transport.post(self.address, message, self.headers)
+        return self.service._binding.process_reply(self.client, self.operation, response)
+
+
+def compile_templates(client, service, operation_names, builders):
+    """
+    Compiles the templates of the requested operations
+
+    :param operation_names: operations to precompile, each must have a builder
+    :param builders: dict of operation name to (build, slots)
+    :return: a dict of operation name to EnvelopeTemplate
+    """
+    templates = {}
+    for operation_name in operation_names or ():
+        if operation_name not in builders:
+            raise ValueError("No envelope template for operation {}".format(operation_name))
+        build, slots = builders[operation_name]
+        templates[operation_name] = EnvelopeTemplate(client, service, operation_name, build, slots)
+    return templates
@@ -0,0 +1,164 @@
+"""
+Hedged requests for idempotent reads
+A read which has not answered by the chosen percentile of its recent latencies is sent a second time
+on another pooled connection, the first successful answer wins and the other one is ignored.
+Hedges are limited to a fraction of the calls of each operation so a slow OX does not see double the load.
+Reads wait for no worker thread: a read which may not be hedged, or finds every worker busy, runs on the
+caller's thread, and a hedge finding every worker busy is not sent
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class HedgePolicy(object):
+
+    def __init__(self, percentile=0.95, delay=0.1, budget=0.05, window=200, min_samples=20):
+        """
+        :param percentile: latency percentile after which a read is hedged
+        :param delay: seconds before hedging while fewer than min_samples latencies are known
+        :param budget: largest fraction of calls which may send a hedge
+        :param window: number of recent latencies the percentile is taken over
+        :param min_samples: latencies needed before the percentile replaces delay
+        """
+        self.percentile = percentile
+        self.delay = delay
+        self.budget = budget
+        self.window = window
+        self.min_samples = min_samples
+
+
+class _OperationState(object):
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.latencies = deque(maxlen=policy.window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def deadline(self):
+        if len(self.latencies) < self.policy.min_samples:
+            return self.policy.delay
+        ordered = sorted(self.latencies)
+        return ordered[int(round(self.policy.percentile * (len(ordered) - 1)))]
+
+
+class Hedger(object):
+    """
+    Runs reads with hedging, shared by all reads of a client
+
+    :param policy: the HedgePolicy of operations without their own
+    :param policies: dict of operation name to HedgePolicy
+    :param max_workers: threads available to reads which may be hedged and their hedges
+    """
+
+    def __init__(self, policy=None, policies=None, max_workers=16):
+        self.policy = policy or HedgePolicy()
+        self.policies = policies or {}
+        self._operations = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._idle = threading.BoundedSemaphore(max_workers)
+
+    def _state(self, operation):
+        state = self._operations.get(operation)
+        if state is None:
+            with self._lock:
+                state = self._operations.setdefault(
+                    operation, _OperationState(self.policies.get(operation, self.policy)))
+        return state
+
+    def call(self, operation, function, *args):
+        """
+        Calls function(*args), sending it a second time when the first call is slow
+
+        :param operation: name of the read, selects the policy and the metrics
+        :param function: the read, must be safe to send twice
+        :return: the result of whichever call answered first without an error, the error of the first call
+            when both failed
+        """
+        state = self._state(operation)
+        with self._lock:
+            state.calls += 1
+            deadline = state.deadline()
+            may_hedge = state.hedged + 1 <= state.policy.budget * state.calls
+        start = time.monotonic()
+        if not may_hedge or not self._idle.acquire(blocking=False):
+            return self._call_inline(state, deadline, start, function, *args)
+
+        first = self._submit(function, *args)
+        done, _ = wait([first], timeout=deadline)
+        if done:
+            self._record(state, time.monotonic() - start)
+            return first.result()
+
+        with self._lock:
+            allowed = state.hedged + 1 <= state.policy.budget * state.calls
+            if allowed:
+                state.hedged += 1
+            else:
+                state.denied += 1
+        if allowed and not self._idle.acquire(blocking=False):
+            with self._lock:
+                state.hedged -= 1
+                state.denied += 1
+            allowed = False
+        if not allowed:
+            result = first.result()
+            self._record(state, time.monotonic() - start)
+            return result
+
+        second = self._submit(function, *args)
+        pending = {first, second}
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (first, second):
+                if future in done and future.exception() is None:
+                    winner = future
+                    break
+        self._record(state, time.monotonic() - start)
+        if winner is None:
+            return first.result()
+        if winner is second:
+            with self._lock:
+                state.hedge_wins += 1
+        # the other call is left to finish in the pool, its answer is dropped
+        return winner.result()
+
+    def _call_inline(self, state, deadline, start, function, *args):
+        try:
+            return function(*args)
+        finally:
+            latency = time.monotonic() - start
+            self._record(state, latency)
+            if latency > deadline:
+                with self._lock:
+                    state.denied += 1
+
+    def _submit(self, function, *args):
+        """Runs function on a worker which was acquired from _idle, and gives the worker back when done"""
+        def run():
+            try:
+                return function(*args)
+            finally:
+                self._idle.release()
+        return self._pool.submit(run)
+
+    def _record(self, state, latency):
+        with self._lock:
+            state.latencies.append(latency)
+
+    def stats(self):
+        """Returns calls, hedged, hedge_wins, denied and the current hedge deadline per operation"""
+        with self._lock:
+            return dict((operation, {"calls": state.calls, "hedged": state.hedged, "hedge_wins": state.hedge_wins,
+                                     "denied": state.denied, "deadline": state.deadline()})
+                        for operation, state in self._operations.items())
+
+    def shutdown(self):
+        """Stops the worker threads once running calls have finished"""
+        self._pool.shutdown(wait=False)
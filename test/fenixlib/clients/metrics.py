@@ -0,0 +1,226 @@
+"""
+Instrumentation of the soap clients
+Two layers report into a metrics sink:
+the client methods (latency, calls in flight and outcomes, where faults are counted by the exception they
+were mapped to) and the wire (latency, request and response bytes and http status per soap operation).
+MetricsRegistry is the in-process sink and renders the Prometheus text format. Any object with the same
+inc, add and observe methods can be passed as sink instead. Clients built without a sink pay one attribute check
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+from zeep.transports import AsyncTransport
+from fenixlib.clients.transport import SoapTransport
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_labels(labels, extra=()):
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in labels) + "}"
+
+
+class MetricsRegistry(object):
+
+    def __init__(self, buckets=None):
+        """
+        :param buckets: dict of metric name suffix to histogram bucket bounds,
+            defaults to SECONDS_BUCKETS for *_seconds and BYTES_BUCKETS for *_bytes
+        """
+        self.buckets = buckets or {"_seconds": SECONDS_BUCKETS, "_bytes": BYTES_BUCKETS}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def _bounds(self, name):
+        for suffix, bounds in self.buckets.items():
+            if name.endswith(suffix):
+                return bounds
+        return SECONDS_BUCKETS
+
+    def inc(self, name, labels, amount=1):
+        """Adds to a counter, labels is a tuple of (name, value) pairs"""
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add(self, name, labels, delta):
+        """Moves a gauge up or down"""
+        key = (name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def observe(self, name, labels, value):
+        """Records a value in a histogram"""
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                bounds = self._bounds(name)
+                histogram = self._histograms[key] = [bounds, [0] * (len(bounds) + 1), 0.0]
+            histogram[1][bisect.bisect_left(histogram[0], value)] += 1
+            histogram[2] += value
+
+    def value(self, name, labels):
+        """Current value of a counter or gauge, or (count, sum) of a histogram"""
+        key = (name, tuple(labels))
+        with self._lock:
+            if key in self._histograms:
+                histogram = self._histograms[key]
+                return sum(histogram[1]), histogram[2]
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(((key, (bounds, list(counts), total))
+                                 for key, (bounds, counts, total) in self._histograms.items()),
+                                key=lambda item: item[0])
+        lines = []
+        for kind, series in (("counter", counters), ("gauge", gauges)):
+            last = None
+            for (name, labels), value in series:
+                if name != last:
+                    lines.append("# TYPE {} {}".format(name, kind))
+                    last = name
+                lines.append("{}{} {}".format(name, _render_labels(labels), value))
+        last = None
+        for (name, labels), (bounds, counts, total) in histograms:
+            if name != last:
+                lines.append("# TYPE {} histogram".format(name))
+                last = name
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append("{}_bucket{} {}".format(name, _render_labels(labels, [("le", bound)]), cumulative))
+            cumulative += counts[-1]
+            lines.append("{}_bucket{} {}".format(name, _render_labels(labels, [("le", "+Inf")]), cumulative))
+            lines.append("{}_sum{} {}".format(name, _render_labels(labels), total))
+            lines.append("{}_count{} {}".format(name, _render_labels(labels), cumulative))
+        return "".join(line + "\n" for line in lines)
+
+
+def _outcome(error):
+    return "ok" if error is None else type(error).__name__
+
+
+def _record_call(sink, labels, start, error):
+    sink.observe("fenix_client_call_seconds", labels, time.perf_counter() - start)
+    sink.inc("fenix_client_calls_total", labels + (("outcome", _outcome(error)),))
+    sink.add("fenix_client_in_flight", labels, -1)
+
+
+def instrumented(method):
+    """
+    Decorates a client method to report its latency, outcome and calls in flight to the client's metrics sink
+    The outcome is the name of the exception raised, so faults count by the exception they were mapped to
+    """
+    name = method.__name__
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            sink = self.metrics
+            if sink is None:
+                return await method(self, *args, **kwargs)
+            labels = (("client", type(self).__name__), ("method", name))
+            sink.add("fenix_client_in_flight", labels, 1)
+            start = time.perf_counter()
+            try:
+                result = await method(self, *args, **kwargs)
+            except Exception as error:
+                _record_call(sink, labels, start, error)
+                raise
+            _record_call(sink, labels, start, None)
+            return result
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        sink = self.metrics
+        if sink is None:
+            return method(self, *args, **kwargs)
+        labels = (("client", type(self).__name__), ("method", name))
+        sink.add("fenix_client_in_flight", labels, 1)
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception as error:
+            _record_call(sink, labels, start, error)
+            raise
+        _record_call(sink, labels, start, None)
+        return result
+    return wrapper
+
+
+def _wire_labels(address, headers):
+    service = address.rstrip("/").rsplit("/", 1)[-1].split("?")[0]
+    operation = headers.get("SOAPAction", "").strip('"')
+    return ("service", service), ("operation", operation.split(":")[-1])
+
+
+def _record_post(sink, labels, start, message, response, stream=False):
+    sink.observe("fenix_soap_seconds", labels, time.perf_counter() - start)
+    sink.observe("fenix_soap_request_bytes", labels, len(message))
+    if response is None:
+        sink.inc("fenix_soap_responses_total", labels + (("status", "error"),))
+        return
+    if not stream:
+        sink.observe("fenix_soap_response_bytes", labels, len(response.content))
+    elif "Content-Length" in response.headers:
+        # the body of a streamed response is not read here, its size is only known when the server sent it
+        sink.observe("fenix_soap_response_bytes", labels, int(response.headers["Content-Length"]))
+    sink.inc("fenix_soap_responses_total", labels + (("status", str(response.status_code)),))
+
+
+class InstrumentedTransport(SoapTransport):
+    """
+    zeep Transport reporting latency, payload sizes and http status of every soap call
+    Streamed calls are timed until their headers arrived
+
+    :param metrics: the metrics sink
+    """
+
+    def __init__(self, metrics, *args, **kwargs):
+        super(InstrumentedTransport, self).__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    def post(self, address, message, headers, stream=False):
+        labels = _wire_labels(address, headers)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = super(InstrumentedTransport, self).post(address, message, headers, stream=stream)
+            return response
+        finally:
+            _record_post(self.metrics, labels, start, message, response, stream)
+
+
+class InstrumentedAsyncTransport(AsyncTransport):
+    """zeep AsyncTransport reporting latency, payload sizes and http status of every soap call"""
+
+    def __init__(self, metrics, *args, **kwargs):
+        super(InstrumentedAsyncTransport, self).__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    async def post(self, address, message, headers):
+        labels = _wire_labels(address, headers)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await super(InstrumentedAsyncTransport, self).post(address, message, headers)
+            return response
+        finally:
+            _record_post(self.metrics, labels, start, message, response)
@@ -0,0 +1,86 @@
+"""
+Short lived memory of contexts and mailboxes which do not exist
+Reads of a context or mailbox OX answered with ContextNotFound or UserNotFound raise the same exception
+again without a call until the entry expires. Creating a context or user forgets what was remembered about
+it, and reads which were in flight while it was created remember nothing, so a create is never hidden
+"""
+import contextlib
+import threading
+import time
+from fenixlib import exc
+from fenixlib.utils.ttlcache import TTLCache, MISSING
+
+
+@contextlib.contextmanager
+def unguarded():
+    """The guard of clients without a negative cache, runs the block as it is"""
+    yield
+
+
+class NegativeCache(object):
+
+    def __init__(self, maxsize=10000, ttl=30, timer=time.monotonic):
+        """
+        :param maxsize: number of missing contexts and mailboxes remembered
+        :param ttl: seconds an answer is remembered, contexts created by other processes are missed that long
+        :param timer: monotonic clock returning seconds, replaceable in tests
+        """
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+        self._generation = 0
+        self.checks = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def guard(self, context_id, mailbox_uid=None):
+        """
+        Raises the remembered exception when the context or mailbox is known not to exist, otherwise runs
+        the block and remembers ContextNotFound and UserNotFound raised in it
+
+        :param context_id: The numeric id of the context
+        :param mailbox_uid: the uuid identifying the user, None for reads of the context
+        """
+        context_key = ("context", str(context_id))
+        user_key = ("user", str(context_id), mailbox_uid) if mailbox_uid is not None else None
+        with self._lock:
+            self.checks += 1
+            generation = self._generation
+        for key in (context_key, user_key):
+            error = self._entries.get(key, MISSING) if key is not None else MISSING
+            if error is not MISSING:
+                with self._lock:
+                    self.hits += 1
+                raise type(error)(*error.args)
+        try:
+            yield
+        except exc.ContextNotFound as error:
+            self._remember(context_key, error, generation)
+            raise
+        except exc.UserNotFound as error:
+            if user_key is not None:
+                self._remember(user_key, error, generation)
+            raise
+
+    def _remember(self, key, error, generation):
+        with self._lock:
+            if generation == self._generation:
+                self._entries.set(key, error)
+
+    def forget_context(self, context_id):
+        """Forgets that a context and mailboxes in it were missing, called once a create of it finished"""
+        context_id = str(context_id)
+        with self._lock:
+            self._generation += 1
+            self._entries.invalidate_where(lambda key, error: key[1] == context_id)
+
+    def forget_user(self, context_id, mailbox_uid):
+        """Forgets that a mailbox and its context were missing, called once a create of it finished"""
+        with self._lock:
+            self._generation += 1
+            self._entries.invalidate(("context", str(context_id)))
+            self._entries.invalidate(("user", str(context_id), mailbox_uid))
+
+    def stats(self):
+        """Returns reads checked, reads answered from memory and the number of missing objects remembered"""
+        with self._lock:
+            return {"checks": self.checks, "hits": self.hits, "size": len(self._entries)}
@@ -0,0 +1,299 @@
+"""
+Record and replay of the http exchanges between the soap clients and OX
+A Recorder mounted into a client's session writes every request and response, wsdl and schema downloads
+included, to a gzipped archive of json lines with credentials scrubbed. Response bodies are copied as the client
+reads them, so streamed responses still stream. A Replayer serves a client from such an archive without any
+connection to OX, at full speed or with the latencies which were recorded, so the clients can be profiled and
+benchmarked against production shaped payloads
+"""
+import codecs
+import gzip
+import hashlib
+import io
+import json
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import ConnectionError
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, urlparse
+
+FORMAT_VERSION = 1
+# the login and password of the Credentials sent with every call, and the passwords of users and contexts
+SECRETS = ("login", "password")
+SCRUBBED = b"scrubbed"
+# bytes of a response body kept in memory while it is copied, larger bodies are copied to a temporary file
+SPOOL_SIZE = 1024 * 1024
+# the only response headers replays need
+KEPT_HEADERS = ("Content-Type",)
+
+
+def _secret_pattern(secrets):
+    names = b"|".join(re.escape(name.encode("ascii")) for name in secrets)
+    return re.compile(b"(<(?:[\\w.-]+:)?(?:" + names + b")(?:\\s[^>]*)?>)[^<]*(</)")
+
+
+def _body(body):
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    return body
+
+
+def _target(url):
+    """The path and query of a url, replays do not depend on the host a recording was made against"""
+    parsed = urlparse(url)
+    return parsed.path + ("?" + parsed.query if parsed.query else "")
+
+
+def _action(headers):
+    return headers.get("SOAPAction", "").strip('"')
+
+
+def _digest(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+def _unfinished(buffer):
+    """Where the last element which may still be cut off starts, secrets are only scrubbed once complete"""
+    cut = len(buffer)
+    if buffer.endswith(b"<"):
+        cut -= 1
+    position = buffer.rfind(b"<", 0, cut)
+    while position != -1 and buffer[position + 1:position + 2] == b"/":
+        position = buffer.rfind(b"<", 0, position)
+    return position if position != -1 else cut
+
+
+class Recorder(object):
+
+    def __init__(self, path, secrets=SECRETS):
+        """
+        :param path: file the archive is written to, an existing archive is replaced
+        :param secrets: local names of the xml elements whose text is replaced before anything is written
+        """
+        self.path = path
+        self.recorded = 0
+        self._pattern = _secret_pattern(secrets)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._file.write(json.dumps({"version": FORMAT_VERSION, "recorded": time.strftime("%Y-%m-%dT%H:%M:%S")}))
+        self._file.write("\n")
+
+    def scrub(self, body):
+        """Returns the body with the text of every secret element replaced"""
+        return self._pattern.sub(b"\\1" + SCRUBBED + b"\\2", _body(body))
+
+    def _scrub_chunks(self, chunks):
+        """Scrubs a body read in chunks, keeping back the end of a chunk which may hold part of a secret"""
+        carry = b""
+        for chunk in chunks:
+            buffer = self.scrub(carry + chunk)
+            cut = _unfinished(buffer)
+            carry = buffer[cut:]
+            yield buffer[:cut]
+        yield self.scrub(carry)
+
+    def adapter(self, adapter=None):
+        """
+        Returns a transport adapter recording the exchanges it sends through adapter
+
+        :param adapter: the adapter doing the actual requests, a new HTTPAdapter by default
+        """
+        return RecordingAdapter(self, adapter or HTTPAdapter())
+
+    def record(self, request, response, elapsed, content=None):
+        """
+        Appends one exchange to the archive
+
+        :param content: binary file holding the response body, the read response content by default
+        """
+        if content is None:
+            content = io.BytesIO(response.content)
+        body = self.scrub(request.body)
+        entry = {
+            "offset": round(time.monotonic() - self._started - elapsed, 6),
+            "method": request.method,
+            "target": _target(request.url),
+            "action": _action(request.headers),
+            "request": _digest(body),
+            "request_bytes": len(body),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict((name, response.headers[name]) for name in KEPT_HEADERS if name in response.headers),
+            "elapsed": round(elapsed, 6),
+        }
+        content.seek(0)
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        with self._lock:
+            # the body is the last field, written a chunk at a time
+            self._file.write(json.dumps(entry, separators=(",", ":"))[:-1] + ',"body":"')
+            for chunk in self._scrub_chunks(iter(lambda: content.read(65536), b"")):
+                self._file.write(json.dumps(decoder.decode(chunk))[1:-1])
+            self._file.write(json.dumps(decoder.decode(b"", True))[1:-1] + '"}\n')
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class _TeeStream(object):
+    """
+    Stands in for the raw stream of a response and copies what is read from it to a spooled file,
+    which is recorded once the body was read to its end
+    """
+
+    def __init__(self, raw, finished):
+        self._raw = raw
+        self._finished = finished
+        self._copy = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        self._done = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def stream(self, amt=65536, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._copy.write(chunk)
+            yield chunk
+        self._finish()
+
+    def read(self, amt=None, *args, **kwargs):
+        data = self._raw.read(amt, *args, **kwargs)
+        self._copy.write(data)
+        if amt is None or not data:
+            self._finish()
+        return data
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._finished(self._copy)
+            self._copy.close()
+
+    def close(self):
+        if not self._done:
+            # a body left unread, e.g. a streamed listing ending in a fault, is read so it is recorded whole
+            try:
+                for _ in self.stream(decode_content=True):
+                    pass
+            except Exception:
+                self._done = True
+                self._copy.close()
+        self._raw.close()
+
+
+class RecordingAdapter(BaseAdapter):
+
+    def __init__(self, recorder, adapter):
+        super(RecordingAdapter, self).__init__()
+        self.recorder = recorder
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        start = time.monotonic()
+        response = self.adapter.send(request, **kwargs)
+
+        def finished(content):
+            self.recorder.record(request, response, time.monotonic() - start, content)
+
+        response.raw = _TeeStream(response.raw, finished)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class Replayer(object):
+
+    def __init__(self, path, speed=None, secrets=SECRETS, loose=False):
+        """
+        :param path: an archive written by a Recorder
+        :param speed: None answers at once, 1.0 waits the recorded latency of each exchange, 2.0 half of it
+        :param secrets: the secrets the archive was recorded with, requests are scrubbed the same way to match
+        :param loose: answer a request which was not recorded with the answers to other requests to the same
+            operation, which may hold another context's or user's data. Off by default, such requests fail
+        """
+        self.path = path
+        self.speed = speed
+        self.loose = loose
+        self.replayed = 0
+        self._pattern = _secret_pattern(secrets)
+        self._lock = threading.Lock()
+        self._exact = defaultdict(list)
+        self._loose = defaultdict(list)
+        self._positions = defaultdict(int)
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            header = json.loads(archive.readline())
+            if header.get("version") != FORMAT_VERSION:
+                raise ValueError("Unsupported archive version {} in {}".format(header.get("version"), path))
+            for line in archive:
+                entry = json.loads(line)
+                self._exact[(entry["method"], entry["target"], entry["action"], entry["request"])].append(entry)
+                self._loose[(entry["method"], entry["target"], entry["action"])].append(entry)
+
+    def adapter(self, adapter=None):
+        """Returns a transport adapter answering from the archive, adapter is not used as nothing is sent"""
+        return ReplayAdapter(self)
+
+    def _next(self, entries, key):
+        position = self._positions[key]
+        self._positions[key] = position + 1
+        # once every recorded answer was served the last one repeats, so replays can loop
+        return entries[min(position, len(entries) - 1)]
+
+    def lookup(self, request):
+        """
+        Finds the recorded exchange of a request
+        The recorded answers to an identical request are served in order, with loose a request which was not
+        recorded is answered like the recorded requests to the same operation
+
+        :return: the archive entry
+        :raises requests.exceptions.ConnectionError: nothing was recorded for the request
+        """
+        body = self._pattern.sub(b"\\1" + SCRUBBED + b"\\2", _body(request.body))
+        loose = (request.method, _target(request.url), _action(request.headers))
+        exact = loose + (_digest(body),)
+        with self._lock:
+            self.replayed += 1
+            if exact in self._exact:
+                return self._next(self._exact[exact], exact)
+            if self.loose and loose in self._loose:
+                return self._next(self._loose[loose], loose)
+        raise ConnectionError("No recorded exchange for {} {} {}".format(*loose), request=request)
+
+    def respond(self, request):
+        entry = self.lookup(request)
+        if self.speed:
+            time.sleep(entry["elapsed"] / self.speed)
+        response = Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry["body"].encode("utf-8")
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+
+    def __init__(self, replayer):
+        super(ReplayAdapter, self).__init__()
+        self.replayer = replayer
+
+    def send(self, request, **kwargs):
+        return self.replayer.respond(request)
+
+    def close(self):
+        pass
@@ -0,0 +1,56 @@
+"""
+Process wide registry of pre-built SOAP clients
+Building a client parses the WSDL, resolves the credentials type and binds the service proxy,
+so services should fetch clients from here instead of building one per request.
+Clients handed out for the same (wsdl, credentials, cert_verify) share one requests session,
+which keeps connections to OX alive between calls
+"""
+import threading
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+
+
+class ClientRegistry(object):
+    """Builds each client once per key and hands out the same instance afterwards"""
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, client_class, wsdl, auth=(None, None), cert_verify=None):
+        """
+        Fetches a shared client, building it on first use
+
+        :param client_class: ContextClient or UserClient
+        :param wsdl: url of the service wsdl
+        :param auth: (login, password) tuple
+        :param cert_verify: passed on to the requests session
+        :return: an instance of client_class
+        """
+        key = (client_class, wsdl, tuple(auth), cert_verify)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = client_class(wsdl=wsdl, auth=auth, cert_verify=cert_verify)
+                    self._clients[key] = client
+        return client
+
+    def clear(self):
+        """Drops all shared clients, the next get builds fresh ones"""
+        with self._lock:
+            self._clients.clear()
+
+
+registry = ClientRegistry()
+
+
+def get_context_client(wsdl, auth=(None, None), cert_verify=None):
+    """Fetches the shared ContextClient for the given wsdl and credentials"""
+    return registry.get(ContextClient, wsdl, auth, cert_verify)
+
+
+def get_user_client(wsdl, auth=(None, None), cert_verify=None):
+    """Fetches the shared UserClient for the given wsdl and credentials"""
+    return registry.get(UserClient, wsdl, auth, cert_verify)
@@ -0,0 +1,77 @@
+"""
+Collapsing of concurrent identical reads
+While a read is in flight, the same read from other threads waits for it instead of being sent again and
+gets its result, or the exception it was mapped to. Callers get their own copies of the result and of the
+exception so none sees what another does to it. Reads are only shared while in flight, finished results are
+left to the caches
+"""
+import copy
+import threading
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+
+    def __init__(self, metrics=None):
+        """
+        :param metrics: optional metrics sink, e.g. fenixlib.clients.metrics.MetricsRegistry, counting
+            fenix_client_collapsed_total per method
+        """
+        self.metrics = metrics
+        self._flights = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, function, *args):
+        """
+        Runs function(*args) unless a call with the same key is in flight, then waits for that one
+
+        :param key: tuple identifying the read, starting with the name of the method
+        :param function: the read
+        :return: the result of the read, a copy for callers which waited
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leading = flight is None
+            if leading:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+            counts = self._counts.setdefault(key[0], [0, 0])
+            counts[0] += 1
+            counts[1] += 0 if leading else 1
+        if not leading:
+            if self.metrics is not None:
+                self.metrics.inc("fenix_client_collapsed_total", (("method", key[0]),))
+            flight.done.wait()
+            if flight.error is not None:
+                # a copy per waiter, raising the one instance from many threads would grow a shared traceback
+                raise copy.copy(flight.error) from flight.error
+            return copy.deepcopy(flight.result)
+        try:
+            result = function(*args)
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            if flight.error is None and flight.followers:
+                # the followers copy from a result the leading caller never gets to change
+                flight.result = copy.deepcopy(result)
+            flight.done.set()
+        return result
+
+    def stats(self):
+        """Returns reads and collapsed reads, the ones which waited for another, per method"""
+        with self._lock:
+            return dict((method, {"calls": counts[0], "collapsed": counts[1]})
+                        for method, counts in self._counts.items())
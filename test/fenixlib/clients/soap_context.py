@@ -1,31 +1,137 @@
 """
 Definition of Soap Client used by all methods
-Handles caching of wsdl globally in memory
+Handles caching of wsdl globally through the configured cache backend
 A requests session exists through the lifetime of the client
+Context lookups can optionally be served from a TTL/LRU cache which writes through this client invalidate
+and feed a domain index which resolves domains to contexts locally
 """
+import copy
 import zeep
 from fenixlib import exc
-from requests import Session
 from zeep.exceptions import Fault
-from zeep.cache import InMemoryCache
 from fenixlib.schemas.context import AdminUserSchema
+from fenixlib.utils.soapfaults import check_context_fault
+from fenixlib.clients.cache import NoCache, shared_cache
+from fenixlib.clients.converters import ObjectConverter
+from fenixlib.clients.envelopes import compile_templates
+from fenixlib.clients.transport import SoapTransport, build_session, transport_options
+from fenixlib.clients.metrics import InstrumentedTransport, instrumented
+from fenixlib.clients.negative import unguarded
+from fenixlib.utils.ttlcache import MISSING
 
-_cache = InMemoryCache(timeout=86400)
 admin_schema = AdminUserSchema()
 
 class ContextClient(object):
 
-    def __init__(self, wsdl=None, auth=(None, None), cert_verify=None):
-        session = Session()
-        session.verify = cert_verify
+    def __init__(self, wsdl=None, auth=(None, None), cert_verify=None, cache=None, context_cache=None,
+                 domain_index=None, fast_serialize=False, precompiled=(), hedger=None, breakers=None,
+                 transport_profile=None, metrics=None, tape=None, differ=None, singleflight=None,
+                 negative_cache=None):
+        """
+        :param context_cache: optional fenixlib.utils.ttlcache.TTLCache for get_context and list_context_for_domain
+        :param domain_index: optional fenixlib.clients.domain_index.DomainIndex fed from every context seen
+        :param fast_serialize: convert responses with compiled per type converters instead of serialize_object
+        :param precompiled: operations sent from precompiled envelope templates, getData is supported
+        :param hedger: optional fenixlib.clients.hedging.Hedger sending slow reads a second time
+        :param breakers: optional fenixlib.clients.breaker.BreakerRegistry failing fast while OX is down
+        :param transport_profile: optional fenixlib.clients.transport.TransportProfile with pool sizes, timeouts
+            and retries, clients sharing a profile share their connections
+        :param metrics: optional metrics sink, e.g. fenixlib.clients.metrics.MetricsRegistry
+        :param tape: optional fenixlib.clients.recording.Recorder writing the exchanges with OX to an archive,
+            or Replayer answering from one instead of OX. Without a cache the client then caches no wsdl, so the
+            wsdl and schemas are recorded and replayed as well
+        :param differ: optional fenixlib.clients.diffing.ChangeDiffer, update_context then sends only the fields
+            which differ from the context as last read and skips the change call when none do
+        :param singleflight: optional fenixlib.clients.singleflight.SingleFlight, concurrent identical
+            get_context and list_context_for_domain calls then share one request
+        :param negative_cache: optional fenixlib.clients.negative.NegativeCache, get_context then raises
+            ContextNotFound for contexts OX recently reported missing without asking again
+        """
+        session = build_session(cert_verify, breakers, transport_profile, tape)
+        if cache is None:
+            cache = NoCache() if tape is not None else shared_cache()
+        options = dict(transport_options(transport_profile), cache=cache, session=session)
+        self.metrics = metrics
+        if metrics is not None:
+            transport = InstrumentedTransport(metrics, **options)
+        else:
+            transport = SoapTransport(**options)
 
-        self.client = zeep.Client(wsdl,
-                                  transport=zeep.transports.Transport(cache=_cache, session=session))
+        self.client = zeep.Client(wsdl, transport=transport)
         self.auth = self.client.get_type("ns5:Credentials")(login=auth[0],
                                                             password=auth[1])
         self.service = self.client.create_service(self.client.service._binding.name,
                                                   self.client.service._binding_options['address'].replace(":80", "", 1))
+        self.context_cache = context_cache
+        self.domain_index = domain_index
+        self.converter = ObjectConverter(self.client.wsdl.types) if fast_serialize else None
+        self.hedger = hedger
+        self.differ = differ
+        self.singleflight = singleflight
+        self.negative_cache = negative_cache
+        self.templates = compile_templates(self.client, self.service, precompiled, {
+            "getData": (lambda context_id: ({"id": context_id}, self.auth), 1),
+        })
+
+    def _serialize(self, obj):
+        if self.converter is not None:
+            return self.converter(obj)
+        return zeep.helpers.serialize_object(obj)
+
+    def _read(self, operation, function, *args):
+        if self.hedger is None:
+            return function(*args)
+        return self.hedger.call(operation, function, *args)
+
+    def _collapsed(self, key, function, *args):
+        if self.singleflight is None:
+            return function(*args)
+        return self.singleflight.call(key, function, *args)
+
+    def _guarded(self, context_id):
+        if self.negative_cache is None:
+            return unguarded()
+        return self.negative_cache.guard(context_id)
+
+    def _forget_missing(self, context_id):
+        if self.negative_cache is not None:
+            self.negative_cache.forget_context(context_id)
+
+    def _cached(self, key):
+        if self.context_cache is None:
+            return MISSING
+        value = self.context_cache.get(key)
+        return value if value is MISSING else copy.deepcopy(value)
 
+    def _remember(self, key, value):
+        if self.context_cache is not None:
+            self.context_cache.set(key, copy.deepcopy(value))
+
+    def _observe(self, contexts):
+        if self.domain_index is not None:
+            for context in contexts or ():
+                if context is not None:
+                    self.domain_index.observe(context)
+
+    def _invalidate(self, context_id, domains=()):
+        """Drops cached lookups of a context and of domains which resolved to it or are being mapped to it"""
+        if self.context_cache is None:
+            return
+        context_id = str(context_id)
+        domains = set(domains)
+
+        def stale(key, value):
+            if key[0] == "id":
+                return key[1] == context_id
+            return key[1] in domains or any(str(context["id"]) == context_id for context in value or ())
+
+        self.context_cache.invalidate_where(stale)
+
+    def _forget(self, key):
+        if self.differ is not None:
+            self.differ.forget(key)
+
+    @instrumented
     def get_context(self, context_id):
         """
         Fetches data for a context
@@ -33,16 +139,31 @@ class ContextClient(object):
         :param context_id: The numeric id of the context
         :return: An OrderedDict with all information about the context
         """
+        key = ("id", str(context_id))
+        context = self._cached(key)
+        if context is not MISSING:
+            return context
+        with self._guarded(context_id):
+            return self._collapsed(("get_context", key[1]), self._fetch_context, context_id, key)
+
+    def _fetch_context(self, context_id, key):
+        template = self.templates.get("getData")
         try:
-            return zeep.helpers.serialize_object(
-                self.service.getData({"id": context_id}, self.auth)
-            )
-        except Fault as exceptional:
-            if str(exceptional) == 'Context does not exist':
-                raise exc.ContextNotFound("The context {} does not exist".format(context_id))
+            if template is not None:
+                context = self._serialize(self._read("get_context", template, context_id))
             else:
-                raise exceptional
+                context = self._serialize(
+                    self._read("get_context", self.service.getData, {"id": context_id}, self.auth)
+                )
+        except Fault as exceptional:
+            check_context_fault(exceptional, context_id, "getData")
+        self._remember(key, context)
+        self._observe([context])
+        if self.differ is not None:
+            self.differ.seen(("context", str(context_id)), context)
+        return context
 
+    @instrumented
     def list_context_for_domain(self, domain):
         """
         Fetches context record associated with a domain name
@@ -50,13 +171,39 @@ class ContextClient(object):
         :param domain: The domain name to be looked up
         :return: A dict containing the context record
         """
-        try:
-            return zeep.helpers.serialize_object(
-                self.service.list(domain, self.auth)
-            )
-        except Fault as exceptional:
-                raise exceptional
+        key = ("domain", domain)
+        contexts = self._cached(key)
+        if contexts is not MISSING:
+            return contexts
+        return self._collapsed(("list_context_for_domain", domain), self._fetch_domain, domain, key)
 
+    def _fetch_domain(self, domain, key):
+        # faults of list name no context and are re-raised as they are
+        contexts = self._serialize(
+            self._read("list_context_for_domain", self.service.list, domain, self.auth)
+        )
+        self._remember(key, contexts)
+        self._observe(contexts)
+        return contexts
+
+    @instrumented
+    def resolve_domain(self, domain):
+        """
+        Finds the context owning a domain, from the domain index when one is configured
+
+        :param domain: The domain name to be looked up
+        :return: the numeric id of the context
+        """
+        if self.domain_index is not None:
+            context_id = self.domain_index.resolve(domain)
+            if context_id is not None:
+                return context_id
+        for context in self.list_context_for_domain(domain) or ():
+            if domain.lower() in (mapping.lower() for mapping in context["loginMappings"] or ()):
+                return int(context["id"])
+        raise exc.DomainNotFound("The domain {} is not mapped to a context".format(domain))
+
+    @instrumented
     def create_context(self, context, admin_user):
         """
         Creates a context
@@ -64,31 +211,37 @@ class ContextClient(object):
         :param context: A dictionary representing the new context
         :param admin_user: A dictionary representing context admin
         """
+        self._forget(("context", str(context.get("id"))))
         try:
-            return zeep.helpers.serialize_object(
+            created = self._serialize(
                 self.service.create(context, admin_user, self.auth)
             )
+            self._observe([created])
+            return created
         except Fault as exceptional:
-            exc_message = str(exceptional)
-            if "This mapping is already in use" in exc_message:
-                raise exc.DomainInUse(exc_message)
-            else:
-                raise exceptional
+            check_context_fault(exceptional, context.get("id"), "create")
+        finally:
+            self._invalidate(context.get("id"), context.get("loginMappings") or ())
+            self._forget_missing(context.get("id"))
 
+    @instrumented
     def delete_context(self, context_id):
         """
         Delete a context
 
         :param context_id: The numeric id of the context
         """
+        self._forget(("context", str(context_id)))
         try:
             self.service.delete({"id": context_id}, self.auth)
         except Fault as exceptional:
-            if str(exceptional) == 'Context does not exist':
-                raise exc.ContextNotFound("The context {} does not exist".format(context_id))
-            else:
-                raise exceptional
+            check_context_fault(exceptional, context_id, "delete")
+        finally:
+            self._invalidate(context_id)
+        if self.domain_index is not None:
+            self.domain_index.forget(context_id)
 
+    @instrumented
     def update_context(self, context_id, context):
         """
         Update a context
@@ -99,13 +252,22 @@ class ContextClient(object):
         context["id"] = str(context_id)
         if "loginMappings" in context and context["id"] not in context["loginMappings"]:
             context["loginMappings"].append(context["id"])
+        key = ("context", str(context_id))
+        snapshot = None
+        if self.differ is not None:
+            # the snapshot is read from OX, never from the context cache which may be stale
+            snapshot = self.differ.snapshot(key, lambda: self._fetch_context(context_id, ("id", str(context_id))))
+            context = self.differ.reduce(snapshot, context, keep=("id",))
+            if context is None:
+                return
         try:
             self.service.change(context, self.auth)
         except Fault as exceptional:
-            exc_message = str(exceptional)
-            if exc_message == 'Context does not exist':
-                raise exc.ContextNotFound("The context {} does not exist".format(context_id))
-            elif "already exists in the system!" in exc_message:
-                raise exc.DomainInUse(exc_message)
-            else:
-                raise exceptional
+            self._forget(key)
+            check_context_fault(exceptional, context_id, "change")
+        finally:
+            self._invalidate(context_id, context.get("loginMappings") or ())
+        if self.differ is not None:
+            self.differ.applied(key, snapshot, context, keep=("id",))
+        if "loginMappings" in context:
+            self._observe([context])
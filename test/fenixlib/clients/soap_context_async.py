@@ -0,0 +1,124 @@
+"""
+Asyncio counterpart of the context Soap Client
+Operations are sent through zeep's httpx based AsyncTransport so many calls can be in flight
+from a single event loop. The wsdl is still loaded synchronously and shares the configured cache
+"""
+import zeep
+from zeep.exceptions import Fault
+from zeep.proxy import AsyncServiceProxy
+from zeep.transports import AsyncTransport
+from fenixlib.clients.cache import shared_cache
+from fenixlib.clients.converters import ObjectConverter
+from fenixlib.clients.metrics import InstrumentedAsyncTransport, instrumented
+from fenixlib.clients.transport import verify_ssl
+from fenixlib.utils.soapfaults import check_context_fault
+
+
+class AsyncContextClient(object):
+
+    def __init__(self, wsdl=None, auth=(None, None), cert_verify=None, cache=None, fast_serialize=False,
+                 metrics=None):
+        """
+        :param cert_verify: checks certificates as the sync clients do, see fenixlib.clients.transport.verify_ssl
+        :param fast_serialize: convert responses with compiled per type converters instead of serialize_object
+        :param metrics: optional metrics sink, e.g. fenixlib.clients.metrics.MetricsRegistry
+        """
+        options = {"cache": cache or shared_cache(), "verify_ssl": verify_ssl(cert_verify)}
+        self.metrics = metrics
+        if metrics is not None:
+            transport = InstrumentedAsyncTransport(metrics, **options)
+        else:
+            transport = AsyncTransport(**options)
+        self.client = zeep.AsyncClient(wsdl, transport=transport)
+        self.auth = self.client.get_type("ns5:Credentials")(login=auth[0],
+                                                            password=auth[1])
+        binding = self.client.wsdl.bindings[self.client.service._binding.name]
+        self.service = AsyncServiceProxy(self.client, binding,
+                                         address=self.client.service._binding_options['address'].replace(":80", "", 1))
+        self.converter = ObjectConverter(self.client.wsdl.types) if fast_serialize else None
+
+    def _serialize(self, obj):
+        if self.converter is not None:
+            return self.converter(obj)
+        return zeep.helpers.serialize_object(obj)
+
+    async def close(self):
+        """Closes the underlying http connections, of the operations and of the wsdl loading"""
+        await self.client.transport.aclose()
+        self.client.transport.wsdl_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @instrumented
+    async def get_context(self, context_id):
+        """
+        Fetches data for a context
+
+        :param context_id: The numeric id of the context
+        :return: An OrderedDict with all information about the context
+        """
+        try:
+            return self._serialize(
+                await self.service.getData({"id": context_id}, self.auth)
+            )
+        except Fault as exceptional:
+            check_context_fault(exceptional, context_id, "getData")
+
+    @instrumented
+    async def list_context_for_domain(self, domain):
+        """
+        Fetches context record associated with a domain name
+
+        :param domain: The domain name to be looked up
+        :return: A dict containing the context record
+        """
+        return self._serialize(
+            await self.service.list(domain, self.auth)
+        )
+
+    @instrumented
+    async def create_context(self, context, admin_user):
+        """
+        Creates a context
+
+        :param context: A dictionary representing the new context
+        :param admin_user: A dictionary representing context admin
+        """
+        try:
+            return self._serialize(
+                await self.service.create(context, admin_user, self.auth)
+            )
+        except Fault as exceptional:
+            check_context_fault(exceptional, context.get("id"), "create")
+
+    @instrumented
+    async def delete_context(self, context_id):
+        """
+        Delete a context
+
+        :param context_id: The numeric id of the context
+        """
+        try:
+            await self.service.delete({"id": context_id}, self.auth)
+        except Fault as exceptional:
+            check_context_fault(exceptional, context_id, "delete")
+
+    @instrumented
+    async def update_context(self, context_id, context):
+        """
+        Update a context
+
+        :param context_id: The numeric id of the context
+        :param context: the new context information to update to
+        """
+        context["id"] = str(context_id)
+        if "loginMappings" in context and context["id"] not in context["loginMappings"]:
+            context["loginMappings"].append(context["id"])
+        try:
+            await self.service.change(context, self.auth)
+        except Fault as exceptional:
+            check_context_fault(exceptional, context_id, "change")
@@ -1,31 +1,95 @@
 """
 Definition of Soap Client used by all methods
-Handles caching of wsdl globally in memory
+Handles caching of wsdl globally through the configured cache backend
 A requests session exists through the lifetime of the client
 """
 import zeep
-from requests import Session
 from zeep.exceptions import Fault
-from zeep.cache import InMemoryCache
 from fenixlib.utils.soapfaults import check_fault
+from fenixlib.clients.cache import NoCache, shared_cache
+from fenixlib.clients.converters import ObjectConverter
+from fenixlib.clients.bulk import run_bulk
+from fenixlib.clients.streaming import iter_operation_items
+from fenixlib.clients.envelopes import compile_templates
+from fenixlib.clients.transport import SoapTransport, build_session, transport_options
+from fenixlib.clients.metrics import InstrumentedTransport, instrumented
+from fenixlib.clients.negative import unguarded
 
-_cache = InMemoryCache(timeout=86400)
 
 class UserClient(object):
 
-    def __init__(self, wsdl=None, auth=(None, None), cert_verify=None):
+    def __init__(self, wsdl=None, auth=(None, None), cert_verify=None, cache=None, fast_serialize=False,
+                 precompiled=(), hedger=None, breakers=None,
+                 transport_profile=None, metrics=None, tape=None, differ=None, singleflight=None,
+                 negative_cache=None):
+        """
+        :param fast_serialize: convert responses with compiled per type converters instead of serialize_object
+        :param precompiled: operations sent from precompiled envelope templates, getData is supported
+        :param hedger: optional fenixlib.clients.hedging.Hedger sending slow reads a second time
+        :param breakers: optional fenixlib.clients.breaker.BreakerRegistry failing fast while OX is down
+        :param transport_profile: optional fenixlib.clients.transport.TransportProfile with pool sizes, timeouts
+            and retries, clients sharing a profile share their connections
+        :param metrics: optional metrics sink, e.g. fenixlib.clients.metrics.MetricsRegistry
+        :param tape: optional fenixlib.clients.recording.Recorder writing the exchanges with OX to an archive,
+            or Replayer answering from one instead of OX. Without a cache the client then caches no wsdl, so the
+            wsdl and schemas are recorded and replayed as well
+        :param differ: optional fenixlib.clients.diffing.ChangeDiffer, update_user then sends only the fields
+            which differ from the user as last read and skips the change call when none do
+        :param singleflight: optional fenixlib.clients.singleflight.SingleFlight, concurrent identical get_user
+            calls then share one request
+        :param negative_cache: optional fenixlib.clients.negative.NegativeCache, get_user and get_all_users then
+            raise ContextNotFound and UserNotFound for what OX recently reported missing without asking again
+        """
 
-        session = Session()
-        session.verify = cert_verify
+        session = build_session(cert_verify, breakers, transport_profile, tape)
+        if cache is None:
+            cache = NoCache() if tape is not None else shared_cache()
+        options = dict(transport_options(transport_profile), cache=cache, session=session)
+        self.metrics = metrics
+        if metrics is not None:
+            transport = InstrumentedTransport(metrics, **options)
+        else:
+            transport = SoapTransport(**options)
 
-        self.client = zeep.Client(wsdl,
-                                  transport=zeep.transports.Transport(cache=_cache, session=session))
+        self.client = zeep.Client(wsdl, transport=transport)
         self.auth = self.client.get_type("ns5:Credentials")(login=auth[0],
                                                             password=auth[1])
         self.service = self.client.create_service(self.client.service._binding.name,
                                                   self.client.service._binding_options['address'].replace(":80", "", 1))
         self.user = auth[0]
+        self.converter = ObjectConverter(self.client.wsdl.types) if fast_serialize else None
+        self.hedger = hedger
+        self.differ = differ
+        self.singleflight = singleflight
+        self.negative_cache = negative_cache
+        self.templates = compile_templates(self.client, self.service, precompiled, {
+            "getData": (lambda context_id, mailbox_uid: ({"id": context_id}, {"name": mailbox_uid}, self.auth), 2),
+        })
+
+    def _serialize(self, obj):
+        if self.converter is not None:
+            return self.converter(obj)
+        return zeep.helpers.serialize_object(obj)
+
+    def _read(self, operation, function, *args):
+        if self.hedger is None:
+            return function(*args)
+        return self.hedger.call(operation, function, *args)
+
+    def _guarded(self, context_id, mailbox_uid=None):
+        if self.negative_cache is None:
+            return unguarded()
+        return self.negative_cache.guard(context_id, mailbox_uid)
 
+    def _forget_missing(self, context_id, mailbox_uid):
+        if self.negative_cache is not None:
+            self.negative_cache.forget_user(context_id, mailbox_uid)
+
+    def _forget(self, key):
+        if self.differ is not None:
+            self.differ.forget(key)
+
+    @instrumented
     def create_user(self, context_id, user, product_type):
         """
         Create a new user in a context
@@ -35,8 +99,9 @@ class UserClient(object):
         :param product_type: string representing the product type (sku) they have
         :return: an OrderedDict representing the user created
         """
+        self._forget(("user", str(context_id), user["name"]))
         try:
-            return zeep.helpers.serialize_object(
+            return self._serialize(
                 self.service.createByModuleAccessName(
                     {"id": context_id},
                     user,
@@ -46,9 +111,12 @@ class UserClient(object):
             )
         except Fault as exceptional:
             check_fault(exceptional, context_id, user["name"])
+        finally:
+            self._forget_missing(context_id, user["name"])
 
 
 
+    @instrumented
     def update_user(self, context_id, mailbox_uid, user_diff):
         """
         Create a new user in a context
@@ -57,6 +125,13 @@ class UserClient(object):
         :param user_diff: A ContextUser dict containing only parameters to update
         """
         user_diff['name'] = mailbox_uid
+        key = ("user", str(context_id), mailbox_uid)
+        snapshot = None
+        if self.differ is not None:
+            snapshot = self.differ.snapshot(key, lambda: self.get_user(context_id, mailbox_uid))
+            user_diff = self.differ.reduce(snapshot, user_diff, keep=("name",))
+            if user_diff is None:
+                return
         try:
             self.service.change(
                 {"id": context_id},
@@ -64,9 +139,13 @@ class UserClient(object):
                 self.auth
             )
         except Fault as exceptional:
+            self._forget(key)
             check_fault(exceptional, context_id, mailbox_uid)
+        if self.differ is not None:
+            self.differ.applied(key, snapshot, user_diff, keep=("name",))
 
 
+    @instrumented
     def update_user_product(self, context_id, mailbox_uid, product_type):
         """
         Change a users capabilities
@@ -85,6 +164,7 @@ class UserClient(object):
         except Fault as exceptional:
             check_fault(exceptional, context_id, mailbox_uid)
 
+    @instrumented
     def get_all_users(self, context_id):
         """
         Fetches all users in a context
@@ -92,21 +172,40 @@ class UserClient(object):
         :param context_id: The numeric id of the context
         :return: a list of all users in the context
         """
+        with self._guarded(context_id):
+            return list(self.iter_all_users(context_id, chunk_size=None))
+
+    def iter_all_users(self, context_id, chunk_size=500, streaming=False):
+        """
+        Fetches all users in a context, requesting their data in chunks and yielding users as they arrive
+
+        :param context_id: The numeric id of the context
+        :param chunk_size: number of users requested per getMultipleData call, None requests all at once
+        :param streaming: parse each getMultipleData response incrementally, keeping one user in memory at a time
+        :return: a generator of all users in the context except the context admin
+        """
         exclude_users = False
         include_guests = False
         try:
             response = self.service.listAll({"id": context_id}, self.auth, include_guests, exclude_users)
             id_list = [{"id": user["id"]} for user in response]
-            output = zeep.helpers.serialize_object(
-                self.service.getMultipleData({"id": context_id}, id_list, self.auth)
-            )
-            for user in output:
-                if user["name"] == self.user:
-                    output.remove(user)
-            return output
+            chunk_size = chunk_size or len(id_list) or 1
+            for start in range(0, len(id_list), chunk_size):
+                if streaming:
+                    chunk = (self._serialize(user) for user in iter_operation_items(
+                        self.client, self.service, "getMultipleData",
+                        {"id": context_id}, id_list[start:start + chunk_size], self.auth))
+                else:
+                    chunk = self._serialize(
+                        self.service.getMultipleData({"id": context_id}, id_list[start:start + chunk_size], self.auth)
+                    )
+                for user in chunk:
+                    if user["name"] != self.user:
+                        yield user
         except Fault as exceptional:
             check_fault(exceptional, context_id)
 
+    @instrumented
     def get_user(self, context_id, mailbox_uid):
         """
         Fetches a specific user in a context
@@ -115,18 +214,35 @@ class UserClient(object):
         :param mailbox_uid: the uuid identifying the user
         :return: an OrderedDict representing the user
         """
+        with self._guarded(context_id, mailbox_uid):
+            if self.singleflight is not None:
+                return self.singleflight.call(("get_user", str(context_id), mailbox_uid), self._fetch_user,
+                                              context_id, mailbox_uid)
+            return self._fetch_user(context_id, mailbox_uid)
+
+    def _fetch_user(self, context_id, mailbox_uid):
+        template = self.templates.get("getData")
         try:
-            return zeep.helpers.serialize_object(
-                self.service.getData(
-                    {"id": context_id},
-                    {"name": mailbox_uid},
-                    self.auth
+            if template is not None:
+                user = self._serialize(self._read("get_user", template, context_id, mailbox_uid))
+            else:
+                user = self._serialize(
+                    self._read(
+                        "get_user",
+                        self.service.getData,
+                        {"id": context_id},
+                        {"name": mailbox_uid},
+                        self.auth
+                    )
                 )
-            )
         except Fault as exceptional:
             check_fault(exceptional, context_id, mailbox_uid)
+        if self.differ is not None:
+            self.differ.seen(("user", str(context_id), mailbox_uid), user)
+        return user
 
 
+    @instrumented
     def delete_user(self, context_id, mailbox_uid):
         """
         Delete a user from a context
@@ -134,6 +250,7 @@ class UserClient(object):
         :param context_id: The numeric id of the context
         :param mailbox_uid: the uuid identifying the user
         """
+        self._forget(("user", str(context_id), mailbox_uid))
         try:
             self.service.delete(
                 {"id": context_id},
@@ -142,3 +259,43 @@ class UserClient(object):
             )
         except Fault as exceptional:
             check_fault(exceptional, context_id, mailbox_uid)
+
+    def create_users(self, context_id, users, product_type, concurrency=8, fail_fast=False):
+        """
+        Create many users in a context through a bounded pool of workers
+
+        :param context_id: The numeric id of the context
+        :param users: iterable of ContextUser dicts
+        :param product_type: string representing the product type (sku) they have
+        :param concurrency: maximum number of create calls in flight
+        :param fail_fast: stop creating users after the first error
+        :return: a list of BulkItemResult in the order of users, errors hold the mapped exception
+        """
+        return run_bulk(lambda user: self.create_user(context_id, user, product_type),
+                        users, concurrency, fail_fast)
+
+    def update_users(self, context_id, user_diffs, concurrency=8, fail_fast=False):
+        """
+        Update many users in a context through a bounded pool of workers
+
+        :param context_id: The numeric id of the context
+        :param user_diffs: iterable of (mailbox_uid, user_diff) pairs
+        :param concurrency: maximum number of change calls in flight
+        :param fail_fast: stop updating users after the first error
+        :return: a list of BulkItemResult in the order of user_diffs, errors hold the mapped exception
+        """
+        return run_bulk(lambda pair: self.update_user(context_id, pair[0], pair[1]),
+                        user_diffs, concurrency, fail_fast)
+
+    def delete_users(self, context_id, mailbox_uids, concurrency=8, fail_fast=False):
+        """
+        Delete many users from a context through a bounded pool of workers
+
+        :param context_id: The numeric id of the context
+        :param mailbox_uids: iterable of uuids identifying the users
+        :param concurrency: maximum number of delete calls in flight
+        :param fail_fast: stop deleting users after the first error
+        :return: a list of BulkItemResult in the order of mailbox_uids, errors hold the mapped exception
+        """
+        return run_bulk(lambda mailbox_uid: self.delete_user(context_id, mailbox_uid),
+                        mailbox_uids, concurrency, fail_fast)
@@ -0,0 +1,186 @@
+"""
+Asyncio counterpart of the user Soap Client
+Operations are sent through zeep's httpx based AsyncTransport so many calls can be in flight
+from a single event loop. The wsdl is still loaded synchronously and shares the configured cache
+"""
+import zeep
+from zeep.exceptions import Fault
+from zeep.proxy import AsyncServiceProxy
+from zeep.transports import AsyncTransport
+from fenixlib.clients.cache import shared_cache
+from fenixlib.clients.converters import ObjectConverter
+from fenixlib.clients.metrics import InstrumentedAsyncTransport, instrumented
+from fenixlib.clients.transport import verify_ssl
+from fenixlib.utils.soapfaults import check_fault
+
+
+class AsyncUserClient(object):
+
+    def __init__(self, wsdl=None, auth=(None, None), cert_verify=None, cache=None, fast_serialize=False,
+                 metrics=None):
+        """
+        :param cert_verify: checks certificates as the sync clients do, see fenixlib.clients.transport.verify_ssl
+        :param fast_serialize: convert responses with compiled per type converters instead of serialize_object
+        :param metrics: optional metrics sink, e.g. fenixlib.clients.metrics.MetricsRegistry
+        """
+        options = {"cache": cache or shared_cache(), "verify_ssl": verify_ssl(cert_verify)}
+        self.metrics = metrics
+        if metrics is not None:
+            transport = InstrumentedAsyncTransport(metrics, **options)
+        else:
+            transport = AsyncTransport(**options)
+        self.client = zeep.AsyncClient(wsdl, transport=transport)
+        self.auth = self.client.get_type("ns5:Credentials")(login=auth[0],
+                                                            password=auth[1])
+        binding = self.client.wsdl.bindings[self.client.service._binding.name]
+        self.service = AsyncServiceProxy(self.client, binding,
+                                         address=self.client.service._binding_options['address'].replace(":80", "", 1))
+        self.user = auth[0]
+        self.converter = ObjectConverter(self.client.wsdl.types) if fast_serialize else None
+
+    def _serialize(self, obj):
+        if self.converter is not None:
+            return self.converter(obj)
+        return zeep.helpers.serialize_object(obj)
+
+    async def close(self):
+        """Closes the underlying http connections, of the operations and of the wsdl loading"""
+        await self.client.transport.aclose()
+        self.client.transport.wsdl_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @instrumented
+    async def create_user(self, context_id, user, product_type):
+        """
+        Create a new user in a context
+
+        :param context_id: The numeric id of the context
+        :param user: A ContextUser dict
+        :param product_type: string representing the product type (sku) they have
+        :return: an OrderedDict representing the user created
+        """
+        try:
+            return self._serialize(
+                await self.service.createByModuleAccessName(
+                    {"id": context_id},
+                    user,
+                    product_type,
+                    self.auth
+                )
+            )
+        except Fault as exceptional:
+            check_fault(exceptional, context_id, user["name"])
+
+    @instrumented
+    async def update_user(self, context_id, mailbox_uid, user_diff):
+        """
+        Update an existing user in a context
+
+        :param context_id: The numeric id of the context
+        :param user_diff: A ContextUser dict containing only parameters to update
+        """
+        user_diff['name'] = mailbox_uid
+        try:
+            await self.service.change(
+                {"id": context_id},
+                user_diff,
+                self.auth
+            )
+        except Fault as exceptional:
+            check_fault(exceptional, context_id, mailbox_uid)
+
+    @instrumented
+    async def update_user_product(self, context_id, mailbox_uid, product_type):
+        """
+        Change a users capabilities
+
+        :param context_id: The numeric id of the context
+        :param mailbox_uid: the uuid identifying the user
+        :param product_type: string representing the product type (sku) to change to
+        """
+        try:
+            return await self.service.changeByModuleAccessName(
+                {"id": context_id},
+                {"name": mailbox_uid},
+                product_type,
+                self.auth
+            )
+        except Fault as exceptional:
+            check_fault(exceptional, context_id, mailbox_uid)
+
+    @instrumented
+    async def get_all_users(self, context_id):
+        """
+        Fetches all users in a context
+
+        :param context_id: The numeric id of the context
+        :return: a list of all users in the context
+        """
+        return [user async for user in self.iter_all_users(context_id, chunk_size=None)]
+
+    async def iter_all_users(self, context_id, chunk_size=500):
+        """
+        Fetches all users in a context, requesting their data in chunks and yielding users as they arrive
+
+        :param context_id: The numeric id of the context
+        :param chunk_size: number of users requested per getMultipleData call, None requests all at once
+        :return: an async generator of all users in the context except the context admin
+        """
+        exclude_users = False
+        include_guests = False
+        try:
+            response = await self.service.listAll({"id": context_id}, self.auth, include_guests, exclude_users)
+            id_list = [{"id": user["id"]} for user in response]
+            chunk_size = chunk_size or len(id_list) or 1
+            for start in range(0, len(id_list), chunk_size):
+                chunk = self._serialize(
+                    await self.service.getMultipleData({"id": context_id}, id_list[start:start + chunk_size],
+                                                       self.auth)
+                )
+                for user in chunk:
+                    if user["name"] != self.user:
+                        yield user
+        except Fault as exceptional:
+            check_fault(exceptional, context_id)
+
+    @instrumented
+    async def get_user(self, context_id, mailbox_uid):
+        """
+        Fetches a specific user in a context
+
+        :param context_id: The numeric id of the context
+        :param mailbox_uid: the uuid identifying the user
+        :return: an OrderedDict representing the user
+        """
+        try:
+            return self._serialize(
+                await self.service.getData(
+                    {"id": context_id},
+                    {"name": mailbox_uid},
+                    self.auth
+                )
+            )
+        except Fault as exceptional:
+            check_fault(exceptional, context_id, mailbox_uid)
+
+    @instrumented
+    async def delete_user(self, context_id, mailbox_uid):
+        """
+        Delete a user from a context
+
+        :param context_id: The numeric id of the context
+        :param mailbox_uid: the uuid identifying the user
+        """
+        try:
+            await self.service.delete(
+                {"id": context_id},
+                {"name": mailbox_uid},
+                self.auth
+            )
+        except Fault as exceptional:
+            check_fault(exceptional, context_id, mailbox_uid)
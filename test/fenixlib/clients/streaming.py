@@ -0,0 +1,69 @@
+"""
+Streaming parse of soap responses which return a long list of items
+The response body is read in chunks and fed to an incremental xml parser. Each returned item is
+parsed with the zeep type of the operation's return element as soon as its closing tag arrives and
+is then discarded, so memory stays bounded by the size of one item no matter how long the list is
+"""
+from contextlib import closing
+from lxml import etree
+from zeep.exceptions import Fault, TransportError
+from zeep.wsdl.utils import etree_to_string
+
+SOAP_ENV = "http://schemas.xmlsoap.org/soap/envelope/"
+FAULT_TAG = "{%s}Fault" % SOAP_ENV
+
+
+def _return_element(operation):
+    """Finds the element definition of the items in the operation's response wrapper"""
+    elements = operation.output.body.type.elements
+    if len(elements) != 1:
+        raise ValueError("Operation {} does not return a single list".format(operation.name))
+    return elements[0][1]
+
+
+def _parse_fault(element):
+    message = element.findtext("faultstring")
+    code = element.findtext("faultcode")
+    return Fault(message=message, code=code, detail=element.find("detail"))
+
+
+def iter_operation_items(client, service, operation_name, *args, chunk_size=65536):
+    """
+    Calls a soap operation and yields the items of its response as they are parsed
+
+    :param client: the zeep.Client the service belongs to, its transport a
+        fenixlib.clients.transport.SoapTransport
+    :param service: the bound service proxy to call
+    :param operation_name: name of an operation returning a list of items
+    :param args: the operation arguments
+    :param chunk_size: number of bytes read from the socket at a time
+    :return: a generator of zeep objects, one per returned item
+    """
+    binding = service._binding
+    item_element = _return_element(binding.get(operation_name))
+    # the binding sets the soap version's content type and action headers, as for a call through zeep
+    envelope, headers = binding._create(operation_name, args, {}, client=client, options=service._binding_options)
+    response = client.transport.post(service._binding_options["address"], etree_to_string(envelope), headers,
+                                      stream=True)
+
+    with closing(response):
+        parser = etree.XMLPullParser(events=("end",))
+        item_tag = item_element.qname.text if item_element.qname is not None else item_element.name
+        received = False
+        for chunk in response.iter_content(chunk_size):
+            received = True
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                if element.tag == item_tag:
+                    yield item_element.parse(element, client.wsdl.types)
+                elif element.tag == FAULT_TAG:
+                    raise _parse_fault(element)
+                else:
+                    continue
+                # drop the parsed item and everything before it
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+        if response.status_code != 200 or not received:
+            raise TransportError(status_code=response.status_code)
+        parser.close()
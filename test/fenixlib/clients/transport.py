@@ -0,0 +1,127 @@
+"""
+Http session and timeout settings of the soap clients
+A TransportProfile owns one requests adapter, and with it one urllib3 pool per OX host, which every client
+built from the profile mounts. Clients talking to the same host therefore reuse each other's keep-alive
+connections instead of each paying for its own connects and TLS handshakes
+"""
+import os
+import ssl
+import threading
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from zeep.transports import Transport
+from fenixlib.clients.breaker import BreakerSession
+
+
+class SoapTransport(Transport):
+    """zeep Transport which can leave the body of a response unread, for responses parsed as they arrive"""
+
+    def post(self, address, message, headers, stream=False):
+        """
+        Posts a soap message
+
+        :param stream: return as soon as the headers arrived, the body is read through the response
+        """
+        if not stream:
+            return super(SoapTransport, self).post(address, message, headers)
+        return self.session.post(address, data=message, headers=headers, timeout=self.operation_timeout,
+                                 stream=True)
+
+
+class TransportProfile(object):
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, connect_timeout=None,
+                 read_timeout=300, operation_timeout=None, retries=0):
+        """
+        :param pool_connections: number of hosts a pool is kept for
+        :param pool_maxsize: keep-alive connections kept per host, size it to the threads calling OX
+        :param pool_block: wait for a free connection instead of opening one beyond pool_maxsize
+        :param connect_timeout: seconds to establish a connection, None waits forever
+        :param read_timeout: seconds to wait for data while loading the wsdl and schemas
+        :param operation_timeout: seconds to wait for data during a soap call, None waits forever
+        :param retries: times a connection is attempted again when it could not be established. A request
+            which was sent is never resent: after a read timeout or a reset OX may have executed a create,
+            change or delete already
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.operation_timeout = operation_timeout
+        self.retries = retries
+        self._adapter = None
+        self._lock = threading.Lock()
+
+    @property
+    def adapter(self):
+        """The HTTPAdapter shared by every session of this profile"""
+        if self._adapter is None:
+            with self._lock:
+                if self._adapter is None:
+                    # read=False raises errors after the request was sent as they are, nothing is resent
+                    retry = Retry(total=self.retries, connect=self.retries, read=False, redirect=0, status=0,
+                                  other=0, raise_on_status=False)
+                    self._adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                                pool_maxsize=self.pool_maxsize, max_retries=retry,
+                                                pool_block=self.pool_block)
+        return self._adapter
+
+    def transport_options(self):
+        """Keyword arguments of zeep.transports.Transport"""
+        operation_timeout = None
+        if self.connect_timeout is not None or self.operation_timeout is not None:
+            operation_timeout = (self.connect_timeout, self.operation_timeout)
+        return {"timeout": (self.connect_timeout, self.read_timeout), "operation_timeout": operation_timeout}
+
+    def close(self):
+        """Closes the pooled connections of every client using this profile"""
+        with self._lock:
+            if self._adapter is not None:
+                self._adapter.close()
+                self._adapter = None
+
+
+def build_session(cert_verify=None, breakers=None, profile=None, tape=None):
+    """
+    Builds the requests session of a soap client
+
+    :param cert_verify: passed on as session.verify
+    :param breakers: optional BreakerRegistry the session sends every request through
+    :param profile: optional TransportProfile whose shared adapter is mounted
+    :param tape: optional fenixlib.clients.recording Recorder or Replayer wrapping the mounted adapter
+    :return: a requests.Session
+    """
+    session = BreakerSession(breakers) if breakers is not None else Session()
+    session.verify = cert_verify
+    adapter = profile.adapter if profile is not None else None
+    if tape is not None:
+        adapter = tape.adapter(adapter)
+    if adapter is not None:
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+def verify_ssl(cert_verify=None):
+    """
+    The verify_ssl of zeep's AsyncTransport which checks certificates as build_session's session does with
+    cert_verify. requests verifies a None session.verify only against a CA bundle named in REQUESTS_CA_BUNDLE
+    or CURL_CA_BUNDLE, and not at all without one
+
+    :param cert_verify: what the sync clients set as session.verify, a bool or the path of a CA bundle
+    :return: a bool, or an ssl.SSLContext trusting the CA bundle
+    """
+    if cert_verify is None:
+        cert_verify = os.environ.get("REQUESTS_CA_BUNDLE") or os.environ.get("CURL_CA_BUNDLE") or False
+    if isinstance(cert_verify, str):
+        if os.path.isdir(cert_verify):
+            return ssl.create_default_context(capath=cert_verify)
+        return ssl.create_default_context(cafile=cert_verify)
+    return cert_verify
+
+
+def transport_options(profile=None):
+    """Keyword arguments of zeep.transports.Transport for an optional TransportProfile"""
+    return profile.transport_options() if profile is not None else {}
@@ -10,6 +10,14 @@ LOGGING_DIR = os.environ.get("FENIX_LOGDIR", '/var/log/fenix/')
 LOGGING_FILENAME = "fenix_admin_custom.log"
 LOGGING_LEVEL = os.environ.get("FENIX_LOG_LEVEL", 'WARNING')
 
+# WSDL cache config, backend is one of memory, file or sqlite
+OX_WSDL_CACHE = os.environ.get("OX_WSDL_CACHE", "memory")
+OX_WSDL_CACHE_PATH = os.environ.get("OX_WSDL_CACHE_PATH")
+OX_WSDL_CACHE_TIMEOUT = int(os.environ.get("OX_WSDL_CACHE_TIMEOUT", 86400))
+
+# Recent domain and email validation verdicts kept by the schema fields
+VALIDATION_CACHE_SIZE = int(os.environ.get("VALIDATION_CACHE_SIZE", 16384))
+
 VALID_THEMES = ["godaddy"]
 
 # Enforces authorization on contexts. Only the creator can subsequently read/write
@@ -0,0 +1,81 @@
+"""
+Codec between OX's userAttributes and a flat mapping
+OX sends userAttributes as a SOAPStringMapMap, nested entries lists of namespaces holding entries lists of keys:
+{"entries": [{"key": "config", "value": {"entries": [{"key": "io.ox/core//theme", "value": "io.ox.godaddy"}]}}]}
+decode turns that into {"config": {"io.ox/core//theme": "io.ox.godaddy"}} so every attribute is one dict lookup,
+encode turns it back and changes keeps only what differs, which is all a change call has to send
+"""
+
+THEME_NAMESPACE = "config"
+THEME_KEY = "io.ox/core//theme"
+
+
+def decode(attributes):
+    """
+    Flattens userAttributes into {namespace: {key: value}}
+
+    :param attributes: userAttributes as OX sends them, None for none
+    """
+    flat = {}
+    if attributes is None:
+        return flat
+    for namespace in attributes["entries"] or ():
+        values = flat.setdefault(namespace["key"], {})
+        if namespace["value"] is not None:
+            for entry in namespace["value"]["entries"] or ():
+                values[entry["key"]] = entry["value"]
+    return flat
+
+
+def encode(flat):
+    """
+    Nests a {namespace: {key: value}} mapping into userAttributes, namespaces without attributes are left out
+
+    :param flat: the mapping, as decode returns it
+    """
+    return {"entries": [
+        {"key": namespace, "value": {"entries": [{"key": key, "value": value} for key, value in values.items()]}}
+        for namespace, values in flat.items() if values]}
+
+
+def changes(current, desired):
+    """
+    The attributes of desired which current lacks or holds a different value for, as a flat mapping
+
+    Attributes only current holds are not part of it: OX leaves attributes a change call does not send alone,
+    so sending the changes has the same effect as sending all of desired
+
+    :param current: flat mapping of the attributes OX holds
+    :param desired: flat mapping of the attributes wanted
+    """
+    changed = {}
+    for namespace, values in desired.items():
+        held = current.get(namespace, {})
+        differing = {key: value for key, value in values.items() if key not in held or held[key] != value}
+        if differing:
+            changed[namespace] = differing
+    return changed
+
+
+def merge(current, update):
+    """
+    The flat mapping OX holds after a change call sending update, attributes not sent keep their values
+
+    :param current: flat mapping of the attributes OX holds
+    :param update: flat mapping of the attributes sent
+    """
+    merged = dict((namespace, dict(values)) for namespace, values in current.items())
+    for namespace, values in update.items():
+        merged.setdefault(namespace, {}).update(values)
+    return merged
+
+
+def theme(flat):
+    """The theme name set in a flat mapping, None when there is none"""
+    value = flat.get(THEME_NAMESPACE, {}).get(THEME_KEY)
+    return value.split('.')[-1] if value is not None else None
+
+
+def with_theme(theme_name):
+    """A flat mapping setting the theme"""
+    return {THEME_NAMESPACE: {THEME_KEY: 'io.ox.{theme}'.format(theme=theme_name)}}
@@ -0,0 +1,219 @@
+"""
+Compiled load and dump for marshmallow schemas
+Schema.load and Schema.dump build an (un)marshaller per call, dispatch through every field generically and look
+up the pre/post processors by tag for every record. CompiledSchema generates one python function per schema
+and direction instead, which reads the declared fields directly, converts the plain field types inline and calls
+the schema's post_load, pre_dump and post_dump hooks the way marshmallow does.
+The compiled functions only handle records which pass: any record failing a field, a validator or a hook is
+loaded or dumped again by the schema itself, so results and errors stay the same as marshmallow's. Hooks of a
+failed record therefore run a second time, which the hooks of fenixlib's schemas are safe for
+"""
+from marshmallow import fields, missing
+from marshmallow.decorators import PRE_DUMP, POST_DUMP, PRE_LOAD, POST_LOAD, VALIDATES, VALIDATES_SCHEMA
+from marshmallow.schema import BaseSchema, MarshalResult, UnmarshalResult
+from marshmallow.utils import ensure_text_type, set_value
+
+
+class _Fallback(Exception):
+    """Raised by compiled code for records the schema has to handle"""
+
+
+def _processors(schema, tag):
+    return [getattr(schema, name) for name in schema.__processors__[(tag, False)]]
+
+
+def _compilable(schema):
+    """Schemas using features the compiled functions do not reproduce keep using marshmallow"""
+    processors = schema.__processors__
+    if processors[(PRE_LOAD, False)] or processors[(VALIDATES, False)] or processors[(VALIDATES_SCHEMA, False)]:
+        return False
+    if any(processors[(tag, True)] for tag in (PRE_DUMP, POST_DUMP, PRE_LOAD, POST_LOAD, VALIDATES_SCHEMA)):
+        return False
+    for tag in (PRE_DUMP, POST_DUMP, POST_LOAD):
+        for processor in _processors(schema, tag):
+            if processor.__marshmallow_kwargs__[(tag, False)].get("pass_original", False):
+                return False
+    return (not schema.prefix and not schema.partial and not schema.extra
+            and type(schema).get_attribute is BaseSchema.get_attribute
+            and not getattr(schema, "__error_handler__", None))
+
+
+def _hooks(lines, indent, names, target):
+    for name in names:
+        lines.append("{}returned = {}({})".format(indent, name, target))
+        lines.append("{}if returned is not None:".format(indent))
+        lines.append("{}    {} = returned".format(indent, target))
+
+
+def _store(key, expression):
+    if "." in key:
+        return "set_value(result, {!r}, {})".format(key, expression)
+    return "result[{!r}] = {}".format(key, expression)
+
+
+def _load_source(schema, namespace):
+    lines = ["def load_one(data):",
+             "    if type(data) is not dict:",
+             "        raise Fallback()",
+             "    get = data.get",
+             "    result = dict_class()"]
+    for index, (name, field) in enumerate(schema.fields.items()):
+        if field.dump_only:
+            continue
+        field_name = "field_{}".format(index)
+        namespace[field_name] = field
+        key = field.attribute or name
+        lines.append("    value = get({!r}, MISSING)".format(name))
+        if field.load_from:
+            lines.append("    if value is MISSING:")
+            lines.append("        value = get({!r}, MISSING)".format(field.load_from))
+        lines.append("    if value is MISSING:")
+        if field.missing is not missing:
+            lines.append("        value = {0}.missing() if callable({0}.missing) else {0}.missing".format(field_name))
+        elif field.required:
+            lines.append("        raise Fallback()")
+        else:
+            lines.append("        pass")
+        lines.append("    if value is not MISSING:")
+
+        # the types converted inline behave exactly like their _deserialize, anything else goes through the field
+        field_type = type(field)
+        if field_type is fields.String:
+            expression = "value if type(value) is str else {}._deserialize(value, {!r}, data)".format(
+                field_name, field.load_from or name)
+        elif field_type is fields.Integer:
+            expression = "int(value)"
+        elif field_type is fields.Dict:
+            expression = "value if type(value) is dict else {}._deserialize(value, {!r}, data)".format(
+                field_name, field.load_from or name)
+        else:
+            lines.append("        " + _store(key, "{}.deserialize(value, {!r}, data)".format(
+                field_name, field.load_from or name)))
+            continue
+        lines.append("        if value is None:")
+        lines.append("            " + (_store(key, "None") if field.allow_none is True else "raise Fallback()"))
+        lines.append("        else:")
+        if field.validators:
+            lines.append("            value = " + expression)
+            lines.append("            {}._validate(value)".format(field_name))
+            lines.append("            " + _store(key, "value"))
+        else:
+            lines.append("            " + _store(key, expression))
+
+    hooks = []
+    for index, processor in enumerate(_processors(schema, POST_LOAD)):
+        namespace["post_load_{}".format(index)] = processor
+        hooks.append("post_load_{}".format(index))
+    _hooks(lines, "    ", hooks, "result")
+    lines.append("    return result")
+    return "\n".join(lines) + "\n"
+
+
+def _dump_source(schema, namespace):
+    lines = ["def dump_one(obj):",
+             "    if type(obj) is not dict:",
+             "        raise Fallback()"]
+    hooks = []
+    for index, processor in enumerate(_processors(schema, PRE_DUMP)):
+        namespace["pre_dump_{}".format(index)] = processor
+        hooks.append("pre_dump_{}".format(index))
+    _hooks(lines, "    ", hooks, "obj")
+    if hooks:
+        lines.append("    if type(obj) is not dict:")
+        lines.append("        raise Fallback()")
+    lines.append("    get = obj.get")
+    lines.append("    result = dict_class()")
+
+    for index, (name, field) in enumerate(schema.fields.items()):
+        if field.load_only:
+            continue
+        field_name = "field_{}".format(index)
+        namespace[field_name] = field
+        key = field.dump_to or name
+        attribute = field.attribute or name
+        field_type = type(field)
+        # dict.get matches marshmallow's lookup unless the key names a dict attribute or a nested path
+        plain = (field._CHECK_ATTRIBUTE and "." not in attribute and not hasattr(dict, attribute)
+                 and not (isinstance(field, fields.List) and field.container.attribute))
+        if not plain:
+            lines.append("    value = {}.serialize({!r}, obj, accessor=accessor)".format(field_name, name))
+            lines.append("    if value is not MISSING:")
+            lines.append("        result[{!r}] = value".format(key))
+            continue
+
+        lines.append("    value = get({!r}, MISSING)".format(attribute))
+        lines.append("    if value is MISSING:")
+        if field.default is missing:
+            lines.append("        pass")
+        elif callable(field.default):
+            lines.append("        result[{!r}] = {}.default()".format(key, field_name))
+        else:
+            lines.append("        result[{!r}] = {}.default".format(key, field_name))
+        lines.append("    else:")
+        if field_type is fields.String:
+            expression = "value if type(value) is str else None if value is None else ensure_text_type(value)"
+        elif field_type is fields.Integer and not field.as_string:
+            expression = "None if value is None else int(value)"
+        elif field_type in (fields.Dict, fields.Raw, fields.Field):
+            expression = "value"
+        else:
+            expression = "{}._serialize(value, {!r}, obj)".format(field_name, name)
+        lines.append("        result[{!r}] = {}".format(key, expression))
+
+    hooks = []
+    for index, processor in enumerate(_processors(schema, POST_DUMP)):
+        namespace["post_dump_{}".format(index)] = processor
+        hooks.append("post_dump_{}".format(index))
+    _hooks(lines, "    ", hooks, "result")
+    lines.append("    return result")
+    return "\n".join(lines) + "\n"
+
+
+class CompiledSchema(object):
+    """
+    Loads and dumps like a marshmallow schema instance, with functions compiled for it
+
+    :param schema: the schema instance, e.g. ImapUser()
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.load_one = None
+        self.dump_one = None
+        if _compilable(schema):
+            namespace = {"Fallback": _Fallback, "MISSING": missing, "dict_class": schema.dict_class,
+                         "ensure_text_type": ensure_text_type, "set_value": set_value,
+                         "accessor": schema.get_attribute}
+            name = type(schema).__name__
+            exec(compile(_load_source(schema, namespace), "<load {}>".format(name), "exec"), namespace)
+            exec(compile(_dump_source(schema, namespace), "<dump {}>".format(name), "exec"), namespace)
+            self.load_one = namespace["load_one"]
+            self.dump_one = namespace["dump_one"]
+
+    def load(self, data, many=None):
+        """Same as schema.load(data, many), returns an UnmarshalResult"""
+        many = self.schema.many if many is None else bool(many)
+        if self.load_one is not None:
+            try:
+                if many:
+                    if type(data) is not list:
+                        raise _Fallback()
+                    return UnmarshalResult([self.load_one(item) for item in data], {})
+                return UnmarshalResult(self.load_one(data), {})
+            except Exception:
+                pass
+        return self.schema.load(data, many=many)
+
+    def dump(self, obj, many=None):
+        """Same as schema.dump(obj, many), returns a MarshalResult"""
+        many = self.schema.many if many is None else bool(many)
+        if self.dump_one is not None:
+            try:
+                if many:
+                    if type(obj) is not list:
+                        raise _Fallback()
+                    return MarshalResult([self.dump_one(item) for item in obj], {})
+                return MarshalResult(self.dump_one(obj), {})
+            except Exception:
+                pass
+        return self.schema.dump(obj, many=many)
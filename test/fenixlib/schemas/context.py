@@ -5,6 +5,7 @@ Schema definitions representing a Context
 from fenixlib import config
 import datetime
 from marshmallow import Schema, fields, validate, pre_dump, post_load, post_dump
+from fenixlib.schemas import attributes
 from fenixlib.schemas.custom_fields import OXDomain
 
 
@@ -92,24 +93,9 @@ class ContextAccessSchema(Schema):
 
 def envelope_theme(theme):
     """Wraps a theme in the userattribute envelope"""
-    return {'entries':
-                [
-                    {
-                        'key': 'config',
-                        'value':
-                            {
-                                'entries': [
-                                    {
-                                        'key': 'io.ox/core//theme',
-                                        'value': 'io.ox.{theme}'.format(theme=theme)
-                                    }
-    ]}}]}
-
-
-def denvelope_theme(attributes):
+    return attributes.encode(attributes.with_theme(theme))
+
+
+def denvelope_theme(user_attributes):
     """Remove the theme name from the user attribute object"""
-    for entry in attributes["entries"]:
-        if entry["key"] == "config":
-            for attribute in entry["value"]["entries"]:
-                if attribute["key"] == "io.ox/core//theme":
-                    return attribute["value"].split('.')[-1]
+    return attributes.theme(attributes.decode(user_attributes))
@@ -1,9 +1,61 @@
 from marshmallow import validate
 from marshmallow import fields
+from marshmallow.exceptions import ValidationError
+from fenixlib import config
+from fenixlib.utils.addresses import is_domain, is_email
+import functools
 import re
 
+# Verdicts on the most recent values, a verdict depends on the value alone and never goes stale.
+# The checks accept exactly what the DOMAIN_REGEX and USER_REGEX patterns below match, in linear time.
+# Only values no longer than a dns name or an address are remembered, so long hostile values take no cache space
+MAX_CACHED_DOMAIN = 253
+MAX_CACHED_EMAIL = 320
+_domain_verdicts = functools.lru_cache(maxsize=config.VALIDATION_CACHE_SIZE)(is_domain)
+_email_verdicts = functools.lru_cache(maxsize=config.VALIDATION_CACHE_SIZE)(is_email)
+
+
+def domain_verdict(value):
+    """Whether value is a domain, remembered for values up to MAX_CACHED_DOMAIN characters"""
+    if len(value) > MAX_CACHED_DOMAIN:
+        return is_domain(value)
+    return _domain_verdicts(value)
+
+
+def email_verdict(value):
+    """Whether value is an email address, remembered for values up to MAX_CACHED_EMAIL characters"""
+    if len(value) > MAX_CACHED_EMAIL:
+        return is_email(value)
+    return _email_verdicts(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled(regex):
+    """A DOMAIN_REGEX compiled once per pattern string"""
+    return re.compile(regex)
+
+
+def verdict_stats():
+    """Returns hits, misses, size and hit rate of the domain and email verdict caches"""
+    stats = {}
+    for name, verdict in (("domains", _domain_verdicts), ("emails", _email_verdicts)):
+        info = verdict.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize,
+                       "hit_rate": info.hits / lookups if lookups else 0.0}
+    return stats
+
+
+def clear_verdicts():
+    _domain_verdicts.cache_clear()
+    _email_verdicts.cache_clear()
+
 
 class OXValidatorEmail(validate.Email):
+    """
+    Validates emails with the cached linear time check, subclasses overriding USER_REGEX or DOMAIN_REGEX are
+    validated with their patterns instead
+    """
 
     USER_REGEX = re.compile(
         r"(\A[a-zA-Z0-9!#$+\-^_~'&]{1,64}\Z"
@@ -20,23 +72,34 @@ class OXValidatorEmail(validate.Email):
 
     def __init__(self, error=None):
         super(OXValidatorEmail, self).__init__(error)
+        self._verdict = email_verdict if (self.USER_REGEX is OXValidatorEmail.USER_REGEX and
+                                          self.DOMAIN_REGEX is OXValidatorEmail.DOMAIN_REGEX) else None
+
+    def __call__(self, value):
+        if type(value) is not str or self._verdict is None:
+            return super(OXValidatorEmail, self).__call__(value)
+        if not self._verdict(value):
+            raise ValidationError(self._format_error(value))
+        return value
 
 
 class OXEmail(fields.Email):
 
     def __init__(self, *args, **kwargs):
         super(OXEmail, self).__init__(*args, **kwargs)
-        self.validators[0] =  OXValidatorEmail(error=self.error_messages['invalid'])
+        self.validators[0] = self._validator = OXValidatorEmail(error=self.error_messages['invalid'])
 
     def _validated(self, value):
         if value is None:
             return None
-        return OXValidatorEmail(
-            error=self.error_messages['invalid']
-        )(value)
+        return self._validator(value)
 
 
 class CustomDomainValidator(validate.Regexp):
+    """
+    Validates domains with the cached linear time check, subclasses overriding DOMAIN_REGEX are validated
+    with their pattern instead and not cached
+    """
 
     DOMAIN_REGEX = (
         # domain
@@ -45,8 +108,18 @@ class CustomDomainValidator(validate.Regexp):
         r'|^\[(25[0-5]|2[0-4]\d|[0-1]?\d?\d)'
         r'(\.(25[0-5]|2[0-4]\d|[0-1]?\d?\d)){3}\]$)')
 
+    DOMAIN_PATTERN = _compiled(DOMAIN_REGEX)
+
     def __init__(self, error=None):
-        super(CustomDomainValidator, self).__init__(regex=self.DOMAIN_REGEX, error=error)
+        super(CustomDomainValidator, self).__init__(regex=_compiled(self.DOMAIN_REGEX), error=error)
+        self._verdict = domain_verdict if type(self).DOMAIN_REGEX is CustomDomainValidator.DOMAIN_REGEX else None
+
+    def __call__(self, value):
+        if type(value) is not str or self._verdict is None:
+            return super(CustomDomainValidator, self).__call__(value)
+        if not self._verdict(value):
+            raise ValidationError(self._format_error(value))
+        return value
 
 
 class OXDomain(fields.Email):
@@ -55,11 +128,9 @@ class OXDomain(fields.Email):
 
     def __init__(self, *args, **kwargs):
         super(OXDomain, self).__init__(*args, **kwargs)
-        self.validators[0] =  CustomDomainValidator(error=self.error_messages['invalid'])
+        self.validators[0] = self._validator = CustomDomainValidator(error=self.error_messages['invalid'])
 
     def _validated(self, value):
         if value is None:
             return None
-        return CustomDomainValidator(
-            error=self.error_messages['invalid']
-        )(value)
\ No newline at end of file
+        return self._validator(value)
@@ -0,0 +1,142 @@
+"""
+Single pass domain and email address validation
+Accepts exactly the language of the regexes of CustomDomainValidator and OXValidatorEmail, quirks included:
+labels of up to 128 letters, digits and hyphens, a top level domain of 2 to 18 letters, ipv4 literals whose
+octets may use any unicode decimal digit and which may end in a newline, and under ignorecase the four
+non-ascii letters python's re folds onto ascii ones. Built from str methods that never go back over the
+input, so long hostile values cost linear time at worst and most are turned down after a few characters
+"""
+import string
+
+# the non-ascii characters re.IGNORECASE matches against [a-zA-Z]: dotted and dotless i, long s, kelvin sign
+FOLDED = frozenset("İıſK")
+
+LETTERS = frozenset(string.ascii_letters)
+LABEL = frozenset(string.ascii_letters + string.digits + "-")
+LOCAL = frozenset(string.ascii_letters + string.digits + "!#$+-^_~'&")
+# quoted-string characters, behind a backslash tab, space, quote and backslash are allowed as well
+QTEXT = frozenset([chr(code) for code in range(1, 9)] + ["\x0b", "\x0c"] + [chr(code) for code in range(14, 32)]
+                  + ["!"] + [chr(code) for code in range(0x23, 0x5c)] + [chr(code) for code in range(0x5d, 0x80)])
+
+WHITELIST = ("localhost",)
+
+DOTTED_LABELS_FOLDED = LABEL | FOLDED | {"."}
+LETTERS_FOLDED = LETTERS | FOLDED
+LOCAL_FOLDED = LOCAL | FOLDED
+QTEXT_FOLDED = QTEXT | FOLDED
+
+# "[255.255.255.255]" and the newline $ lets through
+LONGEST_IPV4_LITERAL = 18
+
+
+def _is_ascii(value):
+    # str.isascii is python 3.7+
+    try:
+        value.encode("ascii")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _are_labels(labels, ignorecase):
+    # labels is everything before the last dot, no label may be empty or longer than 128 characters
+    if not labels or labels[0] == "." or labels[-1] == "." or ".." in labels:
+        return False
+    if len(labels) > 128 and max(map(len, labels.split("."))) > 128:
+        return False
+    if _is_ascii(labels):
+        letters = labels.replace("-", "").replace(".", "")
+        return not letters or letters.isalnum()
+    return ignorecase and DOTTED_LABELS_FOLDED.issuperset(labels)
+
+
+def _is_top_level(label, ignorecase):
+    if _is_ascii(label):
+        return 2 <= len(label) <= 18 and label.isalpha()
+    return ignorecase and 2 <= len(label) <= 18 and LETTERS_FOLDED.issuperset(label)
+
+
+def _is_octet(octet):
+    # 25[0-5] | 2[0-4]\d | [0-1]?\d?\d, where \d is any unicode decimal digit
+    if not octet.isdecimal():
+        return False
+    if len(octet) < 3:
+        return True
+    if len(octet) > 3:
+        return False
+    if octet[0] in "01":
+        return True
+    if octet[0] != "2":
+        return False
+    return octet[1] in "01234" or (octet[1] == "5" and octet[2] in "012345")
+
+
+def _is_ipv4_literal(value):
+    # the regex ends in $, which also matches before a trailing newline
+    if len(value) > LONGEST_IPV4_LITERAL:
+        return False
+    if value.endswith("]"):
+        inner = value[1:-1]
+    elif value.endswith("]\n"):
+        inner = value[1:-2]
+    else:
+        return False
+    octets = inner.split(".")
+    return len(octets) == 4 and all(_is_octet(octet) for octet in octets)
+
+
+def is_domain(value, ignorecase=False):
+    """
+    Whether value is a domain name or bracketed ipv4 literal
+
+    :param value: the string to check
+    :param ignorecase: also accept the letters re.IGNORECASE folds onto ascii, as OXValidatorEmail's regex does
+    """
+    if value.startswith("["):
+        return _is_ipv4_literal(value)
+    # the first label ends within 129 characters, checked before anything scans the whole value
+    if value.find(".", 0, 129) < 0:
+        return False
+    labels, _, top = value.rpartition(".")
+    return _is_top_level(top, ignorecase) and _are_labels(labels, ignorecase)
+
+
+def _is_quoted_string(value):
+    # $ matches at the end or before a trailing newline, which fixes where the closing quote has to be
+    if value.endswith('"\n') and len(value) > 2:
+        body = value[1:-2]
+    elif value.endswith('"') and len(value) > 1:
+        body = value[1:-1]
+    else:
+        return False
+    # a backslash escapes the character after it: escaped backslashes pair up left to right just as
+    # str.replace removes them, after which the characters only allowed escaped go with their backslash
+    body = body.replace("\\\\", "")
+    if body.endswith("\\"):
+        return False
+    for pair in ('\\"', "\\ ", "\\\t"):
+        body = body.replace(pair, "")
+    return QTEXT_FOLDED.issuperset(body.replace("\\", ""))
+
+
+def is_local_part(value):
+    """Whether value is the part of an address before the @, an atom of up to 64 characters or a quoted string"""
+    if value.startswith('"'):
+        return _is_quoted_string(value)
+    return 0 < len(value) <= 64 and LOCAL_FOLDED.issuperset(value)
+
+
+def is_email(value):
+    """Whether value is an email address, as marshmallow's Email validator judges it with the OX patterns"""
+    if not value or "@" not in value:
+        return False
+    local, domain = value.rsplit("@", 1)
+    if not is_local_part(local):
+        return False
+    if domain in WHITELIST or is_domain(domain, ignorecase=True):
+        return True
+    try:
+        domain = domain.encode("idna").decode("ascii")
+    except UnicodeError:
+        return False
+    return is_domain(domain, ignorecase=True)
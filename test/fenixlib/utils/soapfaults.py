@@ -1,45 +1,130 @@
 """
 Utility for taking a soap fault and re-raising an appropriate custom exception
+Fault messages are matched against a table of rules which is compiled into a single regular expression,
+so classifying a fault is one pass over its message no matter how many rules there are
 """
+import re
+from collections import namedtuple
 from fenixlib import exc
 
-def check_fault(fault, context_id, mailbox_uid=None):
+FaultRule = namedtuple("FaultRule", ["pattern", "exception", "message"])
+FaultRule.__doc__ = """
+A fault message pattern and the exception it maps to
+
+:param pattern: regular expression matched at the start of the message, {context_id} and {user} stand for
+    the context id and mailbox uid of the call
+:param exception: the exception class raised
+:param message: format string of the exception message, with the fields context_id, user and fault
+"""
+
+# the call's values are put in front of the message, separated by NUL, and the rules refer back to them
+_PREFIX = "(?P<context_id>[^\\x00]*)\\x00(?P<user>[^\\x00]*)\\x00"
+
+
+class FaultClassifier(object):
     """
-    Interprets the message of a fault and raises a custom exception
+    Maps fault messages to custom exceptions with the first rule which applies
 
-    :param fault: a zeep.exceptions.Fault return from open exchange
-    :param context_id: The numeric id of the context
-    :param mailbox_uid: the uuid identifying the user
+    :param rules: a sequence of FaultRule in order of precedence
+    :param default: exception class raised when no rule applies, None re-raises the fault
     """
-    exc_message = str(fault)
 
-    if exc_message == 'Authentication failed':
-        # OX gives auth failed when a context DNE. We know the auth is correct so raise not found
-        raise exc.ContextNotFound("The context {} does not exist".format(context_id))
+    def __init__(self, rules, default=None):
+        self.rules = tuple(rules)
+        self.default = default
+        alternatives = []
+        for index, rule in enumerate(self.rules):
+            pattern = rule.pattern.replace("{context_id}", "(?P=context_id)").replace("{user}", "(?P=user)")
+            alternatives.append("(?P<rule{}>{})".format(index, pattern))
+        self._matcher = re.compile(_PREFIX + "(?:{})".format("|".join(alternatives)), re.DOTALL)
+        self._rule_of_group = dict((self._matcher.groupindex["rule{}".format(index)], rule)
+                                   for index, rule in enumerate(self.rules))
+
+    def classify(self, message, context_id=None, mailbox_uid=None):
+        """
+        Finds the rule which applies to a fault message
+
+        :param message: the fault message
+        :param context_id: The numeric id of the context
+        :param mailbox_uid: the uuid identifying the user
+        :return: the FaultRule, or None when no rule applies
+        """
+        context_id, mailbox_uid = str(context_id), str(mailbox_uid)
+        # ids never contain NUL, such values can not be told apart from the separator
+        if "\x00" in context_id or "\x00" in mailbox_uid:
+            return None
+        match = self._matcher.match("\x00".join((context_id, mailbox_uid, message)))
+        if match is None:
+            return None
+        return self._rule_of_group[match.lastindex]
+
+    def raise_for(self, fault, context_id=None, mailbox_uid=None):
+        """
+        Raises the custom exception of a fault
 
-    elif exc_message == 'The context {} does not exist!'.format(context_id):
-        raise exc.ContextNotFound("The context {} does not exist".format(context_id))
+        :param fault: a zeep.exceptions.Fault return from open exchange
+        :param context_id: The numeric id of the context
+        :param mailbox_uid: the uuid identifying the user
+        """
+        message = str(fault)
+        rule = self.classify(message, context_id, mailbox_uid)
+        if rule is not None:
+            raise rule.exception(rule.message.format(context_id=context_id, user=mailbox_uid, fault=message))
+        if self.default is None:
+            raise fault
+        raise self.default(message)
 
-    elif ('Database for context {context_id} and server'.format(context_id=context_id)
-          in exc_message and 'can not be resolved' in exc_message):
-        # Cryptic way of saying the context DNE
-        raise exc.ContextNotFound("The context {} does not exist".format(context_id))
 
-    elif "No such user {user} in context {context_id}".format(user=mailbox_uid, context_id=context_id) in exc_message:
-        raise exc.UserNotFound(exc_message)
+user_faults = FaultClassifier([
+    # OX gives auth failed when a context DNE. We know the auth is correct so raise not found
+    FaultRule(r"Authentication failed\Z", exc.ContextNotFound, "The context {context_id} does not exist"),
+    FaultRule(r"The context {context_id} does not exist!\Z", exc.ContextNotFound,
+              "The context {context_id} does not exist"),
+    # Cryptic way of saying the context DNE
+    FaultRule(r"(?=.*Database for context {context_id} and server)(?=.*can not be resolved)", exc.ContextNotFound,
+              "The context {context_id} does not exist"),
+    FaultRule(r".*No such user {user} in context {context_id}", exc.UserNotFound, "{fault}"),
+    FaultRule(r"The displayname is already used\Z", exc.UserConflict, "The displayName already exists in context"),
+    FaultRule(r"User {user} already exists in this context\Z", exc.UserConflict,
+              "The user uuid {user} already exists"),
+    FaultRule(r"(?=.*Primary mail address)(?=.*already exists in context)", exc.UserConflict,
+              "The emailAddress already exists in context"),
+    FaultRule(r".*No such access combination name", exc.NoSuchProduct, "The given product type does not exist"),
+], default=exc.OXException)
 
-    elif exc_message == 'The displayname is already used':
-        raise exc.UserConflict("The displayName already exists in context")
+_context_not_found = FaultRule(r"Context does not exist\Z", exc.ContextNotFound,
+                               "The context {context_id} does not exist")
 
-    elif exc_message == 'User {} already exists in this context'.format(mailbox_uid):
-        raise exc.UserConflict("The user uuid {} already exists".format(mailbox_uid))
+# each operation of the context service maps only the faults it has always mapped, others are re-raised
+context_faults = {
+    "getData": FaultClassifier([_context_not_found]),
+    "create": FaultClassifier([FaultRule(r".*This mapping is already in use", exc.DomainInUse, "{fault}")]),
+    "delete": FaultClassifier([_context_not_found]),
+    "change": FaultClassifier([
+        _context_not_found,
+        FaultRule(r".*already exists in the system!", exc.DomainInUse, "{fault}"),
+    ]),
+}
 
-    elif "Primary mail address" in exc_message and "already exists in context" in exc_message:
-        raise exc.UserConflict("The emailAddress already exists in context")
 
-    elif 'No such access combination name' in exc_message:
-        raise exc.NoSuchProduct("The given product type does not exist")
+def check_fault(fault, context_id, mailbox_uid=None):
+    """
+    Interprets the message of a fault and raises a custom exception
 
+    :param fault: a zeep.exceptions.Fault return from open exchange
+    :param context_id: The numeric id of the context
+    :param mailbox_uid: the uuid identifying the user
+    """
+    user_faults.raise_for(fault, context_id, mailbox_uid)
 
-    else:
-        raise exc.OXException(str(fault))
+
+def check_context_fault(fault, context_id, operation):
+    """
+    Interprets the message of a fault from the context service and raises a custom exception
+    Faults which are not recognised are re-raised unchanged
+
+    :param fault: a zeep.exceptions.Fault return from open exchange
+    :param context_id: The numeric id of the context
+    :param operation: the operation which failed, one of getData, create, delete or change
+    """
+    context_faults[operation].raise_for(fault, context_id)
@@ -24,5 +24,8 @@ setup(
         "requests",
         "zeep",
         "boto3"
-    ]
+    ],
+    extras_require={
+        "async": ["httpx"]
+    }
 )
@@ -0,0 +1,73 @@
+"""
+Fault messages as returned by OX, and the if/elif fault mapping soapfaults replaced,
+shared by the fault classifier tests and benchmark
+"""
+from fenixlib import exc
+
+CONTEXT_ID = 42
+MAILBOX_UID = "7f1c2a9e-5b7d-4c1e-9a4f-2d6b8e0c3f11"
+
+# (message, context_id, mailbox_uid)
+USER_FAULTS = [
+    ("Authentication failed", CONTEXT_ID, MAILBOX_UID),
+    ("The context 42 does not exist!", CONTEXT_ID, None),
+    ("The context 42 does not exist!", 43, None),
+    ("Database for context 42 and server 3 can not be resolved", CONTEXT_ID, None),
+    ("Database for context 42 and server 3 can not be resolved", 4, None),
+    ("No such user 7f1c2a9e-5b7d-4c1e-9a4f-2d6b8e0c3f11 in context 42", CONTEXT_ID, MAILBOX_UID),
+    ("No such user 7f1c2a9e-5b7d-4c1e-9a4f-2d6b8e0c3f11 in context 42; exceptionId 1-2", CONTEXT_ID, MAILBOX_UID),
+    ("No such user someone-else in context 42", CONTEXT_ID, MAILBOX_UID),
+    ("No such user None in context 42", CONTEXT_ID, None),
+    ("The displayname is already used", CONTEXT_ID, MAILBOX_UID),
+    ("User 7f1c2a9e-5b7d-4c1e-9a4f-2d6b8e0c3f11 already exists in this context", CONTEXT_ID, MAILBOX_UID),
+    ("User other already exists in this context", CONTEXT_ID, MAILBOX_UID),
+    ("Primary mail address \"a@domain.com\" already exists in context 42", CONTEXT_ID, MAILBOX_UID),
+    ("already exists in context 42; Primary mail address \"a@domain.com\"", CONTEXT_ID, MAILBOX_UID),
+    ("No such access combination name \"gd_missing\"", CONTEXT_ID, MAILBOX_UID),
+    ("Invalid value in parameter\n multi line", CONTEXT_ID, MAILBOX_UID),
+    ("", CONTEXT_ID, MAILBOX_UID),
+]
+
+# (message, context_id)
+CONTEXT_FAULTS = [
+    ("Context does not exist", CONTEXT_ID),
+    ("Context does not exist!", CONTEXT_ID),
+    ("Cannot map 'domain.com' to context 42. This mapping is already in use.", CONTEXT_ID),
+    ("Context 42 already exists in the system!", CONTEXT_ID),
+    ("Authentication failed", CONTEXT_ID),
+]
+
+
+def legacy_check_fault(message, context_id, mailbox_uid=None):
+    """The one by one check_fault chain, returns the (exception class, message) it raised"""
+    if message == 'Authentication failed':
+        return exc.ContextNotFound, "The context {} does not exist".format(context_id)
+    elif message == 'The context {} does not exist!'.format(context_id):
+        return exc.ContextNotFound, "The context {} does not exist".format(context_id)
+    elif ('Database for context {context_id} and server'.format(context_id=context_id)
+          in message and 'can not be resolved' in message):
+        return exc.ContextNotFound, "The context {} does not exist".format(context_id)
+    elif "No such user {user} in context {context_id}".format(user=mailbox_uid, context_id=context_id) in message:
+        return exc.UserNotFound, message
+    elif message == 'The displayname is already used':
+        return exc.UserConflict, "The displayName already exists in context"
+    elif message == 'User {} already exists in this context'.format(mailbox_uid):
+        return exc.UserConflict, "The user uuid {} already exists".format(mailbox_uid)
+    elif "Primary mail address" in message and "already exists in context" in message:
+        return exc.UserConflict, "The emailAddress already exists in context"
+    elif 'No such access combination name' in message:
+        return exc.NoSuchProduct, "The given product type does not exist"
+    else:
+        return exc.OXException, message
+
+
+def legacy_check_context_fault(message, context_id, operation):
+    """The if/elif chain of each context client method, None when the fault was re-raised"""
+    if operation in ("getData", "delete", "change") and message == 'Context does not exist':
+        return exc.ContextNotFound, "The context {} does not exist".format(context_id)
+    elif operation == "create" and "This mapping is already in use" in message:
+        return exc.DomainInUse, message
+    elif operation == "change" and "already exists in the system!" in message:
+        return exc.DomainInUse, message
+    else:
+        return None
@@ -0,0 +1,531 @@
+"""
+Local stand-in for the OX admin SOAP services
+OXStubBackend - an in-memory model of contexts and users which answers OX operations and raises the
+    same fault strings app suite does
+OXStubServer - a threaded http server which serves OX-like Context and User WSDLs generated from the
+    type tables below, and dispatches SOAP calls to a backend
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import copy
+import fnmatch
+import itertools
+import threading
+import time
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from xml.sax.saxutils import escape
+from lxml import etree
+
+SOAP_ENV = "http://schemas.xmlsoap.org/soap/envelope/"
+WRAPPER_NS = "http://soap.admin.openexchange.com"
+DATA_NS = "http://dataobjects.soap.admin.openexchange.com/xsd"
+CREDENTIALS_NS = "http://dataobjects.rmi.admin.openexchange.com/xsd"
+# zeep assigns ns0..nsN in document order, OX puts Credentials at ns5
+NAMESPACES = [
+    WRAPPER_NS,
+    DATA_NS,
+    "http://exceptions.soap.admin.openexchange.com",
+    "http://rmi.java/xsd",
+    "http://io.java/xsd",
+    CREDENTIALS_NS,
+]
+
+TYPES = OrderedDict([
+    ("SOAPMapEntry", [("key", "string"), ("value", "string")]),
+    ("SOAPStringMap", [("entries", "SOAPMapEntry[]")]),
+    ("SOAPStringMapMapEntry", [("key", "string"), ("value", "SOAPStringMap")]),
+    ("SOAPStringMapMap", [("entries", "SOAPStringMapMapEntry[]")]),
+    ("Database", [
+        ("clusterWeight", "int"), ("currentUnits", "int"), ("driver", "string"), ("id", "int"),
+        ("login", "string"), ("master", "boolean"), ("masterId", "int"), ("maxUnits", "int"),
+        ("name", "string"), ("password", "string"), ("poolHardLimit", "int"), ("poolInitial", "int"),
+        ("poolMax", "int"), ("read_id", "int"), ("scheme", "string"), ("url", "string"),
+    ]),
+    ("Context", [
+        ("average_size", "long"), ("enabled", "boolean"), ("filestoreId", "int"),
+        ("filestore_name", "string"), ("id", "int"), ("loginMappings", "string[]"),
+        ("maxQuota", "long"), ("name", "string"), ("readDatabase", "Database"),
+        ("usedQuota", "long"), ("userAttributes", "SOAPStringMapMap"), ("writeDatabase", "Database"),
+    ]),
+    ("User", [
+        ("aliases", "string[]"), ("defaultSenderAddress", "string"), ("display_name", "string"),
+        ("email1", "string"), ("folderTree", "int"), ("given_name", "string"), ("id", "int"),
+        ("imapLogin", "string"), ("imapPort", "int"), ("imapServer", "string"),
+        ("language", "string"), ("mailenabled", "boolean"), ("maxQuota", "long"),
+        ("name", "string"), ("password", "string"), ("primaryEmail", "string"),
+        ("smtpServer", "string"), ("sur_name", "string"), ("usedQuota", "long"),
+        ("userAttributes", "SOAPStringMapMap"),
+    ]),
+])
+
+# operation: (parameters, (return type, is list) or None for void)
+CONTEXT_OPERATIONS = OrderedDict([
+    ("getData", ([("ctx", "Context"), ("auth", "Credentials")], ("Context", False))),
+    ("list", ([("search_pattern", "string"), ("auth", "Credentials")], ("Context", True))),
+    ("create", ([("ctx", "Context"), ("admin_user", "User"), ("auth", "Credentials")], ("Context", False))),
+    ("delete", ([("ctx", "Context"), ("auth", "Credentials")], None)),
+    ("change", ([("ctx", "Context"), ("auth", "Credentials")], None)),
+])
+
+USER_OPERATIONS = OrderedDict([
+    ("createByModuleAccessName", ([("ctx", "Context"), ("usrdata", "User"), ("access_combination_name", "string"),
+                                   ("auth", "Credentials")], ("User", False))),
+    ("change", ([("ctx", "Context"), ("usrdata", "User"), ("auth", "Credentials")], None)),
+    ("changeByModuleAccessName", ([("ctx", "Context"), ("user", "User"), ("access_combination_name", "string"),
+                                   ("auth", "Credentials")], None)),
+    ("listAll", ([("ctx", "Context"), ("auth", "Credentials"), ("include_guests", "boolean"),
+                  ("exclude_users", "boolean")], ("User", True))),
+    ("getMultipleData", ([("ctx", "Context"), ("users", "User[]"), ("auth", "Credentials")], ("User", True))),
+    ("getData", ([("ctx", "Context"), ("user", "User"), ("auth", "Credentials")], ("User", False))),
+    ("delete", ([("ctx", "Context"), ("user", "User"), ("auth", "Credentials")], None)),
+])
+
+SERVICES = {
+    "context": ("OXContextService", CONTEXT_OPERATIONS),
+    "user": ("OXUserService", USER_OPERATIONS),
+}
+
+PRODUCTS = ("gd_pim", "gd_pim_lite", "webmail")
+
+
+class StubFault(Exception):
+    """Raised by the backend to answer with a soap fault"""
+    pass
+
+
+def _field_xsd(name, type_name):
+    max_occurs = ""
+    if type_name.endswith("[]"):
+        type_name = type_name[:-2]
+        max_occurs = ' maxOccurs="unbounded"'
+    if type_name in TYPES:
+        qualified = "ax:{}".format(type_name)
+    elif type_name == "Credentials":
+        qualified = "cr:Credentials"
+    else:
+        qualified = "xs:{}".format(type_name)
+    return '<xs:element minOccurs="0" name="{}" nillable="true" type="{}"{}/>'.format(name, qualified, max_occurs)
+
+
+def build_wsdl(service, address):
+    """Generate an OX-like document/literal WSDL for the context or user service"""
+    service_name, operations = SERVICES[service]
+    xmlns = ('xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:ns="{}" xmlns:ax="{}" xmlns:cr="{}"'
+             .format(WRAPPER_NS, DATA_NS, CREDENTIALS_NS))
+    schemas = []
+    wrappers = []
+    for name, (params, result) in operations.items():
+        wrappers.append('<xs:element name="{}"><xs:complexType><xs:sequence>{}</xs:sequence></xs:complexType>'
+                        '</xs:element>'.format(name, "".join(_field_xsd(*param) for param in params)))
+        returned = ""
+        if result is not None:
+            returned = _field_xsd("return", result[0] + ("[]" if result[1] else ""))
+        wrappers.append('<xs:element name="{}Response"><xs:complexType><xs:sequence>{}</xs:sequence>'
+                        '</xs:complexType></xs:element>'.format(name, returned))
+    schemas.append('<xs:schema {} elementFormDefault="qualified" targetNamespace="{}">'
+                   '<xs:import namespace="{}"/><xs:import namespace="{}"/>{}</xs:schema>'
+                   .format(xmlns, WRAPPER_NS, DATA_NS, CREDENTIALS_NS, "".join(wrappers)))
+    data_types = "".join(
+        '<xs:complexType name="{}"><xs:sequence>{}</xs:sequence></xs:complexType>'.format(
+            name, "".join(_field_xsd(*field) for field in fields))
+        for name, fields in TYPES.items())
+    schemas.append('<xs:schema {} elementFormDefault="qualified" targetNamespace="{}">{}</xs:schema>'
+                   .format(xmlns, DATA_NS, data_types))
+    for namespace in NAMESPACES[2:5]:
+        schemas.append('<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" elementFormDefault="qualified" '
+                       'targetNamespace="{}"><xs:complexType name="Placeholder"><xs:sequence/></xs:complexType>'
+                       '</xs:schema>'.format(namespace))
+    schemas.append('<xs:schema {} elementFormDefault="qualified" targetNamespace="{}">'
+                   '<xs:complexType name="Credentials"><xs:sequence>{}{}</xs:sequence></xs:complexType>'
+                   '</xs:schema>'.format(xmlns, CREDENTIALS_NS, _field_xsd("login", "string"),
+                                         _field_xsd("password", "string")))
+
+    messages = []
+    port_ops = []
+    binding_ops = []
+    for name, _ in operations.items():
+        for suffix in ("Request", "Response"):
+            element = name if suffix == "Request" else name + "Response"
+            messages.append('<wsdl:message name="{0}{1}"><wsdl:part name="parameters" element="ns:{2}"/>'
+                            '</wsdl:message>'.format(name, suffix, element))
+        port_ops.append('<wsdl:operation name="{0}"><wsdl:input message="tns:{0}Request"/>'
+                        '<wsdl:output message="tns:{0}Response"/></wsdl:operation>'.format(name))
+        binding_ops.append('<wsdl:operation name="{0}"><soap:operation soapAction="urn:{0}" style="document"/>'
+                           '<wsdl:input><soap:body use="literal"/></wsdl:input>'
+                           '<wsdl:output><soap:body use="literal"/></wsdl:output></wsdl:operation>'.format(name))
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" '
+        'xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/" xmlns:ns="{ns}" xmlns:tns="{ns}" '
+        'targetNamespace="{ns}">'
+        '<wsdl:types>{schemas}</wsdl:types>{messages}'
+        '<wsdl:portType name="{svc}PortType">{port_ops}</wsdl:portType>'
+        '<wsdl:binding name="{svc}Soap11Binding" type="tns:{svc}PortType">'
+        '<soap:binding transport="http://schemas.xmlsoap.org/soap/http" style="document"/>{binding_ops}'
+        '</wsdl:binding>'
+        '<wsdl:service name="{svc}"><wsdl:port name="{svc}HttpSoap11Endpoint" binding="tns:{svc}Soap11Binding">'
+        '<soap:address location="{address}"/></wsdl:port></wsdl:service>'
+        '</wsdl:definitions>'
+    ).format(ns=WRAPPER_NS, schemas="".join(schemas), messages="".join(messages), svc=service_name,
+             port_ops="".join(port_ops), binding_ops="".join(binding_ops), address=address)
+
+
+def _render_value(type_name, value):
+    if type_name in TYPES:
+        return render_object(type_name, value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return escape(str(value))
+
+
+def render_object(type_name, data):
+    """Render a dict as the children of an element of the given OX type"""
+    parts = []
+    for name, field_type in TYPES[type_name]:
+        value = data.get(name)
+        if value is None:
+            continue
+        if field_type.endswith("[]"):
+            for item in value:
+                parts.append('<ax:{0}>{1}</ax:{0}>'.format(name, _render_value(field_type[:-2], item)))
+        else:
+            parts.append('<ax:{0}>{1}</ax:{0}>'.format(name, _render_value(field_type, value)))
+    return "".join(parts)
+
+
+def render_response(operation, result_spec, result):
+    """Build the soap envelope returned for a successful operation"""
+    body = ""
+    if result_spec is not None and result is not None:
+        type_name, many = result_spec
+        items = result if many else [result]
+        body = "".join('<ns:return>{}</ns:return>'.format(render_object(type_name, item)) for item in items)
+    return ('<?xml version="1.0" encoding="UTF-8"?><soapenv:Envelope xmlns:soapenv="{}"><soapenv:Body>'
+            '<ns:{op}Response xmlns:ns="{}" xmlns:ax="{}">{body}</ns:{op}Response></soapenv:Body>'
+            '</soapenv:Envelope>').format(SOAP_ENV, WRAPPER_NS, DATA_NS, op=operation, body=body)
+
+
+def render_fault(message):
+    return ('<?xml version="1.0" encoding="UTF-8"?><soapenv:Envelope xmlns:soapenv="{}"><soapenv:Body>'
+            '<soapenv:Fault><faultcode>soapenv:Server</faultcode><faultstring>{}</faultstring>'
+            '</soapenv:Fault></soapenv:Body></soapenv:Envelope>').format(SOAP_ENV, escape(message))
+
+
+LIST_FIELDS = set(name for fields in TYPES.values() for name, field_type in fields if field_type.endswith("[]"))
+LIST_FIELDS.add("users")
+
+
+def parse_element(element):
+    """Turn a request element into plain python values keyed by local name"""
+    children = list(element)
+    if not children:
+        if element.get("{http://www.w3.org/2001/XMLSchema-instance}nil") == "true":
+            return None
+        return element.text if element.text is not None else ""
+    result = {}
+    for child in children:
+        name = etree.QName(child).localname
+        value = parse_element(child)
+        if name in LIST_FIELDS:
+            result.setdefault(name, []).append(value)
+        else:
+            result[name] = value
+    return result
+
+
+def apply_change(stored, change):
+    """Copy the set fields of a change call onto a stored object, userAttributes are merged key by key as OX does"""
+    for key, value in change.items():
+        if key == "userAttributes" and isinstance(value, dict):
+            stored[key] = merge_attributes(stored.get(key), value)
+        elif key != "id" and value is not None:
+            stored[key] = value
+
+
+def merge_attributes(stored, sent):
+    """The userAttributes OX holds after a change sending sent, each namespace is updated with the keys sent"""
+    namespaces = OrderedDict()
+    for attributes in (stored, sent):
+        for namespace in (attributes or {}).get("entries") or ():
+            values = namespaces.setdefault(namespace["key"], OrderedDict())
+            for entry in (namespace["value"] or {}).get("entries") or ():
+                values[entry["key"]] = entry["value"]
+    return {"entries": [
+        {"key": name, "value": {"entries": [{"key": key, "value": value} for key, value in values.items()]}}
+        for name, values in namespaces.items() if values]}
+
+
+def context_factory(context_id, domains=(), theme=None):
+    """A context as app suite stores it"""
+    database = OrderedDict([("id", 8), ("scheme", "configdb_11")])
+    context = {
+        "average_size": 200, "enabled": True, "filestoreId": 6, "filestore_name": "1_ctx_store",
+        "id": context_id, "loginMappings": list(domains) + [str(context_id)], "maxQuota": 1024,
+        "name": str(context_id), "readDatabase": database, "usedQuota": 0, "writeDatabase": database,
+    }
+    if theme is not None:
+        context["userAttributes"] = {"entries": [{"key": "config", "value": {"entries": [
+            {"key": "io.ox/core//theme", "value": "io.ox.{}".format(theme)}]}}]}
+    return context
+
+
+def user_factory(user_id, name, domain="domain.com", attributes=0):
+    """A user as app suite stores it, attributes adds that many userAttributes entries to grow the payload"""
+    localpart = "user{}".format(user_id)
+    email = "{}@{}".format(localpart, domain)
+    user = {
+        "aliases": [email], "defaultSenderAddress": email, "display_name": localpart, "email1": email,
+        "folderTree": 1, "given_name": "given", "id": user_id, "imapLogin": email, "imapPort": 143,
+        "imapServer": "localhost", "language": "en_US", "mailenabled": True, "name": name,
+        "primaryEmail": email, "smtpServer": "relay.secureserver.net", "sur_name": "sur",
+    }
+    if attributes:
+        user["userAttributes"] = {"entries": [{"key": "config", "value": {"entries": [
+            {"key": "io.ox/setting//{}".format(index), "value": "value-{:024d}".format(index)}
+            for index in range(attributes)]}}]}
+    return user
+
+
+class OXStubBackend(object):
+    """In-memory contexts and users answering OX admin operations"""
+
+    def __init__(self, admin_name="context_user"):
+        self.admin_name = admin_name
+        self.contexts = {}
+        self.users = {}
+        self.lock = threading.RLock()
+        self._ids = itertools.count(100)
+
+    def add_context(self, context_id, domains=(), users=0, theme=None, attributes=0):
+        """Create a context with an admin and the given number of users, each with that many user attributes"""
+        with self.lock:
+            self.contexts[context_id] = context_factory(context_id, domains, theme)
+            members = OrderedDict()
+            admin = user_factory(2, self.admin_name, domains[0] if domains else "domain.com")
+            members[admin["name"]] = admin
+            for user_id in range(3, users + 3):
+                user = user_factory(user_id, "{:08d}-0000-4000-8000-{:012d}".format(context_id, user_id),
+                                    domains[0] if domains else "domain.com", attributes)
+                members[user["name"]] = user
+            self.users[context_id] = members
+            return self.contexts[context_id]
+
+    # Context service
+    def _context(self, ctx):
+        context_id = int(ctx["id"])
+        if context_id not in self.contexts:
+            raise StubFault("Context does not exist")
+        return self.contexts[context_id]
+
+    def context_getData(self, ctx, auth):
+        return self._context(ctx)
+
+    def context_list(self, search_pattern, auth):
+        return [context for context in self.contexts.values()
+                if any(fnmatch.fnmatchcase(mapping, search_pattern) for mapping in context["loginMappings"])]
+
+    def context_create(self, ctx, admin_user, auth):
+        context_id = int(ctx["id"])
+        for domain in ctx.get("loginMappings", []):
+            for other in self.contexts.values():
+                if domain in other["loginMappings"]:
+                    raise StubFault("Cannot map '{}' to the newly created context. "
+                                    "This mapping is already in use.".format(domain))
+        return self.add_context(context_id, ctx.get("loginMappings", []))
+
+    def context_delete(self, ctx, auth):
+        context = self._context(ctx)
+        del self.contexts[context["id"]]
+        self.users.pop(context["id"], None)
+
+    def context_change(self, ctx, auth):
+        context = self._context(ctx)
+        for domain in ctx.get("loginMappings", []):
+            for other in self.contexts.values():
+                if other is not context and domain in other["loginMappings"]:
+                    raise StubFault('A mapping with login info "{}" already exists in the system!'.format(domain))
+        apply_change(context, ctx)
+
+    # User service
+    def _members(self, ctx):
+        context_id = int(ctx["id"])
+        if context_id not in self.users:
+            raise StubFault("Authentication failed")
+        return context_id, self.users[context_id]
+
+    def _user(self, ctx, user):
+        context_id, members = self._members(ctx)
+        if user.get("name") is not None:
+            found = members.get(user["name"])
+        else:
+            found = next((member for member in members.values() if str(member["id"]) == str(user.get("id"))), None)
+        if found is None:
+            raise StubFault("No such user {} in context {}".format(user.get("name", user.get("id")), context_id))
+        return found
+
+    def user_createByModuleAccessName(self, ctx, usrdata, access_combination_name, auth):
+        context_id, members = self._members(ctx)
+        if usrdata["name"] in members:
+            raise StubFault("User {} already exists in this context".format(usrdata["name"]))
+        if any(member.get("primaryEmail") == usrdata.get("primaryEmail") for member in members.values()):
+            raise StubFault('Primary mail address "{}" already exists in context {}'.format(
+                usrdata.get("primaryEmail"), context_id))
+        if access_combination_name not in PRODUCTS:
+            raise StubFault('No such access combination name "{}"'.format(access_combination_name))
+        user = copy.deepcopy(usrdata)
+        user["id"] = next(self._ids)
+        members[user["name"]] = user
+        return user
+
+    def user_change(self, ctx, usrdata, auth):
+        apply_change(self._user(ctx, usrdata), usrdata)
+
+    def user_changeByModuleAccessName(self, ctx, user, access_combination_name, auth):
+        self._user(ctx, user)
+        if access_combination_name not in PRODUCTS:
+            raise StubFault('No such access combination name "{}"'.format(access_combination_name))
+
+    def user_listAll(self, ctx, auth, include_guests=None, exclude_users=None):
+        return [{"id": member["id"]} for member in self._members(ctx)[1].values()]
+
+    def user_getMultipleData(self, ctx, users, auth):
+        context_id, members = self._members(ctx)
+        by_id = dict((str(member["id"]), member) for member in members.values())
+        found = []
+        for user in users or []:
+            if user.get("name") is None and str(user.get("id")) in by_id:
+                found.append(by_id[str(user["id"])])
+            else:
+                found.append(self._user(ctx, user))
+        return found
+
+    def user_getData(self, ctx, user, auth):
+        return self._user(ctx, user)
+
+    def user_delete(self, ctx, user, auth):
+        found = self._user(ctx, user)
+        del self._members(ctx)[1][found["name"]]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="text/xml; charset=utf-8"):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        service = self.path.strip("/").split("?")[0]
+        if service not in SERVICES:
+            self._send(404, "")
+            return
+        self.server.stub.requests["GET " + service] += 1
+        time.sleep(self.server.stub.wsdl_delay)
+        self._send(200, build_wsdl(service, "{}/{}".format(self.server.stub.url, service)))
+
+    def do_POST(self):
+        stub = self.server.stub
+        service = self.path.strip("/").split("?")[0]
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        request = etree.fromstring(body).find("{%s}Body" % SOAP_ENV)[0]
+        operation = etree.QName(request).localname
+        stub.requests[operation] += 1
+        if stub.outage:
+            self._send(stub.outage, "<html><body>Service Unavailable</body></html>", "text/html")
+            return
+        params, result_spec = SERVICES[service][1][operation]
+        arguments = parse_element(request)
+        delay = stub.delay(operation) if callable(stub.delay) else stub.delay
+        if delay:
+            time.sleep(delay)
+        handler = getattr(stub.backend, "{}_{}".format(service, operation))
+        try:
+            with stub.backend.lock:
+                result = handler(*[arguments.get(name) for name, _ in params])
+                response = render_response(operation, result_spec, result)
+        except StubFault as fault:
+            self._send(500, render_fault(str(fault)))
+        else:
+            self._send(200, response)
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class OXStubServer(object):
+    """
+    Threaded local http server speaking the OX admin SOAP dialect
+
+    :param backend: An OXStubBackend, a new empty one is used by default
+    :param delay: seconds (or a callable taking the operation name) to wait before answering a call
+    :param wsdl_delay: seconds to wait before serving a WSDL, emulating a remote OX
+    :param outage: http status answered to every call with a non soap body, like a proxy in front of a down OX
+    """
+
+    def __init__(self, backend=None, delay=0, wsdl_delay=0, outage=None):
+        self.backend = backend or OXStubBackend()
+        self.delay = delay
+        self.wsdl_delay = wsdl_delay
+        self.outage = outage
+        self.requests = Counter()
+        # tcp connections accepted, each one is a connect (and with TLS a handshake) on the client side
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self._server.server_address[1])
+
+    @property
+    def context_wsdl(self):
+        return "{}/context?wsdl".format(self.url)
+
+    @property
+    def user_wsdl(self):
+        return "{}/user?wsdl".format(self.url)
+
+    def start(self):
+        while True:
+            server = _ThreadingServer(("127.0.0.1", 0), _StubHandler)
+            # the clients strip the first ":80" out of the service address
+            if not str(server.server_address[1]).startswith("80"):
+                break
+            server.server_close()
+        server.stub = self
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
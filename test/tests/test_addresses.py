@@ -0,0 +1,131 @@
+"""
+Test Suite for the single pass domain and email validation, differential against the regexes it replaces
+"""
+from basetest import BaseTestCase # import this first
+import random
+import unittest
+from marshmallow import validate
+from fenixlib.schemas.custom_fields import CustomDomainValidator, OXValidatorEmail
+from fenixlib.utils.addresses import is_domain, is_email, is_local_part
+
+DOMAIN_PATTERN = CustomDomainValidator.DOMAIN_PATTERN
+EMAIL_DOMAIN_PATTERN = OXValidatorEmail.DOMAIN_REGEX
+USER_PATTERN = OXValidatorEmail.USER_REGEX
+REFERENCE_EMAIL = OXValidatorEmail()
+
+# characters the patterns treat specially, the letters re.IGNORECASE folds and a non-ascii decimal digit
+ALPHABET = list("aZz09-.[]\"\\@\n\r\t \x01\x7f_!#~&'^+$%") + list("İıſKé٣") + ["25", "2", "1", "5", "255", "256"]
+
+
+def regex_email(value):
+    try:
+        validate.Email.__call__(REFERENCE_EMAIL, value)
+    except validate.ValidationError:
+        return False
+    return True
+
+
+def label(rng, length):
+    return "".join(rng.choice("abcXYZ019-") for _ in range(length))
+
+
+def domains(rng):
+    """Domains around the length limits of the labels and the top level domain"""
+    for _ in range(2000):
+        parts = [label(rng, rng.choice([0, 1, 2, 63, 127, 128, 129])) for _ in range(rng.randint(0, 3))]
+        top = "".join(rng.choice("comCOMſK1") for _ in range(rng.choice([0, 1, 2, 3, 17, 18, 19])))
+        domain = ".".join(parts + [top])
+        yield rng.choice(["", "", "", "\n", ".", "-", "!"]) + domain if rng.random() < 0.1 else domain
+        yield domain + rng.choice(["", "\n", ".", "]"])
+
+
+def ip_literals(rng):
+    digits = "0123456789٣"
+    for _ in range(3000):
+        octets = ["".join(rng.choice(digits) for _ in range(rng.randint(0, 4))) for _ in range(rng.choice([3, 4, 4, 5]))]
+        if rng.random() < 0.5:
+            octets = [str(rng.randint(0, 300)) for _ in octets]
+        yield "[" + ".".join(octets) + rng.choice(["]", "]", "]\n", "]\n\n", "", "]]", "] "])
+
+
+def local_parts(rng):
+    for _ in range(3000):
+        if rng.random() < 0.5:
+            yield "".join(rng.choice("aZ09!#$+-^_~'&ſ.%é") for _ in range(rng.choice([0, 1, 5, 63, 64, 65])))
+        else:
+            body = "".join(rng.choice(["a", " ", "\\", "\\\"", "\"", "\t", "\x01", "\n", "ı", "é", "\\ı", "\\\n"])
+                           for _ in range(rng.randint(0, 8)))
+            yield '"' + body + rng.choice(['"', '"', '"\n', '"\n\n', '', '"x'])
+
+
+class AddressValidationTests(BaseTestCase):
+
+    def assertSameDomain(self, value):
+        self.assertEqual(is_domain(value), DOMAIN_PATTERN.match(value) is not None, repr(value))
+        self.assertEqual(is_domain(value, ignorecase=True), EMAIL_DOMAIN_PATTERN.match(value) is not None, repr(value))
+
+    def test_examples(self):
+        self.assertTrue(is_domain("domain.com"))
+        self.assertTrue(is_domain("hello.world.co.uk"))
+        self.assertTrue(is_domain("[192.168.0.1]"))
+        self.assertFalse(is_domain("domain"))
+        self.assertFalse(is_domain("domain.c0m"))
+        self.assertFalse(is_domain("[256.1.1.1]"))
+        self.assertTrue(is_email("test@test.com"))
+        self.assertTrue(is_email('"quoted.name"@localhost'))
+        self.assertTrue(is_email("test@bücher.de"))
+        self.assertFalse(is_email("test@invaliddomain"))
+        self.assertFalse(is_email("a" * 65 + "@test.com"))
+
+    def test_quirks_kept(self):
+        # the regexes accept these, so the single pass validation has to as well
+        self.assertTrue(is_domain("[1.2.3.4]\n"))
+        self.assertTrue(is_domain("[٣.0.0.1]"))
+        self.assertTrue(is_domain("---.com"))
+        self.assertFalse(is_domain("domain.ſK"))
+        self.assertTrue(is_domain("domain.ſK", ignorecase=True))
+        self.assertTrue(is_local_part('"x"\n'))
+        for value in ("[1.2.3.4]\n", "[٣.0.0.1]", "---.com", "domain.ſK"):
+            self.assertSameDomain(value)
+
+    def test_random_strings(self):
+        rng = random.Random(20)
+        for _ in range(20000):
+            value = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 16)))
+            self.assertSameDomain(value)
+            self.assertEqual(is_local_part(value), USER_PATTERN.match(value) is not None, repr(value))
+            self.assertEqual(is_email(value), regex_email(value), repr(value))
+
+    def test_domains(self):
+        rng = random.Random(21)
+        for value in domains(rng):
+            self.assertSameDomain(value)
+
+    def test_ip_literals(self):
+        rng = random.Random(22)
+        for value in ip_literals(rng):
+            self.assertSameDomain(value)
+
+    def test_local_parts(self):
+        rng = random.Random(23)
+        for value in local_parts(rng):
+            self.assertEqual(is_local_part(value), USER_PATTERN.match(value) is not None, repr(value))
+
+    def test_emails(self):
+        rng = random.Random(24)
+        hosts = list(domains(rng))[:1000] + list(ip_literals(rng))[:500] + ["localhost", "bücher.de", "ex@mple.com",
+                                                                           "xn--bcher-kva.de", "ſtraße.de"]
+        locals_ = list(local_parts(rng))[:1500]
+        for _ in range(5000):
+            value = rng.choice(locals_) + rng.choice(["@", "@", "@@", ""]) + rng.choice(hosts)
+            self.assertEqual(is_email(value), regex_email(value), repr(value))
+
+    def test_validators_use_it(self):
+        validator = CustomDomainValidator(error="Not a valid domain.")
+        self.assertEqual(validator("domain.com"), "domain.com")
+        self.assertRaises(validate.ValidationError, validator, "a." * 5000 + "!")
+        self.assertRaises(validate.ValidationError, OXValidatorEmail(), "a@" + "b." * 5000 + "!")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Test Suite for the userAttributes codec
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+from fenixlib.schemas import attributes
+from fenixlib.schemas.context import envelope_theme, denvelope_theme
+
+NESTED = {"entries": [
+    {"key": "config", "value": {"entries": [{"key": "io.ox/core//theme", "value": "io.ox.godaddy"},
+                                            {"key": "com.openexchange.capability.guard-mail", "value": "true"}]}},
+    {"key": "mail", "value": {"entries": [{"key": "signature", "value": "regards"}]}},
+]}
+
+FLAT = {"config": {"io.ox/core//theme": "io.ox.godaddy", "com.openexchange.capability.guard-mail": "true"},
+        "mail": {"signature": "regards"}}
+
+
+class AttributesTests(BaseTestCase):
+
+    def test_decode(self):
+        self.assertEqual(attributes.decode(NESTED), FLAT)
+        self.assertEqual(attributes.decode(None), {})
+        self.assertEqual(attributes.decode({"entries": None}), {})
+        self.assertEqual(attributes.decode({"entries": [{"key": "config", "value": None}]}), {"config": {}})
+
+    def test_encode_round_trip(self):
+        self.assertEqual(attributes.encode(FLAT), NESTED)
+        self.assertEqual(attributes.decode(attributes.encode(FLAT)), FLAT)
+        self.assertEqual(attributes.encode({"config": {}}), {"entries": []})
+
+    def test_changes(self):
+        desired = {"config": {"io.ox/core//theme": "io.ox.other", "com.openexchange.capability.guard-mail": "true"},
+                   "calendar": {"view": "week"}}
+        self.assertEqual(attributes.changes(FLAT, desired),
+                         {"config": {"io.ox/core//theme": "io.ox.other"}, "calendar": {"view": "week"}})
+        self.assertEqual(attributes.changes(FLAT, FLAT), {})
+        # attributes only OX holds are left alone, not removed
+        self.assertEqual(attributes.changes(FLAT, {}), {})
+        self.assertEqual(attributes.changes({}, FLAT), FLAT)
+
+    def test_theme(self):
+        self.assertEqual(attributes.theme(FLAT), "godaddy")
+        self.assertIsNone(attributes.theme({"mail": {}}))
+        self.assertEqual(envelope_theme("godaddy"), {"entries": [{"key": "config", "value": {"entries": [
+            {"key": "io.ox/core//theme", "value": "io.ox.godaddy"}]}}]})
+        self.assertEqual(denvelope_theme(NESTED), "godaddy")
+        self.assertIsNone(denvelope_theme({"entries": []}))
+
+
+if __name__ == '__main__':
+    unittest.main()
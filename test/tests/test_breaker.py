@@ -0,0 +1,129 @@
+"""
+Test Suite for the circuit breakers around OX calls
+"""
+from basetest import BaseTestCase # import this first
+import time
+import unittest
+from requests.exceptions import ReadTimeout
+from zeep.exceptions import Fault
+from fenixlib import exc
+from fenixlib.clients.breaker import BreakerRegistry, CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(BaseTestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.breaker = CircuitBreaker("ox", failure_rate=0.5, window=4, min_calls=4, reset_timeout=10, probes=2,
+                                      timer=self.timer)
+
+    def record(self, *outcomes):
+        for success in outcomes:
+            self.breaker.after_call(success, self.breaker.before_call())
+
+    def test_opens_on_failure_rate(self):
+        self.record(True, False, True)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.record(False)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertRaises(exc.ServiceUnavailable, self.breaker.before_call)
+        self.assertEqual(self.breaker.stats()["rejected"], 1)
+
+    def test_stays_closed_below_rate(self):
+        self.record(True, True, True, False, True, True, True, False)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_probes_close(self):
+        self.record(False, False, False, False)
+        self.timer.now = 10
+        first = self.breaker.before_call()
+        second = self.breaker.before_call()
+        self.assertTrue(first and second)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertRaises(exc.ServiceUnavailable, self.breaker.before_call)
+        self.breaker.after_call(True, first)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.after_call(True, second)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertFalse(self.breaker.before_call())
+
+    def test_failed_probe_reopens(self):
+        self.record(False, False, False, False)
+        self.timer.now = 10
+        self.breaker.after_call(False, self.breaker.before_call())
+        self.assertEqual(self.breaker.state, OPEN)
+        self.timer.now = 15
+        self.assertRaises(exc.ServiceUnavailable, self.breaker.before_call)
+
+    def test_sheds_load(self):
+        breaker = CircuitBreaker("ox", max_in_flight=2)
+        breaker.before_call()
+        breaker.before_call()
+        self.assertRaises(exc.ServiceUnavailable, breaker.before_call)
+        breaker.after_call(True)
+        breaker.before_call()
+        self.assertEqual(breaker.stats()["shed"], 1)
+        self.assertEqual(breaker.stats()["in_flight"], 2)
+
+
+class BreakerClientTests(BaseTestCase):
+
+    def setUp(self):
+        self.backend = OXStubBackend(admin_name=CONTEXT_USER)
+        self.backend.add_context(1, ["domain.com"], users=1)
+        self.server = OXStubServer(self.backend).start()
+        self.breakers = BreakerRegistry(failure_rate=1.0, window=4, min_calls=4, reset_timeout=0.2)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_outage_opens_circuit(self):
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                               breakers=self.breakers)
+        users = UserClient(wsdl=self.server.user_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD), breakers=self.breakers)
+        self.server.outage = 503
+        for _ in range(4):
+            self.assertRaises(Fault, client.get_context, 1)
+        self.assertRaises(exc.ServiceUnavailable, client.get_context, 1)
+        # clients of the same endpoint share the breaker
+        self.assertRaises(exc.ServiceUnavailable, users.get_all_users, 1)
+        self.assertEqual(self.server.requests["getData"], 4)
+
+        self.server.outage = None
+        time.sleep(0.25)
+        self.assertEqual(client.get_context(1)["id"], 1)
+        self.assertEqual(self.breakers.stats()[self.server.url]["state"], CLOSED)
+
+    def test_soap_faults_are_not_failures(self):
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                               breakers=self.breakers)
+        for _ in range(6):
+            self.assertRaises(exc.ContextNotFound, client.get_context, 99)
+        self.assertEqual(self.breakers.stats()[self.server.url]["failures"], 0)
+        self.assertEqual(client.get_context(1)["id"], 1)
+
+    def test_timeouts_are_failures(self):
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                               breakers=self.breakers)
+        client.client.transport.operation_timeout = 0.05
+        self.server.delay = 0.2
+        for _ in range(4):
+            self.assertRaises(ReadTimeout, client.get_context, 1)
+        self.assertRaises(exc.ServiceUnavailable, client.get_context, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Test Suite for the shared client registry
+"""
+from basetest import BaseTestCase # import this first
+import threading
+import unittest
+import mock
+from fenixlib.clients.registry import ClientRegistry, get_context_client, get_user_client, registry
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from config_for_test import OX_CONTEXT_WSDL, OX_USER_WSDL, OX_USER, CONTEXT_USER, CONTEXT_PASSWORD, OX_CERT_VERIFY
+
+
+class ClientRegistryTests(BaseTestCase):
+
+    def setUp(self):
+        self.context_patcher = mock.patch('fenixlib.clients.soap_context.zeep')
+        self.user_patcher = mock.patch('fenixlib.clients.soap_user.zeep')
+        self.mock_context_zeep = self.context_patcher.start()
+        self.mock_user_zeep = self.user_patcher.start()
+        registry.clear()
+
+    def tearDown(self):
+        registry.clear()
+        self.context_patcher.stop()
+        self.user_patcher.stop()
+
+    def test_same_key_shares_client(self):
+        first = get_context_client(OX_CONTEXT_WSDL, (OX_USER, CONTEXT_PASSWORD), OX_CERT_VERIFY)
+        second = get_context_client(OX_CONTEXT_WSDL, (OX_USER, CONTEXT_PASSWORD), OX_CERT_VERIFY)
+        self.assertIsInstance(first, ContextClient)
+        self.assertIs(first, second)
+        self.assertEqual(self.mock_context_zeep.Client.call_count, 1)
+
+    def test_different_credentials_get_own_client(self):
+        first = get_user_client(OX_USER_WSDL, (CONTEXT_USER, CONTEXT_PASSWORD), OX_CERT_VERIFY)
+        second = get_user_client(OX_USER_WSDL, (CONTEXT_USER, "other"), OX_CERT_VERIFY)
+        third = get_user_client(OX_USER_WSDL, (CONTEXT_USER, CONTEXT_PASSWORD), True)
+        self.assertIsInstance(first, UserClient)
+        self.assertEqual(len({id(first), id(second), id(third)}), 3)
+
+    def test_clear(self):
+        first = get_context_client(OX_CONTEXT_WSDL, (OX_USER, CONTEXT_PASSWORD))
+        registry.clear()
+        self.assertIsNot(first, get_context_client(OX_CONTEXT_WSDL, (OX_USER, CONTEXT_PASSWORD)))
+
+    def test_concurrent_first_use_builds_once(self):
+        local_registry = ClientRegistry()
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(
+            local_registry.get(UserClient, OX_USER_WSDL, (CONTEXT_USER, CONTEXT_PASSWORD))))
+            for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(id(client) for client in clients)), 1)
+        self.assertEqual(self.mock_user_zeep.Client.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+Test Suite for the asyncio SOAP clients, run against the local OX stand-in
+"""
+from basetest import BaseTestCase # import this first
+import asyncio
+import os
+import ssl
+import time
+import unittest
+import mock
+import requests
+from fenixlib import exc
+from fenixlib.clients.soap_context_async import AsyncContextClient
+from fenixlib.clients.soap_user_async import AsyncUserClient
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from zeep.exceptions import Fault
+from ox_stub import OXStubServer, OXStubBackend
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+
+class AsyncClientTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.backend = OXStubBackend(admin_name=CONTEXT_USER)
+        self.backend.add_context(1, ["domain.com"], users=3)
+        self.server = OXStubServer(self.backend).start()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.server.stop()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+class AsyncContextClientTests(AsyncClientTestCase):
+
+    def setUp(self):
+        super(AsyncContextClientTests, self).setUp()
+        self.client = AsyncContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD))
+
+    def tearDown(self):
+        self.run_async(self.client.close())
+        super(AsyncContextClientTests, self).tearDown()
+
+    def test_get_context_happy(self):
+        context = self.run_async(self.client.get_context(1))
+        self.assertEqual(context["id"], 1)
+        self.assertEqual(context["loginMappings"], ["domain.com", "1"])
+
+    def test_get_context_dne(self):
+        self.assertRaises(exc.ContextNotFound, self.run_async, self.client.get_context(5))
+
+    def test_list_context_for_domain(self):
+        contexts = self.run_async(self.client.list_context_for_domain("domain.com"))
+        self.assertEqual([context["id"] for context in contexts], [1])
+
+    def test_create_domain_in_use(self):
+        self.assertRaises(exc.DomainInUse, self.run_async,
+                          self.client.create_context({"id": 2, "loginMappings": ["domain.com"]}, {"name": "admin"}))
+
+    def test_update_and_delete(self):
+        self.run_async(self.client.update_context(1, {"loginMappings": ["domain.com", "other.com"]}))
+        self.assertEqual(self.backend.contexts[1]["loginMappings"], ["domain.com", "other.com", "1"])
+        self.run_async(self.client.delete_context(1))
+        self.assertRaises(exc.ContextNotFound, self.run_async, self.client.delete_context(1))
+
+    def test_close_closes_wsdl_session(self):
+        client = AsyncContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD))
+        self.run_async(client.close())
+        self.assertTrue(client.client.transport.client.is_closed)
+        self.assertTrue(client.client.transport.wsdl_client.is_closed)
+
+    def test_unknown_fault_reraised(self):
+        self.backend.context_getData = self.raise_unknown
+        self.assertRaises(Fault, self.run_async, self.client.get_context(1))
+
+    @staticmethod
+    def raise_unknown(*args):
+        from ox_stub import StubFault
+        raise StubFault("some failure")
+
+
+class AsyncUserClientTests(AsyncClientTestCase):
+
+    def setUp(self):
+        super(AsyncUserClientTests, self).setUp()
+        self.client = AsyncUserClient(wsdl=self.server.user_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD))
+        self.user = {"name": "12097e62-adfa-47cf-b3ef-bec932019524", "display_name": "localpart",
+                     "primaryEmail": "localpart@domain.com"}
+
+    def tearDown(self):
+        self.run_async(self.client.close())
+        super(AsyncUserClientTests, self).tearDown()
+
+    def test_user_lifecycle(self):
+        created = self.run_async(self.client.create_user(1, dict(self.user), "gd_pim"))
+        self.assertEqual(created["name"], self.user["name"])
+        self.run_async(self.client.update_user(1, self.user["name"], {"display_name": "changed"}))
+        self.run_async(self.client.update_user_product(1, self.user["name"], "webmail"))
+        self.assertEqual(self.run_async(self.client.get_user(1, self.user["name"]))["display_name"], "changed")
+        self.run_async(self.client.delete_user(1, self.user["name"]))
+        self.assertRaises(exc.UserNotFound, self.run_async, self.client.get_user(1, self.user["name"]))
+
+    def test_create_conflict(self):
+        self.run_async(self.client.create_user(1, dict(self.user), "gd_pim"))
+        self.assertRaises(exc.UserConflict, self.run_async, self.client.create_user(1, dict(self.user), "gd_pim"))
+
+    def test_create_product_dne(self):
+        self.assertRaises(exc.NoSuchProduct, self.run_async, self.client.create_user(1, dict(self.user), "nope"))
+
+    def test_get_all_users_excludes_admin(self):
+        users = self.run_async(self.client.get_all_users(1))
+        self.assertEqual(len(users), 3)
+        self.assertTrue(all(user["name"] != CONTEXT_USER for user in users))
+
+    def test_iter_all_users_in_chunks(self):
+        async def collect():
+            return [user async for user in self.client.iter_all_users(1, chunk_size=2)]
+
+        self.assertEqual(len(self.run_async(collect())), 3)
+        self.assertEqual(self.server.requests["getMultipleData"], 2)
+
+    def test_get_all_context_dne(self):
+        self.assertRaises(exc.ContextNotFound, self.run_async, self.client.get_all_users(5))
+
+    def test_calls_in_flight_concurrently(self):
+        self.server.delay = 0.2
+        name = next(iter(self.backend.users[1]))
+        start = time.perf_counter()
+
+        async def fan_out():
+            return await asyncio.gather(*[self.client.get_user(1, name) for _ in range(50)])
+
+        users = self.run_async(fan_out())
+        self.assertEqual(len(users), 50)
+        # fifty sequential calls would take ten seconds
+        self.assertLess(time.perf_counter() - start, 2)
+
+
+
+class CertVerifyTests(AsyncClientTestCase):
+
+    def sync_verifies(self, client):
+        session = client.client.transport.session
+        return bool(session.merge_environment_settings("https://ox.test", {}, None, None, None)["verify"])
+
+    def async_verifies(self, client):
+        transport = client.client.transport
+        modes = set(http._transport._pool._ssl_context.verify_mode for http in (transport.client, transport.wsdl_client))
+        self.assertEqual(len(modes), 1)
+        return modes.pop() == ssl.CERT_REQUIRED
+
+    def check(self, cert_verify, verifies):
+        for sync_class, async_class, wsdl in ((ContextClient, AsyncContextClient, self.server.context_wsdl),
+                                              (UserClient, AsyncUserClient, self.server.user_wsdl)):
+            sync_client = sync_class(wsdl=wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD), cert_verify=cert_verify)
+            async_client = async_class(wsdl=wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD), cert_verify=cert_verify)
+            try:
+                self.assertEqual(self.sync_verifies(sync_client), verifies)
+                self.assertEqual(self.async_verifies(async_client), verifies)
+            finally:
+                self.run_async(async_client.close())
+
+    @mock.patch.dict(os.environ)
+    def test_none_verifies_like_sync_clients(self):
+        os.environ.pop("REQUESTS_CA_BUNDLE", None)
+        os.environ.pop("CURL_CA_BUNDLE", None)
+        self.check(None, False)
+
+    def test_true_verifies(self):
+        self.check(True, True)
+
+    @mock.patch.dict(os.environ)
+    def test_none_verifies_against_environment_bundle(self):
+        os.environ.pop("CURL_CA_BUNDLE", None)
+        os.environ["REQUESTS_CA_BUNDLE"] = requests.certs.where()
+        self.check(None, True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,8 @@ import mock
 from fenixlib import exc
 from collections import OrderedDict
 from fenixlib.clients.soap_context import ContextClient
+from fenixlib.schemas.context import envelope_theme
+from fenixlib.utils.ttlcache import TTLCache
 from zeep.exceptions import Fault
 from config_for_test import OX_CONTEXT_WSDL, OX_USER, CONTEXT_PASSWORD, OX_CERT_VERIFY
 
@@ -96,6 +98,91 @@ class ContextClientTests(BaseTestCase):
         self.assertRaises(exc.DomainInUse, self.client.update_context, 1, {"loginMappings": ["domain.com"]})
         self.assertEqual(self.client.service.change.call_count, 1)
 
+    def test_list_context_for_domain_fault_reraised(self):
+        fault = Fault("Context does not exist")
+        self.client.service.list.side_effect = [fault]
+        with self.assertRaises(Fault) as raised:
+            self.client.list_context_for_domain("domain.com")
+        self.assertIs(raised.exception, fault)
+
+class ContextCacheTests(BaseTestCase):
+
+    def setUp(self):
+        self.zeep_patcher = mock.patch('fenixlib.clients.soap_context.zeep')
+        self.mock_zeep = self.zeep_patcher.start()
+        self.mock_zeep.helpers.serialize_object.side_effect = lambda obj: obj
+        self.cache = TTLCache(maxsize=10, ttl=60)
+        self.client = ContextClient(wsdl=OX_CONTEXT_WSDL, auth=(OX_USER, CONTEXT_PASSWORD),
+                                    cert_verify=OX_CERT_VERIFY, context_cache=self.cache)
+        self.context = OrderedDict([("id", 1), ("loginMappings", ["domain.com", "1"])])
+        self.client.service.getData.return_value = self.context
+        self.client.service.list.return_value = [self.context]
+
+    def tearDown(self):
+        self.zeep_patcher.stop()
+
+    def test_get_context_cached(self):
+        self.assertEqual(self.client.get_context(1), self.context)
+        self.assertEqual(self.client.get_context("1"), self.context)
+        self.assertEqual(self.client.service.getData.call_count, 1)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_cached_copy_is_not_shared(self):
+        self.client.get_context(1)["theme"] = "godaddy"
+        self.assertNotIn("theme", self.client.get_context(1))
+
+    def test_list_context_for_domain_cached(self):
+        self.assertEqual(self.client.list_context_for_domain("domain.com"), [self.context])
+        self.assertEqual(self.client.list_context_for_domain("domain.com"), [self.context])
+        self.assertEqual(self.client.service.list.call_count, 1)
+
+    def test_errors_not_cached(self):
+        self.client.service.getData.side_effect = [Fault("Context does not exist"), self.context]
+        self.assertRaises(exc.ContextNotFound, self.client.get_context, 1)
+        self.assertEqual(self.client.get_context(1), self.context)
+
+    def test_update_invalidates(self):
+        self.client.get_context(1)
+        self.client.list_context_for_domain("domain.com")
+        self.client.list_context_for_domain("new.com")
+        self.client.update_context(1, {"loginMappings": ["new.com"]})
+        self.assertEqual(len(self.cache), 0)
+        self.client.get_context(1)
+        self.assertEqual(self.client.service.getData.call_count, 2)
+
+    def test_update_keeps_unrelated_entries(self):
+        self.client.get_context(2)
+        self.client.update_context(1, {"enabled": False})
+        self.client.get_context(2)
+        self.assertEqual(self.client.service.getData.call_count, 1)
+
+    def test_failed_update_invalidates(self):
+        self.client.get_context(1)
+        self.client.service.change.side_effect = [Fault("some failure")]
+        self.assertRaises(Fault, self.client.update_context, 1, {"enabled": False})
+        self.assertEqual(len(self.cache), 0)
+
+    def test_delete_invalidates(self):
+        self.client.get_context(1)
+        self.client.list_context_for_domain("domain.com")
+        self.client.delete_context(1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_update_sends_attributes_whatever_is_cached(self):
+        """A cached context may be stale, attributes which look unchanged against it are still sent"""
+        self.context["userAttributes"] = envelope_theme("godaddy")
+        self.client.get_context(1)
+        self.client.update_context(1, {"enabled": False, "userAttributes": envelope_theme("godaddy")})
+        self.assertEqual(self.client.service.change.call_args[0][0]["userAttributes"], envelope_theme("godaddy"))
+        self.assertEqual(self.cache.stats(), {"hits": 0, "misses": 1, "size": 0})
+
+    def test_create_invalidates_mapped_domains(self):
+        self.client.service.list.return_value = []
+        self.client.list_context_for_domain("fresh.com")
+        self.client.create_context({"id": 2, "loginMappings": ["fresh.com"]}, {"name": "admin"})
+        self.assertEqual(len(self.cache), 0)
+
+
 class ContextGetTests(BaseTestCase):
 
     def setUp(self):
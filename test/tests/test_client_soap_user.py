@@ -104,6 +104,31 @@ class UserClientTests(BaseTestCase):
         for existing in response:
             self.assertTrue(existing["name"] != "master_user")
 
+    def test_get_all_user_removes_every_admin_entry(self):
+        """The admin is filtered without mutating the list being iterated"""
+        self.mock_zeep.helpers.serialize_object.return_value = [context_user_factory(name=CONTEXT_USER),
+                                                                context_user_factory(name=CONTEXT_USER),
+                                                                context_user_factory()]
+        self.client.service.listAll.return_value = [{"id": 1}, {"id": 2}, {"id": 3}]
+        self.assertEqual([user["name"] for user in self.client.get_all_users(1)], [context_user_factory()["name"]])
+
+    def test_iter_all_users_chunks(self):
+        self.mock_zeep.helpers.serialize_object.side_effect = lambda users: [
+            context_user_factory(name=CONTEXT_USER if user["id"] == 1 else str(user["id"])) for user in users]
+        self.client.service.getMultipleData.side_effect = lambda context, users, auth: users
+        self.client.service.listAll.return_value = [{"id": index} for index in range(1, 6)]
+        users = self.client.iter_all_users(1, chunk_size=2)
+        self.assertEqual(self.client.service.getMultipleData.call_count, 0)
+        self.assertEqual(next(users)["name"], "2")
+        self.assertEqual(self.client.service.getMultipleData.call_count, 1)
+        self.assertEqual([user["name"] for user in users], ["3", "4", "5"])
+        self.assertEqual([call[0][1] for call in self.client.service.getMultipleData.call_args_list],
+                         [[{"id": 1}, {"id": 2}], [{"id": 3}, {"id": 4}], [{"id": 5}]])
+
+    def test_iter_all_context_dne_error(self):
+        self.client.service.listAll.side_effect = [Fault('Authentication failed')]
+        self.assertRaises(exc.ContextNotFound, list, self.client.iter_all_users(1))
+
     def test_get_all_context_dne_error(self):
         self.client.service.listAll.side_effect = [Fault('Authentication failed')]
         self.assertRaises(exc.ContextNotFound, self.client.get_all_users, 1)
@@ -213,6 +238,61 @@ class UserClientTests(BaseTestCase):
         self.assertEqual(self.client.service.delete.call_count, 1)
 
 
+class UserClientBulkTests(BaseTestCase):
+
+    def setUp(self):
+        self.zeep_patcher = mock.patch('fenixlib.clients.soap_user.zeep')
+        self.mock_zeep = self.zeep_patcher.start()
+        self.mock_zeep.helpers.serialize_object.side_effect = lambda obj: obj
+        self.client = UserClient(wsdl=OX_USER_WSDL, auth=(CONTEXT_USER, CONTEXT_PASSWORD), cert_verify=OX_CERT_VERIFY)
+        self.users = [context_user_factory(name="user-{}".format(index)) for index in range(20)]
+
+    def tearDown(self):
+        self.zeep_patcher.stop()
+
+    @staticmethod
+    def conflict_on(names):
+        def create(context, user, product_type, auth):
+            if user["name"] in names:
+                raise Fault('User {} already exists in this context'.format(user["name"]))
+            return user
+        return create
+
+    def test_create_users_happy(self):
+        self.client.service.createByModuleAccessName.side_effect = self.conflict_on(())
+        results = self.client.create_users(1, self.users, "gd_pim", concurrency=4)
+        self.assertEqual([result.item for result in results], self.users)
+        self.assertEqual([result.result for result in results], self.users)
+        self.assertTrue(all(result.error is None and not result.skipped for result in results))
+        self.assertEqual(self.client.service.createByModuleAccessName.call_count, 20)
+
+    def test_create_users_continue_keeps_mapped_errors(self):
+        self.client.service.createByModuleAccessName.side_effect = self.conflict_on(("user-3", "user-7"))
+        results = self.client.create_users(1, self.users, "gd_pim", concurrency=4)
+        failed = [result for result in results if result.error is not None]
+        self.assertEqual([result.item["name"] for result in failed], ["user-3", "user-7"])
+        self.assertTrue(all(isinstance(result.error, exc.UserConflict) for result in failed))
+        self.assertEqual(self.client.service.createByModuleAccessName.call_count, 20)
+
+    def test_create_users_fail_fast(self):
+        self.client.service.createByModuleAccessName.side_effect = self.conflict_on(("user-0",))
+        results = self.client.create_users(1, self.users, "gd_pim", concurrency=1, fail_fast=True)
+        self.assertIsInstance(results[0].error, exc.UserConflict)
+        self.assertTrue(all(result.skipped for result in results[1:]))
+        self.assertEqual(self.client.service.createByModuleAccessName.call_count, 1)
+
+    def test_update_users(self):
+        diffs = [(user["name"], {"display_name": "changed"}) for user in self.users[:5]]
+        results = self.client.update_users(1, diffs)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.client.service.change.call_count, 5)
+
+    def test_delete_users_maps_errors(self):
+        self.client.service.delete.side_effect = Fault("No such user missing in context 1")
+        results = self.client.delete_users(1, ["missing"])
+        self.assertIsInstance(results[0].error, exc.UserNotFound)
+
+
 if __name__ == '__main__':
     unittest.main()
 
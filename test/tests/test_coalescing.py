@@ -0,0 +1,152 @@
+"""
+Test Suite for coalescing bursts of writes
+"""
+from basetest import BaseTestCase # import this first
+import threading
+import time
+import unittest
+import mock
+from concurrent.futures import Future
+from fenixlib import exc
+from fenixlib.clients.coalescing import WriteCoalescer, merge_changes
+from fenixlib.schemas.context import envelope_theme
+from zeep.exceptions import Fault
+
+MAILBOX = "12097e62-adfa-47cf-b3ef-bec932019524"
+
+
+def writes(*entries):
+    return [(kind, (1, MAILBOX), payload, Future()) for kind, payload in entries]
+
+
+class MergeChangesTests(BaseTestCase):
+
+    def test_later_fields_win(self):
+        self.assertEqual(merge_changes([{"status": "suspended", "quota": 1}, {"quota": 2}, {"status": None}]),
+                         {"status": "suspended", "quota": 2})
+
+    def test_attributes_merged(self):
+        mail = {"entries": [{"key": "mail", "value": {"entries": [{"key": "a", "value": "b"}]}}]}
+        merged = merge_changes([{"userAttributes": envelope_theme("godaddy")}, {"userAttributes": mail}])
+        self.assertEqual(merged["userAttributes"], {"entries": envelope_theme("godaddy")["entries"] + mail["entries"]})
+
+
+class WriteCoalescerTests(BaseTestCase):
+
+    def setUp(self):
+        self.user_client = mock.Mock()
+        self.context_client = mock.Mock()
+        self.coalescer = WriteCoalescer(self.user_client, self.context_client, window=0.2)
+
+    def test_send_merges_runs_around_product_changes(self):
+        batch = writes(("change", {"status": "active"}), ("change", {"quota": 5}), ("product", "gd_pim"),
+                       ("change", {"quota": 6}))
+        self.coalescer._send(batch)
+        self.assertEqual(self.user_client.method_calls, [
+            mock.call.update_user(1, MAILBOX, {"status": "active", "quota": 5}),
+            mock.call.update_user_product(1, MAILBOX, "gd_pim"),
+            mock.call.update_user(1, MAILBOX, {"quota": 6})])
+        self.assertTrue(all(write[3].done() for write in batch))
+        self.assertEqual(self.coalescer.stats(), {"writes": 0, "sent": 3, "coalesced": 1, "resent": 0})
+
+    def test_refused_merge_resent_one_by_one(self):
+        self.user_client.update_user.side_effect = [exc.OXException("bad quota"), None, exc.OXException("bad quota")]
+        batch = writes(("change", {"status": "active"}), ("change", {"quota": -5}))
+        self.coalescer._send(batch)
+        self.assertIsNone(batch[0][3].result())
+        self.assertRaises(exc.OXException, batch[1][3].result)
+        self.assertEqual(self.user_client.update_user.call_count, 3)
+
+    def test_per_write_faults_resent_one_by_one(self):
+        for error in (exc.UserNotFound("gone"), exc.UserConflict("taken"), exc.NoSuchProduct("no product"),
+                      exc.DomainInUse("mapped"), Fault("invalid value")):
+            self.user_client.update_user.reset_mock()
+            self.user_client.update_user.side_effect = [error, None, error]
+            batch = writes(("change", {"status": "active"}), ("change", {"quota": 5}))
+            self.coalescer._send(batch)
+            self.assertIsNone(batch[0][3].result())
+            self.assertRaises(type(error), batch[1][3].result)
+            self.assertEqual(self.user_client.update_user.call_count, 3)
+
+    def test_missing_context_not_resent(self):
+        self.user_client.update_user.side_effect = [exc.ContextNotFound("gone")]
+        batch = writes(("change", {"status": "active"}), ("change", {"quota": 5}))
+        self.coalescer._send(batch)
+        for write in batch:
+            self.assertRaises(exc.ContextNotFound, write[3].result)
+        self.assertEqual(self.user_client.update_user.call_count, 1)
+
+    def test_one_missing_user_in_a_burst(self):
+        def update_user(context_id, mailbox_uid, user_diff):
+            if mailbox_uid == "b":
+                raise exc.UserNotFound("No such user b in context 1")
+
+        self.user_client.update_user.side_effect = update_user
+        outcomes = {}
+
+        def write(uid, diff):
+            try:
+                outcomes[uid, len(diff)] = self.coalescer.update_user(1, uid, diff)
+            except exc.UserNotFound as error:
+                outcomes[uid, len(diff)] = error
+
+        threads = [threading.Thread(target=write, args=(uid, diff)) for uid in "abc"
+                   for diff in ({"quota": 1}, {"quota": 1, "status": "active"})]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for uid in "ac":
+            self.assertEqual([outcomes[uid, size] for size in (1, 2)], [None, None])
+        for size in (1, 2):
+            self.assertIsInstance(outcomes["b", size], exc.UserNotFound)
+        # a and c merged their two writes, b's refused merge was resent write by write
+        self.assertEqual(self.user_client.update_user.call_count, 5)
+        self.assertEqual(self.coalescer.stats()["resent"], 2)
+
+    def test_concurrent_writes_share_a_call(self):
+        results = []
+
+        def write(diff):
+            results.append(self.coalescer.update_user(1, MAILBOX, diff))
+
+        threads = [threading.Thread(target=write, args=({"field{}".format(index): index},)) for index in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.user_client.update_user.call_count, 1)
+        self.assertEqual(len(self.user_client.update_user.call_args[0][2]), 5)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.coalescer.stats()["coalesced"], 4)
+
+    def test_batches_for_an_object_run_in_order(self):
+        order = []
+
+        def update_context(context_id, context):
+            if "first" in context:
+                time.sleep(0.4)
+            order.append(sorted(context))
+
+        self.context_client.update_context.side_effect = update_context
+        first = threading.Thread(target=self.coalescer.update_context, args=(1, {"first": True}))
+        first.start()
+        # arrives after the first batch closed, its window ends while the first is still being sent
+        time.sleep(0.25)
+        self.coalescer.update_context(1, {"second": True})
+        first.join()
+        self.assertEqual(order, [["first"], ["second"]])
+        self.assertEqual(self.coalescer._last, {})
+
+    def test_other_objects_not_merged(self):
+        threads = [threading.Thread(target=self.coalescer.update_user, args=(1, uid, {"quota": 1}))
+                   for uid in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.user_client.update_user.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+"""
+Test Suite for compiled schemas, every result and error is compared with marshmallow's own
+"""
+from basetest import BaseTestCase # import this first
+import copy
+import datetime
+import random
+import unittest
+import uuid
+from collections import OrderedDict
+from marshmallow import Schema, ValidationError, fields, validates
+from marshmallow.schema import MarshalResult, UnmarshalResult
+from fenixlib.schemas.compiled import CompiledSchema
+from fenixlib.schemas.context import Context, OXContext, AdminUserSchema, ContextAccessSchema, envelope_theme
+from fenixlib.schemas.user_dovecot import ImapUser
+from util_for_test import imap_user_data_factory, deleted_user_data_factory
+
+# timestamps set by post_dump hooks
+VOLATILE = ("updated",)
+
+
+class Opaque(object):
+    """A value no field accepts, copies are the same object so error messages mentioning it compare equal"""
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def _run(method, record):
+    try:
+        result = method(copy.deepcopy(record))
+    except ValidationError as error:
+        return "error", error.messages
+    except Exception as error:
+        # marshmallow lets some exceptions of fields and hooks through, compiled schemas must do the same
+        return "raised", type(error), str(error)
+    data = result.data
+    for item in (data if isinstance(data, list) else [data]):
+        for key in VOLATILE:
+            if isinstance(item, dict) and key in item:
+                item[key] = type(item[key]).__name__
+    return "ok", data, result.errors
+
+
+def imap_records():
+    created = datetime.datetime(2018, 3, 1, 8, tzinfo=datetime.timezone.utc)
+    record = imap_user_data_factory()
+    yield record
+    yield deleted_user_data_factory()
+    yield dict(record, created="2018-03-01T08:00:00+00:00")
+    yield dict(record, created=created, uid=uuid.UUID(record["uid"]))
+    yield dict(record, sso_salt=None, context_id="7")
+    yield dict(record, status="unknown")
+    yield dict(record, uid="not-a-uuid")
+    yield dict(record, quota_bytes=None)
+    yield dict(record, quota_bytes="many")
+    yield dict((key, value) for key, value in record.items() if key != "access_id")
+    yield dict(record, updated=created)
+    yield OrderedDict(record)
+    yield [record, deleted_user_data_factory()]
+    yield "not a record"
+
+
+def context_records():
+    yield {"contextId": 5, "domains": ["domain.com", "other.org"], "theme": "godaddy"}
+    yield {"domains": ["domain.com"], "theme": "godaddy"}
+    yield {"contextId": 5, "domains": ["domain"], "theme": "godaddy"}
+    yield {"contextId": 5, "domains": "domain.com", "theme": "godaddy"}
+    yield {"contextId": 5, "domains": ["domain.com"], "theme": "other"}
+    yield {"contextId": 5, "domains": ["domain.com"], "theme": None}
+    yield {"contextId": 5, "domains": ["domain.com"]}
+    yield {"id": 5, "domains": ["domain.com"], "userAttributes": envelope_theme("godaddy")}
+    yield {"id": 5, "domains": ["domain.com"], "theme": "godaddy", "userAttributes": None}
+
+
+def ox_context_records():
+    yield {"id": 5, "loginMappings": ["5", "domain.com"], "maxQuota": 1024}
+    yield {"id": 5, "loginMappings": ["domain.com"], "maxQuota": None, "enabled": "false",
+           "userAttributes": envelope_theme("godaddy")}
+    yield {"id": 5, "domains": ["5", "domain.com"], "usedQuota": 10}
+    yield {"id": "x", "loginMappings": []}
+    yield {"loginMappings": []}
+    yield {"id": 5, "loginMappings": [], "enabled": "maybe"}
+    yield {"id": 5, "loginMappings": [], "userAttributes": "flat"}
+
+
+def admin_records():
+    yield {"name": "admin@domain.com", "password": "secret"}
+    yield {"name": "admin@domain.com", "given_name": "Given", "mail_enabled": 1}
+    yield {}
+    yield {"name": 5, "display_name": b"bytes"}
+
+
+def access_records():
+    created = datetime.datetime(2018, 3, 1, 8, tzinfo=datetime.timezone.utc)
+    yield {"context_id": "1", "access_id": "abc", "created": created}
+    yield {"context_id": "1", "access_id": "abc", "created": "2018-03-01T08:00:00+00:00"}
+    yield {"context_id": 1, "access_id": "abc"}
+    yield {"access_id": "abc"}
+    yield {"context_id": "1", "access_id": "abc", "created": "yesterday"}
+
+
+CASES = [
+    (ImapUser, imap_records),
+    (Context, context_records),
+    (OXContext, ox_context_records),
+    (AdminUserSchema, admin_records),
+    (ContextAccessSchema, access_records),
+]
+
+
+class CompiledSchemaTests(BaseTestCase):
+
+    def assertSame(self, schema, record, many=None):
+        compiled = CompiledSchema(schema)
+        self.assertEqual(_run(lambda data: compiled.load(data, many=many), record),
+                         _run(lambda data: schema.load(data, many=many), record))
+        self.assertEqual(_run(lambda data: compiled.dump(data, many=many), record),
+                         _run(lambda data: schema.dump(data, many=many), record))
+
+    def test_compiled(self):
+        for schema_class, _ in CASES:
+            compiled = CompiledSchema(schema_class())
+            self.assertIsNotNone(compiled.load_one, schema_class.__name__)
+            self.assertIsNotNone(compiled.dump_one, schema_class.__name__)
+
+    def test_same_results_and_errors(self):
+        for schema_class, records in CASES:
+            for record in records():
+                with self.subTest(schema=schema_class.__name__, record=record):
+                    self.assertSame(schema_class(), record, many=isinstance(record, list))
+
+    def test_valid_records_compiled(self):
+        created = datetime.datetime(2018, 3, 1, 8, tzinfo=datetime.timezone.utc)
+        valid = [
+            (ImapUser, dict(imap_user_data_factory(), created="2018-03-01T08:00:00+00:00"),
+             dict(imap_user_data_factory(), created=created)),
+            (Context, {"contextId": 5, "domains": ["domain.com"], "theme": "godaddy"},
+             {"id": 5, "domains": ["domain.com"], "userAttributes": envelope_theme("godaddy")}),
+            (OXContext, {"id": 5, "loginMappings": ["5", "domain.com"]}, {"id": 5, "domains": ["domain.com"]}),
+            (AdminUserSchema, {"name": "admin@domain.com"}, {"name": "admin@domain.com"}),
+            (ContextAccessSchema, {"context_id": "1", "access_id": "abc"}, {"context_id": "1", "created": created}),
+        ]
+        for schema_class, loaded, dumped in valid:
+            schema = schema_class()
+            compiled = CompiledSchema(schema)
+            with self.subTest(schema=schema_class.__name__):
+                # called directly, the compiled functions raise instead of falling back
+                self.assertEqual(_run(lambda data: UnmarshalResult(compiled.load_one(data), {}), loaded),
+                                 _run(schema.load, loaded))
+                self.assertEqual(_run(lambda data: MarshalResult(compiled.dump_one(data), {}), dumped),
+                                 _run(schema.dump, dumped))
+
+    def test_many(self):
+        for schema_class, records in CASES:
+            batch = [record for record in records() if isinstance(record, dict)]
+            with self.subTest(schema=schema_class.__name__):
+                self.assertSame(schema_class(), batch, many=True)
+                self.assertSame(schema_class(many=True), batch)
+
+    def test_hooks(self):
+        compiled = CompiledSchema(Context())
+        loaded = compiled.load({"contextId": 5, "domains": ["domain.com"], "theme": "godaddy"}).data
+        self.assertEqual(loaded["userAttributes"], envelope_theme("godaddy"))
+        dumped = compiled.dump({"id": 5, "domains": ["domain.com"], "userAttributes": envelope_theme("godaddy")})
+        self.assertEqual(dumped.data, {"contextId": 5, "domains": ["domain.com"], "theme": "godaddy"})
+        self.assertEqual(CompiledSchema(OXContext()).load({"id": 5, "loginMappings": ["5", "a.com"]}).data,
+                         {"id": 5, "domains": ["a.com"]})
+        created = datetime.datetime(2018, 3, 1, 8, tzinfo=datetime.timezone.utc)
+        dumped = CompiledSchema(ImapUser()).dump(dict(imap_user_data_factory(), created=created)).data
+        self.assertTrue(dumped["updated"].startswith(str(datetime.datetime.now(tz=datetime.timezone.utc).year)))
+
+    def test_strict_errors_raise(self):
+        compiled = CompiledSchema(ImapUser())
+        with self.assertRaises(ValidationError) as raised:
+            compiled.load(dict(imap_user_data_factory(), created="2018-03-01T08:00:00+00:00", status="unknown"))
+        self.assertEqual(list(raised.exception.messages), ["status"])
+
+    def test_random_records(self):
+        rng = random.Random(7)
+        values = [None, "", "x", "godaddy", "domain.com", "5", 5, -1, 2 ** 70, 1.5, True, "true", [], ["a.com"],
+                  ["5", "b.org"], {}, {"entries": []}, "2018-03-01T08:00:00+00:00", str(uuid.UUID(int=1)),
+                  datetime.datetime(2018, 3, 1), Opaque()]
+        for schema_class, _ in CASES:
+            schema = schema_class()
+            names = list(schema.fields) + ["id", "loginMappings", "uid", "userAttributes", "extra"]
+            for _ in range(300):
+                record = dict((rng.choice(names), rng.choice(values)) for _ in range(rng.randint(0, 8)))
+                with self.subTest(schema=schema_class.__name__, record=record):
+                    self.assertSame(schema, record)
+
+    def test_unsupported_schema_uses_marshmallow(self):
+
+        class Validated(Schema):
+            name = fields.String()
+
+            @validates("name")
+            def check(self, value):
+                if value == "bad":
+                    raise ValidationError("bad name")
+
+        compiled = CompiledSchema(Validated())
+        self.assertIsNone(compiled.load_one)
+        self.assertEqual(compiled.load({"name": "bad"}).errors, {"name": ["bad name"]})
+        self.assertEqual(compiled.dump({"name": "good"}).data, {"name": "good"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Test Suite for the compiled zeep object converters
+Every case compares against zeep.helpers.serialize_object, including key order and container types
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+import zeep
+from zeep.helpers import serialize_object
+from fenixlib.clients.converters import ObjectConverter
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend, user_factory
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+AUTH = {"login": CONTEXT_USER, "password": CONTEXT_PASSWORD}
+
+
+class ConverterEquivalenceTests(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        backend = OXStubBackend(admin_name=CONTEXT_USER)
+        backend.add_context(1, ["domain.com", "other.com"], users=5, theme="godaddy")
+        backend.add_context(2, [], users=0)
+        user = user_factory(50, "attributes-user")
+        user["aliases"] = []
+        user["userAttributes"] = {"entries": [
+            {"key": "config", "value": {"entries": [{"key": "a", "value": "1"}, {"key": "b", "value": None}]}},
+            {"key": "empty", "value": {"entries": []}},
+        ]}
+        backend.users[1][user["name"]] = user
+        cls.server = OXStubServer(backend).start()
+        cls.context_client = zeep.Client(cls.server.context_wsdl)
+        cls.user_client = zeep.Client(cls.server.user_wsdl)
+        cls.context_converter = ObjectConverter(cls.context_client.wsdl.types)
+        cls.user_converter = ObjectConverter(cls.user_client.wsdl.types)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def assertSameSerialization(self, converter, obj):
+        expected = serialize_object(obj)
+        result = converter(obj)
+        self.assertEqual(result, expected)
+        # equality ignores OrderedDict vs dict and key order for dicts, repr does not
+        self.assertEqual(repr(result), repr(expected))
+
+    def test_context_with_attributes(self):
+        self.assertSameSerialization(self.context_converter, self.context_client.service.getData({"id": 1}, AUTH))
+
+    def test_context_without_mappings(self):
+        self.assertSameSerialization(self.context_converter, self.context_client.service.getData({"id": 2}, AUTH))
+
+    def test_context_list(self):
+        self.assertSameSerialization(self.context_converter, self.context_client.service.list("*", AUTH))
+
+    def test_empty_list(self):
+        self.assertSameSerialization(self.context_converter, self.context_client.service.list("nothing", AUTH))
+
+    def test_users(self):
+        ids = [{"id": user_id} for user_id in range(2, 8)] + [{"id": 50}]
+        self.assertSameSerialization(self.user_converter,
+                                     self.user_client.service.getMultipleData({"id": 1}, ids, AUTH))
+
+    def test_user_with_nested_attributes(self):
+        self.assertSameSerialization(self.user_converter,
+                                     self.user_client.service.getData({"id": 1}, {"name": "attributes-user"}, AUTH))
+
+    def test_plain_values(self):
+        for value in (None, 1, "text", {"key": ["a"]}):
+            self.assertSameSerialization(self.user_converter, value)
+
+    def fetch_with_clients(self, fast_serialize):
+        contexts = ContextClient(wsdl=self.server.context_wsdl, fast_serialize=fast_serialize)
+        users = UserClient(wsdl=self.server.user_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                           fast_serialize=fast_serialize)
+        return (contexts.get_context(1), contexts.list_context_for_domain("domain.com"),
+                users.get_all_users(1), users.get_user(1, "attributes-user"))
+
+    def test_clients_fast_serialize(self):
+        self.assertEqual(repr(self.fetch_with_clients(True)), repr(self.fetch_with_clients(False)))
+
+if __name__ == '__main__':
+    unittest.main()
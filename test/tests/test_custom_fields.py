@@ -2,9 +2,12 @@
 Test Suite for go daddy custom fields
 """
 from basetest import BaseTestCase  #import this first
+import re
 import unittest
-from marshmallow import Schema
-from fenixlib.schemas.custom_fields import OXEmail
+from marshmallow import Schema, ValidationError
+from fenixlib.schemas.custom_fields import OXEmail, OXDomain, CustomDomainValidator, OXValidatorEmail, \
+    clear_verdicts, verdict_stats
+from fenixlib.schemas.context import Context
 
 class OXEmailSchema(Schema):
     user_id = OXEmail()
@@ -63,6 +66,67 @@ class CustomFieldsValidationTest(BaseTestCase):
         result2 = self.oxemail_resp.dump(response_data).data
         self.assertEqual(result2, {'user_id': 'test@hello.world.co.uk'})
 
+    def test_validator_built_once(self):
+        field = OXEmail()
+        self.assertIs(field.validators[0], field._validator)
+        self.assertIs(field._validated('test@test.com'), 'test@test.com')
+        self.assertIs(field._validator, field.validators[0])
+
+
+class VerdictCacheTest(BaseTestCase):
+
+    def setUp(self):
+        clear_verdicts()
+
+    def test_repeated_domains_hit(self):
+        schema = Context()
+        data = {'contextId': 1, 'theme': 'godaddy', 'domains': ['domain.com', 'other.org'] * 50}
+        self.assertEqual(schema.load(data).data['domains'], data['domains'])
+        stats = verdict_stats()['domains']
+        self.assertEqual((stats['misses'], stats['hits'], stats['size']), (2, 98, 2))
+        self.assertEqual(stats['hit_rate'], 0.98)
+
+    def test_invalid_verdict_cached(self):
+        field = OXDomain()
+        for _ in range(2):
+            with self.assertRaises(ValidationError) as raised:
+                field.deserialize('not a domain')
+            self.assertEqual(raised.exception.messages, ['Not a valid domain.'])
+        self.assertEqual(verdict_stats()['domains'], {'hits': 1, 'misses': 1, 'size': 1, 'hit_rate': 0.5})
+
+    def test_emails(self):
+        schema = OXEmailSchema()
+        for _ in range(3):
+            self.assertEqual(schema.load({'user_id': 'test@test.com'}).errors, {})
+            self.assertEqual(schema.load({'user_id': 'test@invaliddomain'}).errors,
+                             {'user_id': ['Not a valid email address.']})
+        self.assertEqual(verdict_stats()['emails']['hits'], 4)
+
+    def test_non_strings_not_cached(self):
+        self.assertRaises(TypeError, OXDomain()._validated, 5)
+        self.assertEqual(verdict_stats()['domains']['size'], 0)
+
+    def test_long_values_not_cached(self):
+        domain = '.'.join(['a' * 100] * 3) + '.com'
+        self.assertEqual(OXDomain()._validated(domain), domain)
+        self.assertRaises(ValidationError, OXDomain()._validated, 'a' * 5000)
+        self.assertRaises(ValidationError, OXEmail()._validated, 'a' * 5000 + '@test.com')
+        self.assertEqual(verdict_stats()['domains']['size'], 0)
+        self.assertEqual(verdict_stats()['emails']['size'], 0)
+
+    def test_subclass_patterns_used(self):
+        class DotComValidator(CustomDomainValidator):
+            DOMAIN_REGEX = r'[a-z]+\.com\Z'
+
+        class DotComEmailValidator(OXValidatorEmail):
+            DOMAIN_REGEX = re.compile(r'[a-z]+\.com\Z')
+
+        self.assertEqual(DotComValidator()('domain.com'), 'domain.com')
+        self.assertRaises(ValidationError, DotComValidator(), 'domain.org')
+        self.assertEqual(DotComEmailValidator()('test@domain.com'), 'test@domain.com')
+        self.assertRaises(ValidationError, DotComEmailValidator(), 'test@domain.org')
+        self.assertEqual(verdict_stats()['domains']['size'], 0)
+        self.assertEqual(verdict_stats()['emails']['size'], 0)
 
     def tearDown(self):
         pass
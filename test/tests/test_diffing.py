@@ -0,0 +1,197 @@
+"""
+Test Suite for suppressing change calls which change nothing
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+import mock
+from collections import OrderedDict
+from fenixlib import exc
+from fenixlib.clients.diffing import ChangeDiffer, element_size
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from fenixlib.schemas.context import envelope_theme
+from fenixlib.utils.ttlcache import TTLCache
+from zeep.exceptions import Fault
+from config_for_test import OX_CONTEXT_WSDL, OX_USER_WSDL, OX_USER, CONTEXT_USER, CONTEXT_PASSWORD, OX_CERT_VERIFY
+
+MAILBOX = "12097e62-adfa-47cf-b3ef-bec932019524"
+
+
+class ChangeDifferTests(BaseTestCase):
+
+    def setUp(self):
+        self.differ = ChangeDiffer()
+        self.user = {"name": MAILBOX, "display_name": "localpart", "aliases": ["a@domain.com", "b@domain.com"],
+                     "userAttributes": envelope_theme("godaddy")}
+
+    def test_reduce_keeps_changed_fields(self):
+        change = {"name": MAILBOX, "display_name": "other", "aliases": ["b@domain.com", "a@domain.com"]}
+        self.assertEqual(self.differ.reduce(self.user, change, keep=("name",)),
+                         {"name": MAILBOX, "display_name": "other"})
+        self.assertEqual(self.differ.stats(), {"sent": 1, "suppressed": 0, "fields_dropped": 1,
+                                               "bytes_saved": element_size("aliases", change["aliases"])})
+
+    def test_reduce_suppresses_no_ops(self):
+        change = {"name": MAILBOX, "display_name": "localpart", "userAttributes": envelope_theme("godaddy"),
+                  "sur_name": None}
+        self.assertIsNone(self.differ.reduce(self.user, change, keep=("name",)))
+        stats = self.differ.stats()
+        self.assertEqual((stats["sent"], stats["suppressed"], stats["fields_dropped"]), (0, 1, 3))
+        self.assertEqual(stats["bytes_saved"], sum(element_size(key, value) for key, value in change.items()))
+
+    def test_reduce_attributes(self):
+        attributes = {"entries": [
+            {"key": "config", "value": {"entries": [{"key": "io.ox/core//theme", "value": "io.ox.godaddy"},
+                                                    {"key": "io.ox/mail//layout", "value": "list"}]}}]}
+        reduced = self.differ.reduce(self.user, {"name": MAILBOX, "userAttributes": attributes}, keep=("name",))
+        self.assertEqual(reduced["userAttributes"], {"entries": [
+            {"key": "config", "value": {"entries": [{"key": "io.ox/mail//layout", "value": "list"}]}}]})
+
+    def test_without_snapshot_sends_everything(self):
+        change = {"name": MAILBOX, "display_name": "localpart"}
+        self.assertIs(self.differ.reduce(None, change, keep=("name",)), change)
+        self.assertEqual(self.differ.stats()["sent"], 1)
+
+    def test_snapshot_fetched_once(self):
+        read = mock.Mock(return_value=self.user)
+        differ = ChangeDiffer(fetch=True)
+        self.assertIs(differ.snapshot("key", read), self.user)
+        self.assertIs(differ.snapshot("key", read), self.user)
+        self.assertEqual(read.call_count, 1)
+
+    def test_snapshot_not_fetched_by_default(self):
+        read = mock.Mock(return_value=self.user)
+        self.assertIsNone(self.differ.snapshot("key", read))
+        self.assertEqual(read.call_count, 0)
+        self.differ.seen("key", self.user)
+        self.assertEqual(self.differ.snapshot("key", read), self.user)
+        self.assertIsNot(self.differ.snapshot("key", read), self.user)
+        self.assertEqual(read.call_count, 0)
+
+    def test_applied_updates_snapshot(self):
+        sent = {"name": MAILBOX, "display_name": "other",
+                "userAttributes": {"entries": [{"key": "mail", "value": {"entries": [{"key": "a", "value": "b"}]}}]}}
+        self.differ.applied("key", self.user, sent)
+        updated = self.differ.snapshots.get("key")
+        self.assertEqual(updated["display_name"], "other")
+        self.assertEqual(len(updated["userAttributes"]["entries"]), 2)
+        self.assertEqual(self.user["display_name"], "localpart")
+        self.differ.forget("key")
+        self.assertEqual(len(self.differ.snapshots), 0)
+
+    def test_applied_keeps_identifying_fields(self):
+        self.differ.applied("key", {"id": 1, "enabled": True}, {"id": "1", "enabled": False}, keep=("id",))
+        self.assertEqual(self.differ.snapshots.get("key"), {"id": 1, "enabled": False})
+
+
+class UserClientDiffTests(BaseTestCase):
+
+    def setUp(self):
+        self.zeep_patcher = mock.patch('fenixlib.clients.soap_user.zeep')
+        self.mock_zeep = self.zeep_patcher.start()
+        self.mock_zeep.helpers.serialize_object.side_effect = lambda obj: obj
+        self.differ = ChangeDiffer(fetch=True)
+        self.client = UserClient(wsdl=OX_USER_WSDL, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                                 cert_verify=OX_CERT_VERIFY, differ=self.differ)
+        self.client.service.getData.return_value = OrderedDict([
+            ("id", 2), ("name", MAILBOX), ("display_name", "localpart"), ("primaryEmail", "localpart@domain.com")])
+
+    def tearDown(self):
+        self.zeep_patcher.stop()
+
+    def test_no_op_skips_change(self):
+        self.client.update_user(1, MAILBOX, {"display_name": "localpart"})
+        self.assertEqual(self.client.service.getData.call_count, 1)
+        self.assertEqual(self.client.service.change.call_count, 0)
+        self.assertEqual(self.differ.stats()["suppressed"], 1)
+
+    def test_sends_changed_fields_and_remembers_them(self):
+        self.client.update_user(1, MAILBOX, {"display_name": "other", "primaryEmail": "localpart@domain.com"})
+        self.client.service.change.assert_called_with({"id": 1}, {"name": MAILBOX, "display_name": "other"},
+                                                      self.client.auth)
+        self.client.update_user(1, MAILBOX, {"display_name": "other"})
+        self.assertEqual(self.client.service.change.call_count, 1)
+        self.assertEqual(self.client.service.getData.call_count, 1)
+
+    def test_failed_change_forgets_snapshot(self):
+        self.client.service.change.side_effect = [Fault("some failure"), None]
+        self.assertRaises(exc.OXException, self.client.update_user, 1, MAILBOX, {"display_name": "other"})
+        self.client.update_user(1, MAILBOX, {"display_name": "other"})
+        self.assertEqual(self.client.service.getData.call_count, 2)
+        self.assertEqual(self.client.service.change.call_count, 2)
+
+    def test_missing_user_raises(self):
+        self.client.service.getData.side_effect = [Fault("No such user {} in context 1".format(MAILBOX))]
+        self.assertRaises(exc.UserNotFound, self.client.update_user, 1, MAILBOX, {"display_name": "other"})
+        self.assertEqual(self.client.service.change.call_count, 0)
+
+    def test_delete_forgets_snapshot(self):
+        self.client.update_user(1, MAILBOX, {"display_name": "localpart"})
+        self.client.delete_user(1, MAILBOX)
+        self.assertEqual(len(self.differ.snapshots), 0)
+
+    def test_without_fetch_reduces_against_reads(self):
+        self.client.differ = self.differ = ChangeDiffer()
+        self.client.update_user(1, MAILBOX, {"display_name": "localpart"})
+        self.assertEqual(self.client.service.getData.call_count, 0)
+        self.assertEqual(self.client.service.change.call_count, 1)
+        self.client.get_user(1, MAILBOX)
+        self.client.update_user(1, MAILBOX, {"display_name": "localpart"})
+        self.assertEqual(self.client.service.getData.call_count, 1)
+        self.assertEqual(self.client.service.change.call_count, 1)
+
+
+class ContextClientDiffTests(BaseTestCase):
+
+    def setUp(self):
+        self.zeep_patcher = mock.patch('fenixlib.clients.soap_context.zeep')
+        self.mock_zeep = self.zeep_patcher.start()
+        self.mock_zeep.helpers.serialize_object.side_effect = lambda obj: obj
+        self.differ = ChangeDiffer(fetch=True)
+        self.client = ContextClient(wsdl=OX_CONTEXT_WSDL, auth=(OX_USER, CONTEXT_PASSWORD), cert_verify=OX_CERT_VERIFY,
+                                    context_cache=TTLCache(maxsize=10, ttl=60), differ=self.differ)
+        self.client.service.getData.return_value = OrderedDict([
+            ("id", 1), ("enabled", True), ("loginMappings", ["domain.com", "1"]),
+            ("userAttributes", envelope_theme("godaddy"))])
+
+    def tearDown(self):
+        self.zeep_patcher.stop()
+
+    def test_no_op_skips_change(self):
+        self.client.update_context(1, {"loginMappings": ["domain.com"], "enabled": True,
+                                       "userAttributes": envelope_theme("godaddy")})
+        self.assertEqual(self.client.service.change.call_count, 0)
+        self.assertEqual(self.differ.stats()["suppressed"], 1)
+
+    def test_sends_changed_fields(self):
+        self.client.update_context(1, {"loginMappings": ["domain.com", "new.com"], "enabled": True})
+        self.client.service.change.assert_called_with({"id": "1", "loginMappings": ["domain.com", "new.com", "1"]},
+                                                      self.client.auth)
+        self.client.update_context(1, {"loginMappings": ["new.com", "domain.com"]})
+        self.assertEqual(self.client.service.change.call_count, 1)
+
+    def test_sends_changed_attributes(self):
+        attributes = {"entries": [
+            {"key": "config", "value": {"entries": [{"key": "io.ox/core//theme", "value": "io.ox.godaddy"}]}},
+            {"key": "mail", "value": {"entries": [{"key": "signature", "value": "regards"}]}}]}
+        self.client.update_context(1, {"userAttributes": attributes})
+        self.assertEqual(self.client.service.change.call_args[0][0]["userAttributes"], {"entries": [
+            {"key": "mail", "value": {"entries": [{"key": "signature", "value": "regards"}]}}]})
+
+    def test_snapshot_not_taken_from_context_cache(self):
+        stale = OrderedDict([("id", 1), ("enabled", False), ("userAttributes", envelope_theme("other"))])
+        self.client.context_cache.set(("id", "1"), stale)
+        self.client.update_context(1, {"enabled": False, "userAttributes": envelope_theme("other")})
+        sent = self.client.service.change.call_args[0][0]
+        self.assertEqual(sent, {"id": "1", "enabled": False, "userAttributes": envelope_theme("other")})
+        self.assertEqual(self.client.service.getData.call_count, 1)
+
+    def test_snapshot_keeps_numeric_id(self):
+        self.client.update_context(1, {"enabled": False})
+        self.assertEqual(self.differ.snapshots.get(("context", "1"))["id"], 1)
+        self.client.update_context(1, {"enabled": False})
+        self.assertEqual(self.client.service.change.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
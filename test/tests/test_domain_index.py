@@ -0,0 +1,153 @@
+"""
+Test Suite for the domain to context index
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+import mock
+from fenixlib import exc
+from fenixlib.clients.domain_index import DomainIndex
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.schemas.context import DomainContext
+from fenixlib.utils.ttlcache import TTLCache
+from ox_stub import OXStubServer, OXStubBackend
+from config_for_test import OX_CONTEXT_WSDL, OX_USER, CONTEXT_PASSWORD, OX_CERT_VERIFY
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class DomainIndexTests(BaseTestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.index = DomainIndex(ttl=60, timer=self.timer)
+        self.index.observe({"id": 1, "loginMappings": ["domain.com", "Other.com", "1"]})
+
+    def test_resolve(self):
+        self.assertEqual(self.index.resolve("domain.com"), 1)
+        self.assertEqual(self.index.resolve("other.COM"), 1)
+        self.assertIsNone(self.index.resolve("1"))
+        self.assertIsNone(self.index.resolve("unknown.com"))
+
+    def test_observe_replaces_mappings(self):
+        self.index.observe({"id": "1", "loginMappings": ["domain.com", "1"]})
+        self.assertIsNone(self.index.resolve("other.com"))
+        self.assertEqual(len(self.index), 1)
+
+    def test_domain_moved_to_other_context(self):
+        self.index.observe({"id": 2, "loginMappings": ["other.com"]})
+        self.index.observe({"id": 1, "loginMappings": ["domain.com"]})
+        self.assertEqual(self.index.resolve("other.com"), 2)
+
+    def test_forget(self):
+        self.index.forget(1)
+        self.assertEqual(len(self.index), 0)
+
+    def test_expires(self):
+        self.timer.now = 59
+        self.assertEqual(self.index.resolve("domain.com"), 1)
+        self.timer.now = 60
+        self.assertIsNone(self.index.resolve("domain.com"))
+        self.index.observe({"id": 1, "loginMappings": ["domain.com"]})
+        self.assertEqual(self.index.resolve("domain.com"), 1)
+
+    def test_domain_context_schema(self):
+        result = DomainContext().dump(self.index.domain_context("domain.com")).data
+        self.assertEqual(result, {"contextId": 1, "domain": "domain.com"})
+        self.assertRaises(exc.DomainNotFound, self.index.domain_context, "unknown.com")
+
+
+class ContextClientIndexTests(BaseTestCase):
+
+    def setUp(self):
+        self.zeep_patcher = mock.patch('fenixlib.clients.soap_context.zeep')
+        self.mock_zeep = self.zeep_patcher.start()
+        self.mock_zeep.helpers.serialize_object.side_effect = lambda obj: obj
+        self.index = DomainIndex()
+        self.client = ContextClient(wsdl=OX_CONTEXT_WSDL, auth=(OX_USER, CONTEXT_PASSWORD),
+                                    cert_verify=OX_CERT_VERIFY, domain_index=self.index)
+        self.client.service.getData.return_value = {"id": 1, "loginMappings": ["domain.com", "1"]}
+        self.client.service.list.return_value = [{"id": 3, "loginMappings": ["listed.com", "3"]}]
+
+    def tearDown(self):
+        self.zeep_patcher.stop()
+
+    def test_responses_feed_index(self):
+        self.client.get_context(1)
+        self.assertEqual(self.client.resolve_domain("domain.com"), 1)
+        self.assertEqual(self.client.service.list.call_count, 0)
+
+    def test_resolve_falls_back_to_soap(self):
+        self.assertEqual(self.client.resolve_domain("listed.com"), 3)
+        self.assertEqual(self.client.resolve_domain("listed.com"), 3)
+        self.assertEqual(self.client.service.list.call_count, 1)
+
+    def test_resolve_unknown(self):
+        self.client.service.list.return_value = []
+        self.assertRaises(exc.DomainNotFound, self.client.resolve_domain, "unknown.com")
+
+    def test_expired_entry_looked_up_again(self):
+        timer = FakeTimer()
+        self.client.domain_index = DomainIndex(ttl=60, timer=timer)
+        self.client.get_context(1)
+        self.client.service.list.return_value = [{"id": 3, "loginMappings": ["domain.com", "3"]}]
+        timer.now = 61
+        self.assertEqual(self.client.resolve_domain("domain.com"), 3)
+        self.assertEqual(self.client.service.list.call_count, 1)
+
+    def test_writes_refresh_index(self):
+        self.client.get_context(1)
+        self.client.update_context(1, {"loginMappings": ["renamed.com"]})
+        self.assertIsNone(self.index.resolve("domain.com"))
+        self.assertEqual(self.index.resolve("renamed.com"), 1)
+        self.client.delete_context(1)
+        self.assertEqual(len(self.index), 0)
+
+
+class DomainIndexWarmTests(BaseTestCase):
+
+    def test_warm_scans_all_contexts(self):
+        backend = OXStubBackend()
+        for context_id in range(1, 41):
+            backend.add_context(context_id, ["{}domain{}.com".format(chr(ord("a") + context_id % 26), context_id),
+                                             "9alias{}.com".format(context_id)])
+        with OXStubServer(backend) as server:
+            index = DomainIndex()
+            results = index.warm(ContextClient(wsdl=server.context_wsdl, auth=(OX_USER, CONTEXT_PASSWORD)))
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertEqual(len(index), 80)
+        self.assertEqual(index.resolve("bdomain27.com"), 27)
+        self.assertEqual(index.resolve("9alias40.com"), 40)
+
+    def test_warm_bypasses_context_cache(self):
+        backend = OXStubBackend()
+        backend.add_context(1, ["domain.com"])
+        cache = TTLCache()
+        with OXStubServer(backend) as server:
+            index = DomainIndex()
+            index.warm(ContextClient(wsdl=server.context_wsdl, auth=(OX_USER, CONTEXT_PASSWORD), context_cache=cache),
+                       patterns=["d*"])
+        self.assertEqual(index.resolve("domain.com"), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_warm_logs_failed_patterns(self):
+        client = mock.Mock()
+        client._serialize.side_effect = lambda obj: obj
+        client.service.list.side_effect = [Exception("timed out"), [{"id": 2, "loginMappings": ["b.com"]}]]
+        index = DomainIndex()
+        with self.assertLogs("fenixlib.clients.domain_index", "WARNING") as logged:
+            results = index.warm(client, patterns=["a*", "b*"], concurrency=1)
+        self.assertEqual(len(logged.output), 1)
+        self.assertIn("a*", logged.output[0])
+        self.assertIsNotNone(results[0].error)
+        self.assertEqual(index.resolve("b.com"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
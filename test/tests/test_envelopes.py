@@ -0,0 +1,79 @@
+"""
+Test Suite for precompiled soap envelope templates, run against the local OX stand-in
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+from zeep.wsdl.utils import etree_to_string
+from fenixlib import exc
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from fenixlib.clients.envelopes import EnvelopeTemplate
+from ox_stub import OXStubServer, OXStubBackend
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+VALUES = [1, "1", 424242, "", "plain", "a&b<c>d", "quote'\"s", "tab\tnew\nline\rreturn", u"café 中文",
+          "fenixslot0x", " spaced "]
+
+
+class EnvelopeTemplateTests(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.backend = OXStubBackend(admin_name=CONTEXT_USER)
+        cls.backend.add_context(1, ["domain.com"], users=3, theme="godaddy")
+        cls.server = OXStubServer(cls.backend).start()
+        cls.user_client = UserClient(wsdl=cls.server.user_wsdl, auth=(CONTEXT_USER, u"p&ss<wörd"),
+                                     precompiled=("getData",))
+        cls.context_client = ContextClient(wsdl=cls.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                                           precompiled=("getData",))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def zeep_envelope(self, client, *args):
+        return etree_to_string(client.client.create_message(client.service, "getData", *args))
+
+    def test_user_envelope_bytes(self):
+        template = self.user_client.templates["getData"]
+        for context_id in VALUES:
+            for name in VALUES:
+                self.assertEqual(template.render(context_id, name),
+                                 self.zeep_envelope(self.user_client, {"id": context_id}, {"name": name},
+                                                    self.user_client.auth))
+
+    def test_context_envelope_bytes(self):
+        template = self.context_client.templates["getData"]
+        for context_id in VALUES:
+            self.assertEqual(template.render(context_id),
+                             self.zeep_envelope(self.context_client, {"id": context_id}, self.context_client.auth))
+
+    def test_unrenderable_values_left_to_zeep(self):
+        template = self.user_client.templates["getData"]
+        self.assertIsNone(template.render(1, None))
+        self.assertIsNone(template.render(1, "bell\x07"))
+        self.assertRaises(ValueError, self.user_client.get_user, 1, "bell\x07")
+
+    def test_same_results_as_zeep(self):
+        plain_user = UserClient(wsdl=self.server.user_wsdl, auth=(CONTEXT_USER, u"p&ss<wörd"))
+        plain_context = ContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD))
+        name = list(self.backend.users[1])[1]
+        self.assertEqual(self.user_client.get_user(1, name), plain_user.get_user(1, name))
+        self.assertEqual(self.context_client.get_context(1), plain_context.get_context(1))
+
+    def test_faults_mapped(self):
+        self.assertRaises(exc.UserNotFound, self.user_client.get_user, 1, "nobody")
+        self.assertRaises(exc.ContextNotFound, self.context_client.get_context, 99)
+
+    def test_value_must_be_element_text(self):
+        client = self.user_client
+        self.assertRaises(ValueError, EnvelopeTemplate, client.client, client.service, "getData",
+                          lambda context_id: ({"id": 1}, {"name": "fixed"}, client.auth), 1)
+
+    def test_unknown_operation(self):
+        self.assertRaises(ValueError, UserClient, wsdl=self.server.user_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                          precompiled=("delete",))
+
+
+if __name__ == '__main__':
+    unittest.main()
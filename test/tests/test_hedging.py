@@ -0,0 +1,184 @@
+"""
+Test Suite for hedged reads, run against a local OX stand-in whose first answers are slow
+"""
+from basetest import BaseTestCase # import this first
+import collections
+import itertools
+import threading
+import time
+import unittest
+from fenixlib import exc
+from fenixlib.clients.hedging import Hedger, HedgePolicy
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+SLOW = 1.0
+
+
+class EveryOtherCallSlow(object):
+    """Stub delay answering the first, third, ... call of every operation slowly"""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, operation):
+        with self.lock:
+            self.calls[operation] += 1
+            return SLOW if self.calls[operation] % 2 else 0
+
+
+class HedgedClientTests(BaseTestCase):
+
+    def setUp(self):
+        self.backend = OXStubBackend(admin_name=CONTEXT_USER)
+        self.backend.add_context(1, ["domain.com"], users=2)
+        self.server = OXStubServer(self.backend, delay=EveryOtherCallSlow()).start()
+        self.hedger = Hedger(HedgePolicy(delay=0.05, budget=1.0))
+
+    def tearDown(self):
+        self.server.stop()
+        self.hedger.shutdown()
+
+    def timed(self, function, *args):
+        start = time.monotonic()
+        result = function(*args)
+        return result, time.monotonic() - start
+
+    def test_slow_reads_hedged(self):
+        context_client = ContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                                       hedger=self.hedger)
+        user_client = UserClient(wsdl=self.server.user_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                                 hedger=self.hedger, precompiled=("getData",))
+        name = list(self.backend.users[1])[1]
+
+        context, elapsed = self.timed(context_client.get_context, 1)
+        self.assertEqual(context["id"], 1)
+        self.assertLess(elapsed, SLOW / 2)
+        contexts, elapsed = self.timed(context_client.list_context_for_domain, "domain.com")
+        self.assertEqual(len(contexts), 1)
+        self.assertLess(elapsed, SLOW / 2)
+        user, elapsed = self.timed(user_client.get_user, 1, name)
+        self.assertEqual(user["name"], name)
+        self.assertLess(elapsed, SLOW / 2)
+
+        stats = self.hedger.stats()
+        for operation in ("get_context", "list_context_for_domain", "get_user"):
+            self.assertEqual(stats[operation]["calls"], 1)
+            self.assertEqual(stats[operation]["hedged"], 1)
+            self.assertEqual(stats[operation]["hedge_wins"], 1)
+        self.assertEqual(self.server.requests["getData"], 4)
+
+    def test_fast_reads_not_hedged(self):
+        self.server.delay = 0
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                               hedger=Hedger(HedgePolicy(delay=SLOW, budget=1.0)))
+        for _ in range(5):
+            client.get_context(1)
+        self.assertEqual(client.hedger.stats()["get_context"]["hedged"], 0)
+        self.assertEqual(self.server.requests["getData"], 5)
+
+    def test_faults_mapped(self):
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                               hedger=self.hedger)
+        self.assertRaises(exc.ContextNotFound, client.get_context, 99)
+
+
+class HedgerTests(BaseTestCase):
+
+    def test_budget(self):
+        hedger = Hedger(HedgePolicy(delay=0.01, budget=0.5))
+        self.addCleanup(hedger.shutdown)
+        for _ in range(4):
+            self.assertEqual(hedger.call("read", time.sleep, 0.05), None)
+        stats = hedger.stats()["read"]
+        self.assertEqual((stats["calls"], stats["hedged"], stats["denied"]), (4, 2, 2))
+
+    def test_per_operation_policy(self):
+        hedger = Hedger(HedgePolicy(delay=0.01, budget=1.0), policies={"other": HedgePolicy(delay=1, budget=1.0)})
+        self.addCleanup(hedger.shutdown)
+        hedger.call("read", time.sleep, 0.05)
+        hedger.call("other", time.sleep, 0.05)
+        self.assertEqual(hedger.stats()["read"]["hedged"], 1)
+        self.assertEqual(hedger.stats()["other"]["hedged"], 0)
+
+    def test_percentile_deadline(self):
+        hedger = Hedger(HedgePolicy(percentile=0.5, delay=5, min_samples=3, budget=0))
+        self.addCleanup(hedger.shutdown)
+        state = hedger._state("read")
+        for latency in (0.05, 0.01):
+            hedger._record(state, latency)
+        self.assertEqual(hedger.stats()["read"]["deadline"], 5)
+        hedger._record(state, 0.03)
+        self.assertEqual(hedger.stats()["read"]["deadline"], 0.03)
+        for latency in (0.4, 0.2):
+            hedger._record(state, latency)
+        self.assertEqual(hedger.stats()["read"]["deadline"], 0.05)
+
+    def test_calls_record_latency(self):
+        hedger = Hedger(HedgePolicy(budget=0))
+        self.addCleanup(hedger.shutdown)
+        self.assertEqual(hedger.call("read", lambda: "first"), "first")
+        self.assertEqual(len(hedger._state("read").latencies), 1)
+
+    def test_first_answer_wins(self):
+        answers = itertools.count()
+
+        def read():
+            answer = next(answers)
+            time.sleep(0.2 if answer == 0 else 0)
+            return answer
+
+        hedger = Hedger(HedgePolicy(delay=0.01, budget=1.0))
+        self.addCleanup(hedger.shutdown)
+        self.assertEqual(hedger.call("read", read), 1)
+        self.assertEqual(hedger.stats()["read"]["hedge_wins"], 1)
+
+    def test_failed_call_loses_to_slower_success(self):
+        answers = itertools.count()
+
+        def read():
+            if next(answers) == 0:
+                time.sleep(0.1)
+                raise exc.OXException("connection lost")
+            time.sleep(0.3)
+            return "hedge"
+
+        hedger = Hedger(HedgePolicy(delay=0.01, budget=1.0))
+        self.addCleanup(hedger.shutdown)
+        self.assertEqual(hedger.call("read", read), "hedge")
+        self.assertEqual(hedger.stats()["read"]["hedge_wins"], 1)
+
+    def test_both_failed_raises_first_error(self):
+        answers = itertools.count()
+
+        def read():
+            answer = next(answers)
+            time.sleep(0.1 if answer == 0 else 0)
+            raise exc.OXException("call {}".format(answer))
+
+        hedger = Hedger(HedgePolicy(delay=0.01, budget=1.0))
+        self.addCleanup(hedger.shutdown)
+        self.assertRaisesRegex(exc.OXException, "^call 0$", hedger.call, "read", read)
+
+    def test_unhedgeable_read_runs_on_caller_thread(self):
+        hedger = Hedger(HedgePolicy(delay=0.01, budget=0))
+        self.addCleanup(hedger.shutdown)
+        self.assertIs(hedger.call("read", threading.current_thread), threading.current_thread())
+
+    def test_busy_workers_not_waited_for(self):
+        hedger = Hedger(HedgePolicy(delay=0.01, budget=1.0), max_workers=1)
+        self.addCleanup(hedger.shutdown)
+        release = threading.Event()
+        blocked = threading.Thread(target=hedger.call, args=("read", release.wait))
+        blocked.start()
+        self.addCleanup(blocked.join)
+        self.addCleanup(release.set)
+        time.sleep(0.05)
+        self.assertIs(hedger.call("read", threading.current_thread), threading.current_thread())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Test Suite for the soap client instrumentation, run against the local OX stand-in
+"""
+from basetest import BaseTestCase # import this first
+import asyncio
+import unittest
+from fenixlib import exc
+from fenixlib.clients.metrics import MetricsRegistry
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_context_async import AsyncContextClient
+from fenixlib.clients.soap_user import UserClient
+from fenixlib.clients.transport import SoapTransport
+from ox_stub import OXStubServer, OXStubBackend
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+AUTH = (CONTEXT_USER, CONTEXT_PASSWORD)
+
+
+class MetricsRegistryTests(BaseTestCase):
+
+    def test_render(self):
+        registry = MetricsRegistry(buckets={"_seconds": (0.1, 1)})
+        labels = (("method", "get"),)
+        registry.inc("calls_total", labels)
+        registry.inc("calls_total", labels, 2)
+        registry.add("in_flight", labels, 1)
+        registry.add("in_flight", labels, -1)
+        registry.observe("call_seconds", labels, 0.05)
+        registry.observe("call_seconds", labels, 0.5)
+        registry.observe("call_seconds", labels, 5)
+        self.assertEqual(registry.render(), "\n".join([
+            '# TYPE calls_total counter',
+            'calls_total{method="get"} 3',
+            '# TYPE in_flight gauge',
+            'in_flight{method="get"} 0',
+            '# TYPE call_seconds histogram',
+            'call_seconds_bucket{method="get",le="0.1"} 1',
+            'call_seconds_bucket{method="get",le="1"} 2',
+            'call_seconds_bucket{method="get",le="+Inf"} 3',
+            'call_seconds_sum{method="get"} 5.55',
+            'call_seconds_count{method="get"} 3',
+        ]) + "\n")
+        self.assertEqual(registry.value("call_seconds", labels), (3, 5.55))
+
+    def test_label_escaping(self):
+        registry = MetricsRegistry()
+        registry.inc("calls_total", (("outcome", 'a"b\\c\nd'),))
+        self.assertIn('calls_total{outcome="a\\"b\\\\c\\nd"} 1', registry.render())
+
+
+class InstrumentedClientTests(BaseTestCase):
+
+    def setUp(self):
+        self.backend = OXStubBackend(admin_name=CONTEXT_USER)
+        self.backend.add_context(1, ["domain.com"], users=2)
+        self.server = OXStubServer(self.backend).start()
+        self.metrics = MetricsRegistry()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_client_calls(self):
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=AUTH, metrics=self.metrics)
+        client.get_context(1)
+        client.get_context(1)
+        self.assertRaises(exc.ContextNotFound, client.get_context, 99)
+
+        labels = [("client", "ContextClient"), ("method", "get_context")]
+        self.assertEqual(self.metrics.value("fenix_client_calls_total", labels + [("outcome", "ok")]), 2)
+        self.assertEqual(self.metrics.value("fenix_client_calls_total", labels + [("outcome", "ContextNotFound")]), 1)
+        self.assertEqual(self.metrics.value("fenix_client_in_flight", labels), 0)
+        self.assertEqual(self.metrics.value("fenix_client_call_seconds", labels)[0], 3)
+
+        wire = [("service", "context"), ("operation", "getData")]
+        self.assertEqual(self.metrics.value("fenix_soap_responses_total", wire + [("status", "200")]), 2)
+        self.assertEqual(self.metrics.value("fenix_soap_responses_total", wire + [("status", "500")]), 1)
+        count, size = self.metrics.value("fenix_soap_request_bytes", wire)
+        self.assertEqual(count, 3)
+        self.assertGreater(size, 0)
+        self.assertEqual(self.metrics.value("fenix_soap_response_bytes", wire)[0], 3)
+
+    def test_precompiled_reads_counted(self):
+        client = UserClient(wsdl=self.server.user_wsdl, auth=AUTH, metrics=self.metrics, precompiled=("getData",))
+        client.get_user(1, list(self.backend.users[1])[1])
+        self.assertEqual(self.metrics.value("fenix_soap_responses_total",
+                                            [("service", "user"), ("operation", "getData"), ("status", "200")]), 1)
+        self.assertIn('fenix_client_calls_total{client="UserClient",method="get_user",outcome="ok"} 1',
+                      self.metrics.render())
+
+    def test_async_client(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        client = AsyncContextClient(wsdl=self.server.context_wsdl, auth=AUTH, metrics=self.metrics)
+        loop.run_until_complete(client.get_context(1))
+        loop.run_until_complete(client.close())
+        labels = [("client", "AsyncContextClient"), ("method", "get_context"), ("outcome", "ok")]
+        self.assertEqual(self.metrics.value("fenix_client_calls_total", labels), 1)
+        self.assertEqual(self.metrics.value("fenix_soap_request_bytes",
+                                            [("service", "context"), ("operation", "getData")])[0], 1)
+
+    def test_disabled(self):
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=AUTH)
+        self.assertIs(type(client.client.transport), SoapTransport)
+        self.assertEqual(client.get_context(1)["id"], 1)
+        self.assertEqual(self.metrics.render(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
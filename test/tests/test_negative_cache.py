@@ -0,0 +1,134 @@
+"""
+Test Suite for remembering contexts and mailboxes which do not exist
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+import mock
+from collections import OrderedDict
+from fenixlib import exc
+from fenixlib.clients.negative import NegativeCache
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from zeep.exceptions import Fault
+from config_for_test import OX_CONTEXT_WSDL, OX_USER_WSDL, OX_USER, CONTEXT_USER, CONTEXT_PASSWORD, OX_CERT_VERIFY
+
+MAILBOX = "12097e62-adfa-47cf-b3ef-bec932019524"
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class NegativeCacheTests(BaseTestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = NegativeCache(ttl=30, timer=self.timer)
+
+    def read(self, context_id, mailbox_uid=None, error=None):
+        with self.cache.guard(context_id, mailbox_uid):
+            if error is not None:
+                raise error
+            return "found"
+
+    def test_remembers_missing_context(self):
+        self.assertRaises(exc.ContextNotFound, self.read, 1, error=exc.ContextNotFound("The context 1 does not exist"))
+        with self.assertRaises(exc.ContextNotFound) as raised:
+            self.read(1)
+        self.assertEqual(str(raised.exception), "The context 1 does not exist")
+        # every mailbox of a missing context is missing too
+        self.assertRaises(exc.ContextNotFound, self.read, "1", MAILBOX)
+        self.assertEqual(self.read(2), "found")
+        self.assertEqual(self.cache.stats(), {"checks": 4, "hits": 2, "size": 1})
+
+    def test_remembers_missing_user(self):
+        self.assertRaises(exc.UserNotFound, self.read, 1, MAILBOX, exc.UserNotFound("No such user"))
+        self.assertRaises(exc.UserNotFound, self.read, 1, MAILBOX)
+        self.assertEqual(self.read(1, "other"), "found")
+        self.assertEqual(self.read(1), "found")
+
+    def test_other_errors_not_remembered(self):
+        self.assertRaises(exc.OXException, self.read, 1, error=exc.OXException("some failure"))
+        self.assertEqual(self.read(1), "found")
+
+    def test_expires(self):
+        self.assertRaises(exc.ContextNotFound, self.read, 1, error=exc.ContextNotFound("gone"))
+        self.timer.now = 31
+        self.assertEqual(self.read(1), "found")
+
+    def test_forget(self):
+        self.assertRaises(exc.ContextNotFound, self.read, 1, error=exc.ContextNotFound("gone"))
+        self.assertRaises(exc.UserNotFound, self.read, 2, MAILBOX, exc.UserNotFound("gone"))
+        self.cache.forget_context(1)
+        self.assertEqual(self.read(1), "found")
+        self.cache.forget_user(2, MAILBOX)
+        self.assertEqual(self.read(2, MAILBOX), "found")
+
+    def test_reads_in_flight_during_a_create_not_remembered(self):
+        with self.assertRaises(exc.ContextNotFound):
+            with self.cache.guard(1):
+                self.cache.forget_context(1)
+                raise exc.ContextNotFound("gone")
+        self.assertEqual(self.read(1), "found")
+
+
+class ClientNegativeCacheTests(BaseTestCase):
+
+    def setUp(self):
+        self.context_patcher = mock.patch('fenixlib.clients.soap_context.zeep')
+        self.user_patcher = mock.patch('fenixlib.clients.soap_user.zeep')
+        for patcher in (self.context_patcher, self.user_patcher):
+            patcher.start().helpers.serialize_object.side_effect = lambda obj: obj
+        self.cache = NegativeCache()
+        self.contexts = ContextClient(wsdl=OX_CONTEXT_WSDL, auth=(OX_USER, CONTEXT_PASSWORD),
+                                      cert_verify=OX_CERT_VERIFY, negative_cache=self.cache)
+        self.users = UserClient(wsdl=OX_USER_WSDL, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                                cert_verify=OX_CERT_VERIFY, negative_cache=self.cache)
+
+    def tearDown(self):
+        self.context_patcher.stop()
+        self.user_patcher.stop()
+
+    def test_get_context(self):
+        self.contexts.service.getData.side_effect = Fault("Context does not exist")
+        self.assertRaises(exc.ContextNotFound, self.contexts.get_context, 1)
+        self.assertRaises(exc.ContextNotFound, self.contexts.get_context, 1)
+        self.assertEqual(self.contexts.service.getData.call_count, 1)
+
+    def test_create_context_not_blocked(self):
+        self.contexts.service.getData.side_effect = [Fault("Context does not exist"), OrderedDict([("id", 1)])]
+        self.assertRaises(exc.ContextNotFound, self.contexts.get_context, 1)
+        self.contexts.create_context({"id": 1, "loginMappings": ["domain.com"]}, {"name": "admin"})
+        self.assertEqual(self.contexts.get_context(1), OrderedDict([("id", 1)]))
+
+    def test_get_user(self):
+        self.users.service.getData.side_effect = Fault("No such user {} in context 1".format(MAILBOX))
+        self.assertRaises(exc.UserNotFound, self.users.get_user, 1, MAILBOX)
+        self.assertRaises(exc.UserNotFound, self.users.get_user, 1, MAILBOX)
+        self.assertEqual(self.users.service.getData.call_count, 1)
+
+    def test_missing_context_of_user(self):
+        self.users.service.getData.side_effect = Fault("Authentication failed")
+        self.assertRaises(exc.ContextNotFound, self.users.get_user, 1, MAILBOX)
+        self.assertRaises(exc.ContextNotFound, self.users.get_user, 1, "other")
+        self.assertRaises(exc.ContextNotFound, self.users.get_all_users, 1)
+        self.assertRaises(exc.ContextNotFound, self.contexts.get_context, 1)
+        self.assertEqual(self.users.service.getData.call_count, 1)
+        self.assertEqual(self.users.service.listAll.call_count, 0)
+
+    def test_create_user_not_blocked(self):
+        user = OrderedDict([("id", 2), ("name", MAILBOX)])
+        self.users.service.getData.side_effect = [Fault("No such user {} in context 1".format(MAILBOX)), user]
+        self.users.service.createByModuleAccessName.return_value = user
+        self.assertRaises(exc.UserNotFound, self.users.get_user, 1, MAILBOX)
+        self.users.create_user(1, {"name": MAILBOX}, "gd_pim")
+        self.assertEqual(self.users.get_user(1, MAILBOX), user)
+
+
+if __name__ == '__main__':
+    unittest.main()
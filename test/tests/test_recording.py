@@ -0,0 +1,174 @@
+"""
+Test Suite for recording exchanges with the local OX stand-in and replaying them without it
+"""
+from basetest import BaseTestCase # import this first
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import mock
+from requests.exceptions import ConnectionError
+from fenixlib import exc
+from fenixlib.clients.recording import Recorder, Replayer, _TeeStream
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+AUTH = (CONTEXT_USER, CONTEXT_PASSWORD)
+
+
+class RecordReplayTests(BaseTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "ox.jsonl.gz")
+        self.backend = OXStubBackend(admin_name=CONTEXT_USER)
+        self.backend.add_context(1, ["domain.com"], users=3, attributes=2)
+        self.server = OXStubServer(self.backend, delay=0.05).start()
+        self.names = list(self.backend.users[1])
+
+    def tearDown(self):
+        self.server.stop()
+
+    def record(self):
+        recorder = Recorder(self.path)
+        context_client = ContextClient(wsdl=self.server.context_wsdl, auth=AUTH, tape=recorder)
+        user_client = UserClient(wsdl=self.server.user_wsdl, auth=AUTH, tape=recorder)
+        recorded = {
+            "context": context_client.get_context(1),
+            "user": user_client.get_user(1, self.names[0]),
+            "users": user_client.get_all_users(1),
+        }
+        self.assertRaises(exc.UserNotFound, user_client.get_user, 1, "nobody")
+        recorder.close()
+        self.server.stop()
+        return recorder, recorded
+
+    def replay_clients(self, replayer):
+        return (ContextClient(wsdl=self.server.context_wsdl, auth=AUTH, tape=replayer),
+                UserClient(wsdl=self.server.user_wsdl, auth=AUTH, tape=replayer))
+
+    def test_replay_without_server(self):
+        recorder, recorded = self.record()
+        replayer = Replayer(self.path)
+        context_client, user_client = self.replay_clients(replayer)
+        self.assertEqual(context_client.get_context(1), recorded["context"])
+        self.assertEqual(user_client.get_user(1, self.names[0]), recorded["user"])
+        self.assertEqual(user_client.get_all_users(1), recorded["users"])
+        self.assertEqual([user["name"] for user in user_client.iter_all_users(1, streaming=True)],
+                         [user["name"] for user in recorded["users"]])
+        self.assertRaises(exc.UserNotFound, user_client.get_user, 1, "nobody")
+        # the streamed listing sends listAll and getMultipleData once more
+        self.assertEqual(replayer.replayed, recorder.recorded + 2)
+
+    def test_secrets_scrubbed(self):
+        recorder, _ = self.record()
+        with gzip.open(self.path, "rb") as archive:
+            content = archive.read()
+        self.assertNotIn(CONTEXT_PASSWORD.encode("utf-8"), content)
+        body = b"<ns0:password>secret</ns0:password><login>me</login><imapLogin>a</imapLogin>"
+        self.assertEqual(recorder.scrub(body),
+                         b"<ns0:password>scrubbed</ns0:password><login>scrubbed</login><imapLogin>a</imapLogin>")
+
+    def test_secrets_split_across_chunks_scrubbed(self):
+        recorder = Recorder(os.path.join(self.directory, "chunks.jsonl.gz"))
+        self.addCleanup(recorder.close)
+        body = b"<a><auth><login>me</login><ns0:password>secret</ns0:password></auth><b>text</b></a>"
+        for size in range(1, len(body) + 1):
+            chunks = [body[start:start + size] for start in range(0, len(body), size)]
+            self.assertEqual(b"".join(recorder._scrub_chunks(chunks)), recorder.scrub(body), size)
+
+    def test_replay_with_other_password(self):
+        self.record()
+        context_client = ContextClient(wsdl=self.server.context_wsdl, auth=(CONTEXT_USER, "other"),
+                                       tape=Replayer(self.path))
+        self.assertEqual(context_client.get_context(1)["id"], 1)
+
+    def test_unrecorded_request_not_answered(self):
+        self.record()
+        _, user_client = self.replay_clients(Replayer(self.path))
+        self.assertRaises(ConnectionError, user_client.get_user, 1, self.names[1])
+
+    def test_loose_answers_unrecorded_request_like_its_operation(self):
+        _, recorded = self.record()
+        _, user_client = self.replay_clients(Replayer(self.path, loose=True))
+        self.assertEqual(user_client.get_user(1, self.names[1]), recorded["user"])
+
+    def test_unrecorded_operation(self):
+        self.record()
+        context_client, _ = self.replay_clients(Replayer(self.path))
+        self.assertRaises(ConnectionError, context_client.resolve_domain, "domain.com")
+
+    def test_recorded_timing(self):
+        self.record()
+        context_client, _ = self.replay_clients(Replayer(self.path))
+        start = time.monotonic()
+        context_client.get_context(1)
+        self.assertLess(time.monotonic() - start, 0.05)
+
+        context_client, _ = self.replay_clients(Replayer(self.path, speed=1.0))
+        start = time.monotonic()
+        context_client.get_context(1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+
+class FakeRaw(object):
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def stream(self, amt, decode_content=None):
+        while self.chunks:
+            yield self.chunks.pop(0)
+
+    def close(self):
+        self.closed = True
+
+
+class TeeStreamTests(BaseTestCase):
+
+    def setUp(self):
+        self.recorded = []
+
+    def finished(self, content):
+        content.seek(0)
+        self.recorded.append(content.read())
+
+    def test_copied_as_read(self):
+        tee = _TeeStream(FakeRaw([b"<a>", b"1</a>"]), self.finished)
+        chunks = tee.stream(2)
+        self.assertEqual(next(chunks), b"<a>")
+        self.assertEqual(self.recorded, [])
+        self.assertEqual(list(chunks), [b"1</a>"])
+        self.assertEqual(self.recorded, [b"<a>1</a>"])
+
+    def test_unread_rest_recorded_on_close(self):
+        raw = FakeRaw([b"<a>", b"1</a>"])
+        tee = _TeeStream(raw, self.finished)
+        next(tee.stream(2))
+        tee.close()
+        self.assertEqual(self.recorded, [b"<a>1</a>"])
+        self.assertTrue(raw.closed)
+
+    def test_streamed_body_written_to_archive(self):
+        path = os.path.join(tempfile.mkdtemp(), "ox.jsonl.gz")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        recorder = Recorder(path)
+        request = mock.Mock(body=b"<login>me</login>", method="POST", url="http://ox/user", headers={})
+        response = mock.Mock(status_code=200, reason="OK", headers={})
+        recorder.record(request, response, 0.1, io.BytesIO("<name>é</name>".encode("utf-8") * 50000))
+        recorder.close()
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            entry = json.loads(archive.readlines()[1])
+        self.assertEqual(entry["body"], "<name>é</name>" * 50000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Test Suite for collapsing concurrent identical reads
+"""
+from basetest import BaseTestCase # import this first
+import threading
+import time
+import unittest
+import mock
+from collections import OrderedDict
+from fenixlib import exc
+from fenixlib.clients.metrics import MetricsRegistry
+from fenixlib.clients.singleflight import SingleFlight
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from zeep.exceptions import Fault
+from config_for_test import OX_CONTEXT_WSDL, OX_USER_WSDL, OX_USER, CONTEXT_USER, CONTEXT_PASSWORD, OX_CERT_VERIFY
+
+MAILBOX = "12097e62-adfa-47cf-b3ef-bec932019524"
+
+
+def concurrently(count, function, *args):
+    """Calls function from count threads at once, returns their results or exceptions"""
+    outcomes = [None] * count
+
+    def run(index):
+        try:
+            outcomes[index] = function(*args)
+        except Exception as error:
+            outcomes[index] = error
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def slow(value, delay=0.2):
+    """A read answering after delay, long enough for every thread to join it"""
+    def read(*args):
+        time.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return value
+    return mock.Mock(side_effect=read)
+
+
+class SingleFlightTests(BaseTestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+        self.flight = SingleFlight(metrics=self.metrics)
+
+    def test_concurrent_calls_share_one(self):
+        read = slow({"id": 1})
+        outcomes = concurrently(5, self.flight.call, ("get_context", "1"), read)
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(outcomes, [{"id": 1}] * 5)
+        self.assertEqual(len(set(id(outcome) for outcome in outcomes)), 5)
+        self.assertEqual(self.flight.stats(), {"get_context": {"calls": 5, "collapsed": 4}})
+        self.assertEqual(self.metrics.value("fenix_client_collapsed_total", (("method", "get_context"),)), 4)
+
+    def test_errors_shared(self):
+        read = slow(exc.ContextNotFound("gone"))
+        outcomes = concurrently(3, self.flight.call, ("get_context", "1"), read)
+        self.assertEqual(read.call_count, 1)
+        self.assertTrue(all(isinstance(outcome, exc.ContextNotFound) for outcome in outcomes))
+
+    def test_waiters_get_their_own_errors(self):
+        error = exc.ContextNotFound("gone")
+        outcomes = concurrently(3, self.flight.call, ("get_context", "1"), slow(error))
+        self.assertEqual(len(set(id(outcome) for outcome in outcomes)), 3)
+        self.assertEqual(sum(outcome is error for outcome in outcomes), 1)
+        for outcome in outcomes:
+            self.assertIsInstance(outcome, exc.ContextNotFound)
+            self.assertEqual(outcome.args, ("gone",))
+            self.assertIs(outcome.__cause__, None if outcome is error else error)
+
+    def test_finished_calls_not_shared(self):
+        read = mock.Mock(return_value=1)
+        self.flight.call(("get_context", "1"), read)
+        self.flight.call(("get_context", "1"), read)
+        self.assertEqual(read.call_count, 2)
+        self.assertEqual(self.flight._flights, {})
+
+    def test_different_keys_not_shared(self):
+        read = slow(1, delay=0.05)
+        threads = [threading.Thread(target=self.flight.call, args=(("get_context", key), read)) for key in "12"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(read.call_count, 2)
+
+
+class ClientSingleFlightTests(BaseTestCase):
+
+    def setUp(self):
+        self.context_patcher = mock.patch('fenixlib.clients.soap_context.zeep')
+        self.user_patcher = mock.patch('fenixlib.clients.soap_user.zeep')
+        for patcher in (self.context_patcher, self.user_patcher):
+            patcher.start().helpers.serialize_object.side_effect = lambda obj: obj
+        self.flight = SingleFlight()
+        self.contexts = ContextClient(wsdl=OX_CONTEXT_WSDL, auth=(OX_USER, CONTEXT_PASSWORD),
+                                      cert_verify=OX_CERT_VERIFY, singleflight=self.flight)
+        self.users = UserClient(wsdl=OX_USER_WSDL, auth=(CONTEXT_USER, CONTEXT_PASSWORD),
+                                cert_verify=OX_CERT_VERIFY, singleflight=self.flight)
+
+    def tearDown(self):
+        self.context_patcher.stop()
+        self.user_patcher.stop()
+
+    def test_get_context(self):
+        self.contexts.service.getData = slow(OrderedDict([("id", 1), ("loginMappings", ["domain.com", "1"])]))
+        outcomes = concurrently(4, self.contexts.get_context, 1)
+        self.assertEqual(self.contexts.service.getData.call_count, 1)
+        self.assertEqual([outcome["id"] for outcome in outcomes], [1] * 4)
+
+    def test_get_context_mapped_error(self):
+        self.contexts.service.getData = slow(Fault("Context does not exist"))
+        outcomes = concurrently(4, self.contexts.get_context, 1)
+        self.assertEqual(self.contexts.service.getData.call_count, 1)
+        self.assertTrue(all(isinstance(outcome, exc.ContextNotFound) for outcome in outcomes))
+
+    def test_list_context_for_domain(self):
+        self.contexts.service.list = slow([OrderedDict([("id", 1), ("loginMappings", ["domain.com", "1"])])])
+        concurrently(4, self.contexts.list_context_for_domain, "domain.com")
+        self.assertEqual(self.contexts.service.list.call_count, 1)
+
+    def test_get_user(self):
+        self.users.service.getData = slow(OrderedDict([("id", 2), ("name", MAILBOX)]))
+        outcomes = concurrently(4, self.users.get_user, 1, MAILBOX)
+        self.assertEqual(self.users.service.getData.call_count, 1)
+        self.assertEqual([outcome["name"] for outcome in outcomes], [MAILBOX] * 4)
+        self.assertEqual(self.flight.stats()["get_user"], {"calls": 4, "collapsed": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Test Suite for the compiled soap fault classifier, compared against the if/elif chain it replaced
+"""
+from basetest import BaseTestCase # import this first
+import random
+import unittest
+from zeep.exceptions import Fault
+from fenixlib import exc
+from fenixlib.utils.soapfaults import check_fault, check_context_fault, FaultClassifier, FaultRule
+from fault_corpus import USER_FAULTS, CONTEXT_FAULTS, legacy_check_fault, legacy_check_context_fault
+
+OPERATIONS = ["getData", "create", "delete", "change"]
+FRAGMENTS = ["Authentication failed", "The context ", "42", "4", " does not exist!", "Database for context ",
+             " and server", " can not be resolved", "No such user ", "None", "user.1", " in context ",
+             "The displayname is already used", "User ", " already exists in this context", "Primary mail address",
+             " already exists in context", "No such access combination name", "Context does not exist",
+             "This mapping is already in use", " already exists in the system!", " ", "\n", "!", "*", "("]
+
+
+def raised(check, *args):
+    try:
+        check(*args)
+    except Fault:
+        return None
+    except Exception as error:
+        return type(error), str(error)
+    raise AssertionError("nothing raised")
+
+
+class FaultClassifierTests(BaseTestCase):
+
+    def assert_user_fault(self, message, context_id, mailbox_uid):
+        self.assertEqual(raised(check_fault, Fault(message), context_id, mailbox_uid),
+                         legacy_check_fault(message, context_id, mailbox_uid), message)
+
+    def assert_context_fault(self, message, context_id):
+        for operation in OPERATIONS:
+            self.assertEqual(raised(check_context_fault, Fault(message), context_id, operation),
+                             legacy_check_context_fault(message, context_id, operation), (message, operation))
+
+    def test_corpus(self):
+        for message, context_id, mailbox_uid in USER_FAULTS:
+            self.assert_user_fault(message, context_id, mailbox_uid)
+        for message, context_id in CONTEXT_FAULTS:
+            self.assert_context_fault(message, context_id)
+
+    def test_generated_messages(self):
+        generator = random.Random(1234)
+        for _ in range(5000):
+            message = "".join(generator.choice(FRAGMENTS) for _ in range(generator.randint(0, 8)))
+            context_id = generator.choice([42, 4, "42", None])
+            mailbox_uid = generator.choice(["user.1", None, "42", "user"])
+            self.assert_user_fault(message, context_id, mailbox_uid)
+            self.assert_context_fault(message, context_id)
+
+    def test_unknown_context_fault_reraised(self):
+        fault = Fault("something else")
+        with self.assertRaises(Fault) as raised_fault:
+            check_context_fault(fault, 1, "change")
+        self.assertIs(raised_fault.exception, fault)
+
+    def test_context_faults_mapped_per_operation(self):
+        """Each operation maps only what it mapped before the rules were shared"""
+        in_use = Fault("Cannot map 'domain.com' to context 42. This mapping is already in use.")
+        self.assertRaises(exc.DomainInUse, check_context_fault, in_use, 42, "create")
+        self.assertRaises(Fault, check_context_fault, in_use, 42, "change")
+        self.assertRaises(Fault, check_context_fault, Fault("Context does not exist"), 42, "create")
+        self.assertRaises(Fault, check_context_fault, Fault("Context 42 already exists in the system!"), 42, "getData")
+
+    def test_first_rule_wins(self):
+        classifier = FaultClassifier([
+            FaultRule(r"User {user} in {context_id}\Z", exc.UserNotFound, "{user}@{context_id}"),
+            FaultRule(r"User .*", exc.UserConflict, "{fault}"),
+        ], default=exc.OXException)
+        self.assertRaisesRegex(exc.UserNotFound, "^a b@1$", classifier.raise_for, Fault("User a b in 1"), 1, "a b")
+        self.assertRaisesRegex(exc.UserConflict, "^User c in 1$", classifier.raise_for, Fault("User c in 1"), 1, "a")
+        self.assertRaisesRegex(exc.OXException, "^other$", classifier.raise_for, Fault("other"), 1, "a")
+
+
+if __name__ == '__main__':
+    unittest.main()
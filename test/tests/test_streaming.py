@@ -0,0 +1,75 @@
+"""
+Test Suite for the streaming getMultipleData parse mode, run against the local OX stand-in
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+import mock
+from fenixlib import exc
+from fenixlib.clients.breaker import BreakerRegistry
+from fenixlib.clients.metrics import MetricsRegistry
+from fenixlib.clients.soap_user import UserClient
+from fenixlib.clients.streaming import iter_operation_items
+from ox_stub import OXStubServer, OXStubBackend, StubFault
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+
+class StreamingUsersTests(BaseTestCase):
+
+    def setUp(self):
+        self.backend = OXStubBackend(admin_name=CONTEXT_USER)
+        self.backend.add_context(1, ["domain.com"], users=25, theme="godaddy")
+        self.server = OXStubServer(self.backend).start()
+        self.client = UserClient(wsdl=self.server.user_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_same_users_as_zeep_path(self):
+        expected = list(self.client.iter_all_users(1, chunk_size=None))
+        self.assertEqual(len(expected), 25)
+        for chunk_size in (None, 7):
+            streamed = list(self.client.iter_all_users(1, chunk_size=chunk_size, streaming=True))
+            self.assertEqual(repr(streamed), repr(expected))
+
+    def test_items_are_zeep_objects(self):
+        ids = [{"id": user["id"]} for user in self.backend.users[1].values()]
+        items = list(iter_operation_items(self.client.client, self.client.service, "getMultipleData",
+                                          {"id": 1}, ids, self.client.auth))
+        self.assertEqual([item.id for item in items], [int(user["id"]) for user in ids])
+
+    def test_sent_through_transport_post(self):
+        ids = [{"id": user["id"]} for user in self.backend.users[1].values()]
+        post = mock.Mock(wraps=self.client.client.transport.post)
+        with mock.patch.object(self.client.client.transport, "post", post):
+            list(iter_operation_items(self.client.client, self.client.service, "getMultipleData",
+                                      {"id": 1}, ids, self.client.auth))
+        headers = post.call_args[0][2]
+        self.assertEqual(post.call_args[1], {"stream": True})
+        self.assertEqual(headers["SOAPAction"], '"urn:getMultipleData"')
+        self.assertEqual(headers["Content-Type"], "text/xml; charset=utf-8")
+
+    def test_counted_by_metrics_and_breaker(self):
+        metrics = MetricsRegistry()
+        breakers = BreakerRegistry()
+        client = UserClient(wsdl=self.server.user_wsdl, auth=(CONTEXT_USER, CONTEXT_PASSWORD), metrics=metrics,
+                            breakers=breakers)
+        self.assertEqual(len(list(client.iter_all_users(1, chunk_size=10, streaming=True))), 25)
+        labels = [("service", "user"), ("operation", "getMultipleData"), ("status", "200")]
+        self.assertEqual(metrics.value("fenix_soap_responses_total", labels), 3)
+        self.assertEqual(sum(breaker["calls"] for breaker in breakers.stats().values()), 4)
+
+    def test_fault_mapped(self):
+        def lost_context(*args):
+            raise StubFault("Authentication failed")
+        self.backend.user_getMultipleData = lost_context
+        self.assertRaises(exc.ContextNotFound, list, self.client.iter_all_users(1, streaming=True))
+
+    def test_unknown_fault_mapped(self):
+        def failure(*args):
+            raise StubFault("some failure")
+        self.backend.user_getMultipleData = failure
+        self.assertRaises(exc.OXException, list, self.client.iter_all_users(1, streaming=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Test Suite for transport profiles, run against the local OX stand-in
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+from requests.exceptions import ReadTimeout
+from urllib3.exceptions import ConnectTimeoutError, ProtocolError
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from fenixlib.clients.transport import TransportProfile, build_session, transport_options
+from ox_stub import OXStubServer, OXStubBackend
+from config_for_test import CONTEXT_USER, CONTEXT_PASSWORD
+
+AUTH = (CONTEXT_USER, CONTEXT_PASSWORD)
+
+
+class TransportProfileTests(BaseTestCase):
+
+    def setUp(self):
+        self.backend = OXStubBackend(admin_name=CONTEXT_USER)
+        self.backend.add_context(1, ["domain.com"], users=2)
+        self.server = OXStubServer(self.backend).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_clients_share_connections(self):
+        profile = TransportProfile()
+        self.addCleanup(profile.close)
+        context_client = ContextClient(wsdl=self.server.context_wsdl, auth=AUTH, transport_profile=profile)
+        user_client = UserClient(wsdl=self.server.user_wsdl, auth=AUTH, transport_profile=profile)
+        for _ in range(3):
+            context_client.get_context(1)
+            user_client.get_all_users(1)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_clients_without_profile_use_own_connections(self):
+        ContextClient(wsdl=self.server.context_wsdl, auth=AUTH).get_context(1)
+        UserClient(wsdl=self.server.user_wsdl, auth=AUTH).get_all_users(1)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_operation_timeout(self):
+        profile = TransportProfile(connect_timeout=1, operation_timeout=0.05)
+        self.addCleanup(profile.close)
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=AUTH, transport_profile=profile)
+        self.server.delay = 0.3
+        self.assertRaises(ReadTimeout, client.get_context, 1)
+        self.server.delay = 0
+        self.assertEqual(client.get_context(1)["id"], 1)
+
+    def test_sent_request_not_retried(self):
+        profile = TransportProfile(connect_timeout=1, operation_timeout=0.05, retries=3)
+        self.addCleanup(profile.close)
+        client = ContextClient(wsdl=self.server.context_wsdl, auth=AUTH, transport_profile=profile)
+        self.server.delay = 0.3
+        self.assertRaises(ReadTimeout, client.create_context, {"id": 2, "loginMappings": ["new.com"]},
+                          {"name": "admin"})
+        self.assertEqual(self.server.requests["create"], 1)
+
+
+class TransportOptionsTests(BaseTestCase):
+
+    def test_options(self):
+        self.assertEqual(transport_options(None), {})
+        self.assertEqual(TransportProfile().transport_options(), {"timeout": (None, 300), "operation_timeout": None})
+        self.assertEqual(TransportProfile(connect_timeout=2, read_timeout=10, operation_timeout=30).transport_options(),
+                         {"timeout": (2, 10), "operation_timeout": (2, 30)})
+
+    def test_session(self):
+        profile = TransportProfile(pool_maxsize=32, retries=2)
+        first = build_session(False, profile=profile)
+        second = build_session(True, profile=profile)
+        self.assertIs(first.get_adapter("https://ox.example.com"), second.get_adapter("http://ox.example.com"))
+        adapter = profile.adapter
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(adapter.max_retries.total, 2)
+        retry = adapter.max_retries
+        self.assertEqual(retry.new().increment("POST", "/", error=ConnectTimeoutError()).connect, 1)
+        self.assertRaises(ProtocolError, retry.increment, "POST", "/", error=ProtocolError("reset"))
+        self.assertEqual((first.verify, second.verify), (False, True))
+        profile.close()
+        self.assertIsNot(profile.adapter, adapter)
+
+
+if __name__ == '__main__':
+    unittest.main()
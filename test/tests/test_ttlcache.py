@@ -0,0 +1,53 @@
+"""
+Test Suite for the TTL/LRU cache
+"""
+from basetest import BaseTestCase # import this first
+import unittest
+from fenixlib.utils.ttlcache import TTLCache, MISSING
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTests(BaseTestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = TTLCache(maxsize=2, ttl=10, timer=self.timer)
+
+    def test_hit_and_miss(self):
+        self.assertIs(self.cache.get("a"), MISSING)
+        self.cache.set("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_expiry(self):
+        self.cache.set("a", 1)
+        self.timer.now = 11
+        self.assertIsNone(self.cache.get("a", None))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIs(self.cache.get("b"), MISSING)
+
+    def test_invalidate(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.invalidate("a")
+        self.cache.invalidate_where(lambda key, value: value == 2)
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
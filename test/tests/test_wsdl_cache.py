@@ -0,0 +1,110 @@
+"""
+Test Suite for the persistent WSDL cache backends
+"""
+from basetest import BaseTestCase # import this first
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import mock
+from zeep.cache import InMemoryCache, SqliteCache
+from fenixlib.clients import cache
+from fenixlib.clients.cache import FileCache, get_cache
+from fenixlib.clients.soap_context import ContextClient
+from fenixlib.clients.soap_user import UserClient
+from ox_stub import OXStubServer, OXStubBackend
+
+WSDL_URL = "http://context_service.wsdl"
+WSDL_CONTENT = b"<definitions>some wsdl</definitions>"
+
+
+class FileCacheTests(BaseTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = FileCache(path=self.path, timeout=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_round_trip(self):
+        self.cache.add(WSDL_URL, WSDL_CONTENT)
+        self.assertEqual(self.cache.get(WSDL_URL), WSDL_CONTENT)
+
+    def test_shared_between_instances(self):
+        """A new worker pointing at the same directory sees documents of the previous one"""
+        self.cache.add(WSDL_URL, WSDL_CONTENT)
+        self.assertEqual(FileCache(path=self.path).get(WSDL_URL), WSDL_CONTENT)
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get(WSDL_URL))
+
+    def test_expired(self):
+        self.cache.add(WSDL_URL, WSDL_CONTENT)
+        expired = time.time() - 120
+        os.utime(self.cache._filename(WSDL_URL), (expired, expired))
+        self.assertIsNone(self.cache.get(WSDL_URL))
+
+    def test_version_mismatch(self):
+        with open(self.cache._filename(WSDL_URL), 'wb') as stale:
+            stale.write(b"$ZEEP:0$c29tZSB3c2Rs")
+        self.assertIsNone(self.cache.get(WSDL_URL))
+
+    def test_atomic_write_leaves_no_temp_files(self):
+        self.cache.add(WSDL_URL, WSDL_CONTENT)
+        self.cache.add(WSDL_URL, WSDL_CONTENT.upper())
+        self.assertEqual(os.listdir(self.path), [os.path.basename(self.cache._filename(WSDL_URL))])
+        self.assertEqual(self.cache.get(WSDL_URL), WSDL_CONTENT.upper())
+
+    def test_interrupted_write_leaves_no_temp_files(self):
+        with mock.patch('fenixlib.clients.cache.os.replace', side_effect=KeyboardInterrupt):
+            self.assertRaises(KeyboardInterrupt, self.cache.add, WSDL_URL, WSDL_CONTENT)
+        self.assertEqual(os.listdir(self.path), [])
+
+
+class GetCacheTests(BaseTestCase):
+
+    def test_backends(self):
+        path = tempfile.mkdtemp()
+        try:
+            self.assertIsInstance(get_cache("memory"), InMemoryCache)
+            self.assertIsInstance(get_cache("file", path), FileCache)
+            self.assertIsInstance(get_cache("sqlite", os.path.join(path, "cache.db")), SqliteCache)
+        finally:
+            shutil.rmtree(path)
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, get_cache, "redis")
+
+    def test_zero_timeout_kept(self):
+        self.assertEqual(get_cache("memory", timeout=0)._timeout, 0)
+
+    def test_shared_cache_built_once_on_first_use(self):
+        with mock.patch.object(cache, '_shared', None), \
+                mock.patch('fenixlib.clients.cache.get_cache', return_value=InMemoryCache()) as built:
+            self.assertIs(cache.shared_cache(), cache.shared_cache())
+        self.assertEqual(built.call_count, 1)
+
+
+class ClientCacheTests(BaseTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.server = OXStubServer(OXStubBackend()).start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.path)
+
+    def test_warm_construction_skips_download(self):
+        ContextClient(wsdl=self.server.context_wsdl, cache=FileCache(path=self.path))
+        UserClient(wsdl=self.server.user_wsdl, cache=FileCache(path=self.path))
+        ContextClient(wsdl=self.server.context_wsdl, cache=FileCache(path=self.path))
+        UserClient(wsdl=self.server.user_wsdl, cache=FileCache(path=self.path))
+        self.assertEqual(self.server.requests["GET context"], 1)
+        self.assertEqual(self.server.requests["GET user"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()